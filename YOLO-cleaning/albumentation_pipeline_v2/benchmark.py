@@ -0,0 +1,318 @@
+"""数据增强流水线性能基准
+
+生成指定规模和分辨率的合成YOLO数据集，在不同进程数、输出编码器下分别运行
+AugmentationPipeline（v2）和 augmentation/image_transform_pipeline.augment_images（legacy），
+报告各阶段耗时（read/labels/transform/encode/write）、吞吐量和峰值内存。
+
+每个用例在独立的子进程中运行，峰值内存互不影响。多进程时各阶段耗时为所有worker的累计值。
+
+用法（在 YOLO-cleaning 目录下）:
+    python -m albumentation_pipeline_v2.benchmark --images 200 --size 1280x720 --workers 1 4 --formats jpg webp
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import yaml
+
+from .label_io import write_label_array
+from .timing import StageTimes
+
+ENGINES = ('v2', 'legacy')
+STAGES = ('read', 'labels', 'transform', 'encode', 'write')
+
+
+@dataclass
+class BenchmarkCase:
+    engine: str
+    workers: int = 1
+    output_format: str = 'jpg'
+    batch_samples: bool = False
+
+    @property
+    def name(self) -> str:
+        name = f"{self.engine}_{self.output_format}_w{self.workers}"
+        return f"{name}_batch" if self.batch_samples else name
+
+
+@dataclass
+class BenchmarkResult:
+    case: BenchmarkCase
+    images: int
+    outputs: int
+    wall_seconds: float
+    # 主进程及子进程（worker）的峰值常驻内存
+    peak_rss_mb: float
+    peak_children_rss_mb: float
+    stages: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.wall_seconds if self.wall_seconds else 0.0
+
+    def to_dict(self) -> Dict:
+        record = asdict(self)
+        record['case'] = asdict(self.case)
+        record['name'] = self.case.name
+        record['images_per_second'] = self.images_per_second
+        return record
+
+
+def make_synthetic_dataset(root, num_images: int = 100, size: Tuple[int, int] = (640, 640),
+                           boxes_per_image: int = 5, val_images: int = 0, num_classes: int = 3,
+                           seed: int = 0) -> Path:
+    """生成合成YOLO数据集，返回 dataset.yaml 路径
+
+    图片为平滑背景上叠加的色块，每个色块对应一个边界框，JPEG压缩率与真实图片接近。
+
+    Args:
+        root: 数据集根目录
+        num_images: train集图片数量
+        size: 图片尺寸 (宽, 高)
+        boxes_per_image: 每张图片的边界框数量
+        val_images: val集图片数量
+        num_classes: 类别数量
+        seed: 随机种子
+    """
+    root = Path(root)
+    rng = np.random.default_rng(seed)
+    width, height = size
+
+    for split, count in (('train', num_images), ('val', val_images)):
+        image_dir = root / 'images' / split
+        label_dir = root / 'labels' / split
+        image_dir.mkdir(parents=True, exist_ok=True)
+        label_dir.mkdir(parents=True, exist_ok=True)
+
+        for i in range(count):
+            small = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+            image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+
+            wh = rng.uniform(0.05, 0.3, (boxes_per_image, 2))
+            centers = rng.uniform(wh / 2, 1 - wh / 2)
+            bboxes = np.column_stack([centers, wh])
+            classes = rng.integers(0, num_classes, boxes_per_image)
+
+            scale = np.array([width, height])
+            for (cx, cy, w, h), color in zip(bboxes, rng.integers(0, 256, (boxes_per_image, 3))):
+                top_left = ((np.array([cx, cy]) - np.array([w, h]) / 2) * scale).astype(int)
+                bottom_right = ((np.array([cx, cy]) + np.array([w, h]) / 2) * scale).astype(int)
+                cv2.rectangle(image, tuple(map(int, top_left)), tuple(map(int, bottom_right)),
+                              tuple(map(int, color)), -1)
+
+            cv2.imwrite(str(image_dir / f"synthetic_{i:06d}.jpg"), image)
+            write_label_array(label_dir / f"synthetic_{i:06d}.txt", classes, bboxes)
+
+    yaml_path = root / 'dataset.yaml'
+    with open(yaml_path, 'w') as f:
+        yaml.dump({
+            'path': '.',
+            'train': './images/train/',
+            'val': './images/val/',
+            'names': {i: f"class_{i}" for i in range(num_classes)},
+        }, f, default_flow_style=False)
+    return yaml_path
+
+
+def _peak_rss_mb(who: int) -> float:
+    """getrusage 的峰值常驻内存，Linux单位为KB，macOS为字节"""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_v2(yaml_path: Path, case: BenchmarkCase, num_samples: int, version: str) -> StageTimes:
+    from .config import AugmentationConfig
+    from .pipeline import AugmentationPipeline
+
+    config = AugmentationConfig(
+        yaml_path=str(yaml_path),
+        version=version,
+        num_samples=num_samples,
+        create_new_dataset=True,
+        split='train',
+        num_workers=case.workers,
+        batch_samples=case.batch_samples,
+        incremental=False,
+        output_format=case.output_format,
+    )
+    pipeline = AugmentationPipeline(config)
+    pipeline.run()
+    if pipeline.failures:
+        raise RuntimeError(f"{len(pipeline.failures)} 张图片处理失败: {pipeline.failures[0]}")
+
+    stage_times = pipeline.stage_times
+    encode_stats = pipeline.dataset.encode_stats
+    stage_times.add('encode', encode_stats.encode_seconds, encode_stats.images)
+    stage_times.add('write', encode_stats.write_seconds, encode_stats.images)
+    return stage_times
+
+
+def _run_legacy(yaml_path: Path, case: BenchmarkCase, num_samples: int, version: str) -> StageTimes:
+    # legacy 流程为单进程且固定输出JPEG，忽略 workers 和 output_format
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from augmentation.image_transform_pipeline import augment_images
+
+    stage_times = StageTimes()
+    augment_images(str(yaml_path), split='train', num_samples=num_samples,
+                   create_new_dataset=True, version=version, stage_times=stage_times)
+    return stage_times
+
+
+def _run_case(conn, yaml_path: Path, case: BenchmarkCase, num_images: int, num_samples: int, verbose: bool):
+    """子进程入口：运行单个用例并通过管道回传 BenchmarkResult"""
+    version = f"bench_{case.name}"
+    runner = _run_v2 if case.engine == 'v2' else _run_legacy
+    sink = contextlib.ExitStack()
+    if not verbose:
+        sink.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        sink.enter_context(contextlib.redirect_stderr(io.StringIO()))
+        # worker进程直接写入继承的stderr，通过环境变量关闭其警告输出
+        os.environ['PYTHONWARNINGS'] = 'ignore'
+        warnings.simplefilter('ignore')
+
+    error = None
+    stage_times = StageTimes()
+    start = time.perf_counter()
+    try:
+        with sink:
+            stage_times = runner(yaml_path, case, num_samples, version)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+
+    conn.send(BenchmarkResult(
+        case=case,
+        images=num_images,
+        outputs=num_images * num_samples,
+        wall_seconds=wall,
+        peak_rss_mb=_peak_rss_mb(resource.RUSAGE_SELF),
+        peak_children_rss_mb=_peak_rss_mb(resource.RUSAGE_CHILDREN),
+        stages=dict(stage_times.seconds),
+        error=error,
+    ))
+    conn.close()
+    shutil.rmtree(yaml_path.parent / f"dataset_{version}", ignore_errors=True)
+
+
+def run_benchmark(yaml_path, cases: List[BenchmarkCase], num_images: int, num_samples: int = 3,
+                  verbose: bool = False) -> List[BenchmarkResult]:
+    """依次在独立子进程中运行各用例
+
+    Args:
+        yaml_path: 数据集yaml路径（通常由 make_synthetic_dataset 生成）
+        cases: 基准用例
+        num_images: train集图片数量，用于计算吞吐量
+        num_samples: 每张图片的增强样本数
+        verbose: 是否显示流水线自身的输出
+    """
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for case in cases:
+        receiver, sender = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_run_case,
+                              args=(sender, Path(yaml_path), case, num_images, num_samples, verbose))
+        process.start()
+        sender.close()
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = BenchmarkResult(case, num_images, 0, 0.0, 0.0, 0.0,
+                                     error="子进程异常退出")
+        process.join()
+        if result.error is None and process.exitcode:
+            result.error = f"子进程退出码 {process.exitcode}"
+        results.append(result)
+        print(format_result(result), flush=True)
+    return results
+
+
+def format_header() -> str:
+    stages = ''.join(f"{stage:>10}" for stage in STAGES)
+    return f"{'case':<24}{'wall(s)':>9}{'img/s':>9}{'rss(MB)':>9}{'worker(MB)':>11}{stages}"
+
+
+def format_result(result: BenchmarkResult) -> str:
+    if result.error:
+        return f"{result.case.name:<24} 失败: {result.error}"
+    stages = ''.join(f"{result.stages.get(stage, 0.0):>10.2f}" for stage in STAGES)
+    return (f"{result.case.name:<24}{result.wall_seconds:>9.2f}{result.images_per_second:>9.1f}"
+            f"{result.peak_rss_mb:>9.0f}{result.peak_children_rss_mb:>11.0f}{stages}")
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="数据增强流水线性能基准")
+    parser.add_argument('--images', type=int, default=100, help="train集图片数量")
+    parser.add_argument('--size', type=parse_size, default=(640, 640), help="图片尺寸，如 1280x720")
+    parser.add_argument('--boxes', type=int, default=5, help="每张图片的边界框数量")
+    parser.add_argument('--samples', type=int, default=3, help="每张图片的增强样本数")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1], help="v2流水线的进程数列表")
+    parser.add_argument('--formats', nargs='+', default=['jpg'], help="v2流水线的输出格式列表")
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--batch', action='store_true', help="v2流水线额外运行批量模式")
+    parser.add_argument('--dataset-dir', type=Path, default=None, help="合成数据集目录，默认使用临时目录")
+    parser.add_argument('--output', type=Path, default=None, help="将结果保存为JSON")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="显示流水线自身的输出")
+    args = parser.parse_args(argv)
+
+    cases = []
+    if 'v2' in args.engines:
+        for output_format in args.formats:
+            for workers in args.workers:
+                cases.append(BenchmarkCase('v2', workers, output_format))
+                if args.batch:
+                    cases.append(BenchmarkCase('v2', workers, output_format, batch_samples=True))
+    if 'legacy' in args.engines:
+        cases.append(BenchmarkCase('legacy'))
+
+    temp_dir = None
+    dataset_dir = args.dataset_dir
+    if dataset_dir is None:
+        temp_dir = tempfile.TemporaryDirectory(prefix='aug_bench_')
+        dataset_dir = Path(temp_dir.name)
+
+    try:
+        print(f"生成合成数据集: {args.images} 张 {args.size[0]}x{args.size[1]} 图片 -> {dataset_dir}")
+        start = time.perf_counter()
+        yaml_path = make_synthetic_dataset(dataset_dir, args.images, args.size, args.boxes, seed=args.seed)
+        print(f"生成耗时 {time.perf_counter() - start:.2f}s\n")
+
+        print(format_header())
+        results = run_benchmark(yaml_path, cases, args.images, args.samples, args.verbose)
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    if args.output is not None:
+        report = {
+            'dataset': {'images': args.images, 'size': list(args.size), 'boxes': args.boxes,
+                        'samples': args.samples, 'seed': args.seed},
+            'results': [result.to_dict() for result in results],
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
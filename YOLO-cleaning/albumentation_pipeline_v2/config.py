@@ -1,30 +1,63 @@
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, Optional
 import yaml
 import os
 
 @dataclass
 class AugmentationConfig:
-    def __init__(self, yaml_path: str, version: str, num_samples: int, create_new_dataset: bool, split: str):
+    def __init__(self, yaml_path: str, version: str, num_samples: int, create_new_dataset: bool, split: str,
+                 num_workers: int = 1, seed: Optional[int] = None,
+                 batch_samples: bool = False, writer_threads: int = 1,
+                 incremental: bool = True, label_cache: bool = False,
+                 link_mode: str = 'copy', output_format: str = 'jpg',
+                 encoder_params: Optional[Dict] = None, bbox_clip: bool = False):
         self.yaml_path = yaml_path
         self.version = version
         self.num_samples = num_samples
         self.create_new_dataset = create_new_dataset
         self.split = split
-        
+
+        # 并行配置：num_workers <= 0 表示使用全部CPU核心，1 表示串行处理
+        self.num_workers = num_workers if num_workers > 0 else (os.cpu_count() or 1)
+        # 随机种子：为None时不设置种子（每次运行结果不同）；设置后每张图片的种子由 seed 和文件名确定，
+        # 与进程数、处理顺序和增量跳过的图片无关，结果可复现
+        self.seed = seed
+
+        # 批量模式：一次解码生成全部增强样本，由后台线程负责编码和写盘
+        self.batch_samples = batch_samples
+        self.writer_threads = max(1, writer_threads)
+
+        # 增量模式：根据逐图片清单跳过源图片、标签和增强配置均未变化的图片
+        self.incremental = incremental
+
+        # 标签缓存：将整个split的标签保存为可内存映射的 .npy，避免逐个读取大量小文件
+        self.label_cache = label_cache
+
+        # 新数据集中未改动文件的复制方式: copy/reflink/hardlink/symlink/auto，链接失败时回退到复制
+        self.link_mode = link_mode
+
+        # 增强图片的输出格式: jpg/webp/png/same（与源图片相同），
+        # encoder_params 如 {'quality': 90, 'optimize': True, 'progressive': True}、{'lossless': True}、{'compression': 6}
+        self.output_format = output_format
+        self.encoder_params = encoder_params or {}
+
+        # 数据集级边界框检查：为True时将超出图像的边界框裁剪到图像内，否则直接丢弃
+        self.bbox_clip = bbox_clip
+
         # 添加yaml配置加载
         with open(yaml_path, 'r') as f:
             self.yaml_config = yaml.safe_load(f)
-            
+
         # 获取原始数据集路径
         self.source_path = self.yaml_config.get('path', '')
         if not os.path.isabs(self.source_path):
             # 如果是相对路径，转换为绝对路径
             yaml_dir = os.path.dirname(os.path.abspath(yaml_path))
             self.source_path = os.path.join(yaml_dir, self.source_path)
-            
+
         # 设置基础路径为yaml文件所在目录
         self.base_path = Path(os.path.dirname(os.path.abspath(yaml_path)))
-        
+
         # 转换路径为Path对象以便统一处理
         self.source_path = Path(self.source_path)
\ No newline at end of file
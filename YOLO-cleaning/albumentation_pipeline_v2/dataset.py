@@ -7,28 +7,39 @@ import numpy as np
 from datetime import datetime
 import json
 from .config import AugmentationConfig
+from .label_io import (BboxReport, LabelCache, preprocess_label_array, read_label_array,
+                       read_label_dir, write_label_array)
+from .image_index import ImageIndex, scan_image_dir
+from .encoders import EncodeStats, create_encoder, write_encoded_image
 import os
 from dataclasses import dataclass
 
 
 @dataclass
 class Labels:
-    classes: List[int]
-    bboxes: List[List[float]]
+    classes: np.ndarray  # (N,) int
+    bboxes: np.ndarray  # (N, 4) float32
+    # 是否已经过数据集级的校验和修正，为True时无需再调用 preprocess_bboxes
+    preprocessed: bool = False
 
 
 class DatasetManager:
     """数据集管理类"""
 
-    IMAGE_EXTENSIONS = [
-        '*.jpg', '*.jpeg', '*.JPG', '*.JPEG',
-        '*.png', '*.PNG', '*.bmp', '*.BMP',
-        '*.tif', '*.tiff', '*.TIF', '*.TIFF'
-    ]
-
     def __init__(self, config: AugmentationConfig):
         self.config = config
         self.current_split = None
+        # 按标签目录缓存的二进制标签
+        self._label_caches: Dict[str, LabelCache] = {}
+        # 按split缓存的图片/标签配对索引
+        self._image_indexes: Dict[str, ImageIndex] = {}
+        # 按标签目录保存的数据集级预处理后的标签及检查统计
+        self._processed_labels: Dict[str, LabelCache] = {}
+        self.bbox_reports: Dict[str, BboxReport] = {}
+
+        # 增强图片的输出编码器及编码/写盘统计
+        self.encoder = create_encoder(config.output_format, **config.encoder_params)
+        self.encode_stats = EncodeStats()
         self.yaml_config = self._load_yaml_config()
         self.paths = self._setup_paths()
 
@@ -66,13 +77,23 @@ class DatasetManager:
             self._create_directories()
             self._copy_dataset_structure()
 
-    def get_image_paths(self) -> List[Path]:
+    def get_image_paths(self, split: Optional[str] = None) -> List[Path]:
         """获取需要处理的图片路径列表"""
-        image_files = []
-        input_dir = self.paths['images_input']
-        for ext in self.IMAGE_EXTENSIONS:
-            image_files.extend(list(input_dir.glob(ext)))
-        return image_files
+        return self.get_image_index(split or self.current_split).images
+
+    def get_image_index(self, split: str, refresh: bool = False) -> ImageIndex:
+        """获取split的图片/标签配对索引，首次调用时单次遍历目录构建
+
+        Args:
+            split (str): 数据集分割名称
+            refresh (bool): 是否重新遍历目录
+        """
+        if refresh or split not in self._image_indexes:
+            self._image_indexes[split] = scan_image_dir(
+                self.paths['images'] / split,
+                self.paths['labels'] / split
+            )
+        return self._image_indexes[split]
 
     def read_image(self, image_path: Path) -> np.ndarray:
         """读取图片"""
@@ -90,18 +111,40 @@ class DatasetManager:
             aug_index (int): 增强序号
             augmented_filename (str): 新的文件名（不含扩展名）
         """
-        # 使用预设的路径
-        output_image_path = self.paths[f'new_images_{self.current_split}'] / f"{augmented_filename}.jpg"
+        self.write_augmented_files(
+            cv2.cvtColor(transformed['image'], cv2.COLOR_RGB2BGR),
+            transformed['bboxes'],
+            transformed['class_labels'],
+            augmented_filename,
+            source_path=Path(original_path)
+        )
+
+    def get_augmented_paths(self, augmented_filename: str,
+                            source_path: Optional[Path] = None) -> Tuple[Path, Path]:
+        """获取增强结果的图片和标签输出路径，图片扩展名由输出编码器决定"""
+        extension = self.encoder.extension_for(source_path)
+        output_image_path = self.paths[f'new_images_{self.current_split}'] / f"{augmented_filename}{extension}"
         output_label_path = self.paths[f'new_labels_{self.current_split}'] / f"{augmented_filename}.txt"
-        
+        return output_image_path, output_label_path
+
+    def write_augmented_files(self, bgr_image: np.ndarray, bboxes, class_labels, augmented_filename: str,
+                              source_path: Optional[Path] = None):
+        """编码并写入增强后的图片（BGR格式）和标签，可在后台写入线程中调用
+
+        Args:
+            bgr_image (np.ndarray): BGR格式的增强图片
+            bboxes: 增强后的边界框
+            class_labels: 增强后的类别标签
+            augmented_filename (str): 新的文件名（不含扩展名）
+            source_path (Path): 原始图片路径，输出格式为 same 时使用
+        """
+        output_image_path, output_label_path = self.get_augmented_paths(augmented_filename, source_path)
+
         # 保存增强后的图片
-        cv2.imwrite(str(output_image_path), cv2.cvtColor(transformed['image'], cv2.COLOR_RGB2BGR))
-        
+        write_encoded_image(output_image_path, bgr_image, self.encoder, self.encode_stats, source_path)
+
         # 保存对应的标签
-        with open(output_label_path, 'w') as f:
-            for class_label, bbox in zip(transformed['class_labels'], transformed['bboxes']):
-                line = f"{class_label} {' '.join(map(str, bbox))}\n"
-                f.write(line)
+        write_label_array(output_label_path, class_labels, bboxes)
 
     def _setup_new_dataset_paths(self) -> Dict[str, Path]:
         """创建新的数据集路径结构"""
@@ -153,44 +196,93 @@ class DatasetManager:
         with open(self.paths['new_yaml'], 'w') as f:
             yaml.dump(new_config, f, default_flow_style=False)
 
+    def get_label_path(self, image_path: Path) -> Path:
+        """获取图片对应的标签文件路径"""
+        index = self._image_indexes.get(image_path.parent.name)
+        if index is not None and index.image_dir == image_path.parent:
+            label_path = index.label_path(image_path)
+            if label_path is not None:
+                return label_path
+        return (self.paths['labels'] / image_path.relative_to(self.paths['images'])).with_suffix('.txt')
+
     def read_labels(self, image_path: Path) -> Optional[Labels]:
         """读取标签文件"""
-        label_path = (self.paths['labels'] / image_path.relative_to(self.paths['images'])).with_suffix('.txt')
+        label_path = self.get_label_path(image_path)
+
+        processed = self._processed_labels.get(str(label_path.parent))
+        if processed is not None:
+            rows = processed.get(label_path.stem)
+            if not len(rows):
+                return None
+            return Labels(classes=rows[:, 0].astype(np.int64), bboxes=rows[:, 1:], preprocessed=True)
+
         raw_labels = self._read_yolo_label(label_path)
 
-        if not raw_labels:
+        if not len(raw_labels):
             return None
 
-        classes = []
-        bboxes = []
-        for label in raw_labels:
-            classes.append(int(label[0]))
-            bbox = label[1:]
-            if self._ensure_valid_bbox(bbox):
-                bboxes.append(bbox)
+        bboxes = raw_labels[:, 1:]
+        valid = self._valid_bbox_mask(bboxes)
+        if not valid.any():
+            return None
 
-        return Labels(classes=classes, bboxes=bboxes) if bboxes else None
+        return Labels(classes=raw_labels[valid, 0].astype(np.int64), bboxes=bboxes[valid])
 
-    def _save_labels(self, stem: str, bboxes: List[List[float]],
-                     class_labels: List[int], output_dir: Path):
+    def _save_labels(self, stem: str, bboxes: np.ndarray,
+                     class_labels: np.ndarray, output_dir: Path):
         """保存标签文件"""
-        output_label_path = output_dir / f"{stem}.txt"
-        with open(output_label_path, 'w') as f:
-            for bbox, class_label in zip(bboxes, class_labels):
-                line = f"{class_label} {' '.join(map(str, bbox))}\n"
-                f.write(line)
-
-    def _read_yolo_label(self, label_path: Path) -> List[List[float]]:
-        """读取YOLO格式标签文件"""
-        raw_labels = []
-        with open(label_path, 'r') as f:
-            for line in f:
-                raw_labels.append(list(map(float, line.split())))
-        return raw_labels
-
-    def _ensure_valid_bbox(self, bbox: List[float]) -> bool:
-        """确保边界框格式有效"""
-        return len(bbox) == 4 and all(0 <= coord <= 1 for coord in bbox)
+        write_label_array(output_dir / f"{stem}.txt", class_labels, bboxes)
+
+    def _read_yolo_label(self, label_path: Path) -> np.ndarray:
+        """读取YOLO格式标签文件为 (N, 5) 数组，启用标签缓存时从缓存中读取"""
+        if self.config.label_cache:
+            return self.get_label_cache(label_path.parent).get(label_path.stem)
+        return read_label_array(label_path)
+
+    def get_label_cache(self, label_dir: Path) -> LabelCache:
+        """获取标签目录的二进制缓存，缓存不存在或过期时重新构建
+
+        Args:
+            label_dir (Path): 标签目录，如 labels/train
+        """
+        key = str(label_dir)
+        if key not in self._label_caches:
+            self._label_caches[key] = LabelCache.load_or_build(label_dir)
+        return self._label_caches[key]
+
+    def prepare_labels(self, split: str) -> LabelCache:
+        """数据集级标签预处理：一次性读取整个split的标签并向量化完成校验、修正和归一化
+
+        结果按图片保存，之后 read_labels 直接返回处理后的边界框，
+        不再对每张图片（及每个增强样本）重复校验和预处理。
+
+        Args:
+            split (str): 数据集分割名称
+
+        Returns:
+            LabelCache: 处理后的标签，可传给worker进程复用
+        """
+        label_dir = self.paths['labels'] / split
+        if self.config.label_cache:
+            cache = self.get_label_cache(label_dir)
+            labels, offsets, stems = cache.labels, cache.offsets, cache.stems
+        else:
+            stems = [p.stem for p in self.get_image_index(split).labeled_images()]
+            labels, offsets, stems = read_label_dir(label_dir, stems)
+
+        processed, offsets, report = preprocess_label_array(labels, offsets, clip=self.config.bbox_clip)
+        self.bbox_reports[split] = report
+        store = LabelCache(processed, offsets, stems)
+        self.set_processed_labels(split, store)
+        return store
+
+    def set_processed_labels(self, split: str, store: LabelCache):
+        """设置split预处理后的标签（worker进程中使用主进程的结果）"""
+        self._processed_labels[str(self.paths['labels'] / split)] = store
+
+    def _valid_bbox_mask(self, bboxes: np.ndarray) -> np.ndarray:
+        """确保边界框格式有效，返回每个边界框是否有效的掩码"""
+        return np.all((bboxes >= 0) & (bboxes <= 1), axis=1)
 
     def set_split(self, split: str):
         """设置当前数据集分割
@@ -202,6 +294,11 @@ class DatasetManager:
             raise ValueError(f"无效的数据集分割名称: {split}")
         self.current_split = split
 
+    def get_manifest_path(self) -> Path:
+        """获取逐图片增强清单的路径"""
+        base = self.paths.get('new_base', self.paths['base'])
+        return base / f"augmentation_manifest_{self.config.version}.jsonl"
+
     def save_augmentation_record(self, transform):
         """保存数据增强记录
         
@@ -219,10 +316,26 @@ class DatasetManager:
             'bbox_params': transform.processors['bboxes'].params.__dict__
         }
 
+        # 增量模式下本次可能跳过了全部图片，此时保留上次记录中的编码统计和边界框检查结果
+        previous = {}
+        if self.augmentation_record_path.exists():
+            try:
+                with open(self.augmentation_record_path, 'r', encoding='utf-8') as f:
+                    previous = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                previous = {}
+        encode_report = self.encode_stats.to_dict() if self.encode_stats.images else \
+            previous.get('encode_report', self.encode_stats.to_dict())
+        bbox_report = dict(previous.get('bbox_report', {}))
+        bbox_report.update({split: report.to_dict() for split, report in self.bbox_reports.items()})
+
         record = {
             'version': self.config.version,
             'num_samples': self.config.num_samples,
             'augmentation_config': transform_params,
+            'output_encoder': self.encoder.describe(),
+            'encode_report': encode_report,
+            'bbox_report': bbox_report,
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
 
@@ -0,0 +1,165 @@
+import threading
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class EncodeStats:
+    """编码/写盘统计，可在写盘线程间共享，也可从worker进程回传后合并"""
+    images: int = 0
+    encode_seconds: float = 0.0
+    write_seconds: float = 0.0
+    bytes_written: int = 0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def add(self, encode_seconds: float, write_seconds: float, num_bytes: int):
+        with self._lock:
+            self.images += 1
+            self.encode_seconds += encode_seconds
+            self.write_seconds += write_seconds
+            self.bytes_written += num_bytes
+
+    def merge(self, other: 'EncodeStats'):
+        with self._lock:
+            self.images += other.images
+            self.encode_seconds += other.encode_seconds
+            self.write_seconds += other.write_seconds
+            self.bytes_written += other.bytes_written
+
+    def pop(self) -> 'EncodeStats':
+        """取出当前统计并清零"""
+        with self._lock:
+            snapshot = EncodeStats(self.images, self.encode_seconds, self.write_seconds, self.bytes_written)
+            self.images, self.encode_seconds, self.write_seconds, self.bytes_written = 0, 0.0, 0.0, 0
+        return snapshot
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def summary(self) -> str:
+        if not self.images:
+            return "未写入图片"
+        return (f"写入 {self.images} 张图片, 共 {self.bytes_written / 1024 / 1024:.1f} MB "
+                f"(平均 {self.bytes_written / self.images / 1024:.1f} KB/张), "
+                f"编码 {self.encode_seconds:.2f}s, 写盘 {self.write_seconds:.2f}s")
+
+    def __getstate__(self):
+        return asdict(self)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+class ImageEncoder:
+    """基于 cv2.imencode 的图片编码器"""
+
+    def __init__(self, extension: str, params: Optional[List[int]] = None):
+        self.extension = extension
+        self.params = params or []
+
+    def extension_for(self, source_path: Optional[Path] = None) -> str:
+        """输出文件扩展名（含点）"""
+        return self.extension
+
+    def encode(self, bgr_image: np.ndarray, source_path: Optional[Path] = None) -> np.ndarray:
+        """将BGR图片编码为字节数组"""
+        ok, buffer = cv2.imencode(self.extension_for(source_path), bgr_image, self.params)
+        if not ok:
+            raise IOError(f"图片编码失败: {self.extension_for(source_path)}")
+        return buffer
+
+    def describe(self) -> Dict:
+        """编码器配置，用于增强记录和清单哈希"""
+        return {'extension': self.extension, 'params': list(self.params)}
+
+
+class JpegEncoder(ImageEncoder):
+    def __init__(self, quality: int = 95, optimize: bool = False, progressive: bool = False):
+        super().__init__('.jpg', [
+            cv2.IMWRITE_JPEG_QUALITY, int(quality),
+            cv2.IMWRITE_JPEG_OPTIMIZE, int(optimize),
+            cv2.IMWRITE_JPEG_PROGRESSIVE, int(progressive),
+        ])
+
+
+class WebpEncoder(ImageEncoder):
+    def __init__(self, quality: int = 90, lossless: bool = False):
+        # OpenCV中 quality > 100 表示无损
+        super().__init__('.webp', [cv2.IMWRITE_WEBP_QUALITY, 101 if lossless else int(quality)])
+
+
+class PngEncoder(ImageEncoder):
+    def __init__(self, compression: int = 3):
+        super().__init__('.png', [cv2.IMWRITE_PNG_COMPRESSION, int(compression)])
+
+
+class SameAsSourceEncoder(ImageEncoder):
+    """按源图片格式输出，JPEG/PNG/WebP使用对应编码器的参数"""
+
+    def __init__(self, quality: int = 95, compression: int = 3):
+        super().__init__('same')
+        self.quality = quality
+        self.compression = compression
+        self._encoders = {
+            '.jpg': JpegEncoder(quality=quality),
+            '.jpeg': JpegEncoder(quality=quality),
+            '.png': PngEncoder(compression=compression),
+            '.webp': WebpEncoder(quality=quality),
+        }
+
+    def extension_for(self, source_path: Optional[Path] = None) -> str:
+        if source_path is None:
+            raise ValueError("same 编码器需要源图片路径")
+        return Path(source_path).suffix.lower()
+
+    def encode(self, bgr_image: np.ndarray, source_path: Optional[Path] = None) -> np.ndarray:
+        extension = self.extension_for(source_path)
+        encoder = self._encoders.get(extension)
+        if encoder is None:
+            encoder = ImageEncoder(extension)
+        return encoder.encode(bgr_image)
+
+    def describe(self) -> Dict:
+        return {'extension': 'same', 'quality': self.quality, 'compression': self.compression}
+
+
+ENCODERS = {
+    'jpg': JpegEncoder,
+    'jpeg': JpegEncoder,
+    'webp': WebpEncoder,
+    'png': PngEncoder,
+    'same': SameAsSourceEncoder,
+}
+
+
+def create_encoder(output_format: str = 'jpg', **params) -> ImageEncoder:
+    """根据输出格式名称创建编码器
+
+    Args:
+        output_format: jpg/jpeg/webp/png/same
+        **params: 编码器参数，如 quality、optimize、progressive、lossless、compression
+    """
+    encoder_cls = ENCODERS.get(output_format.lower())
+    if encoder_cls is None:
+        raise ValueError(f"不支持的输出格式: {output_format}，可选: {list(ENCODERS)}")
+    return encoder_cls(**params)
+
+
+def write_encoded_image(path: Union[str, Path], bgr_image: np.ndarray, encoder: ImageEncoder,
+                        stats: Optional[EncodeStats] = None, source_path: Optional[Path] = None):
+    """编码并写入图片，分别统计编码和写盘耗时"""
+    start = time.perf_counter()
+    buffer = encoder.encode(bgr_image, source_path)
+    encoded = time.perf_counter()
+    with open(path, 'wb') as f:
+        f.write(buffer)
+    written = time.perf_counter()
+    if stats is not None:
+        stats.add(encoded - start, written - encoded, buffer.nbytes)
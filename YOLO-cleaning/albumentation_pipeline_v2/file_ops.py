@@ -0,0 +1,116 @@
+import errno
+import os
+import shutil
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Union
+
+# 复制模式:
+#   copy     - 完整复制文件内容
+#   reflink  - 写时复制克隆（Btrfs/XFS等支持时），不占用额外空间且与源文件互不影响
+#   hardlink - 硬链接，不占用额外空间，但与源文件共享内容，原地修改会同时改变源文件
+#   symlink  - 符号链接，指向源文件的绝对路径
+#   auto     - 依次尝试 reflink、hardlink，失败后回退到 copy
+LINK_MODES = ('copy', 'reflink', 'hardlink', 'symlink', 'auto')
+
+# linux/fs.h: #define FICLONE _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+# 表示文件系统/设备组合不支持某种链接方式的错误码
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.ENOTTY, errno.EPERM}
+# 已确认不支持的 (方式, 源设备, 目标设备)，避免对每个文件重复尝试
+_unsupported = set()
+
+
+def _reflink(src: Path, dst: Path):
+    """使用FICLONE ioctl创建写时复制克隆，文件系统不支持时抛出OSError"""
+    if not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, "当前平台不支持reflink")
+    import fcntl
+
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _remove_existing(dst: Path):
+    """链接前移除已存在的目标文件"""
+    if dst.is_symlink() or dst.exists():
+        dst.unlink()
+
+
+def link_or_copy(src: Union[str, Path], dst: Union[str, Path], mode: str = 'copy') -> str:
+    """按指定模式将文件放到目标位置，链接失败时自动回退到复制
+
+    Args:
+        src: 源文件
+        dst: 目标文件路径（或已存在的目录）
+        mode: 见 LINK_MODES
+
+    Returns:
+        str: 实际使用的方式 ('copy'/'reflink'/'hardlink'/'symlink')
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"无效的复制模式: {mode}，可选: {LINK_MODES}")
+
+    src, dst = Path(src), Path(dst)
+    if dst.is_dir():
+        dst = dst / src.name
+
+    if mode == 'auto':
+        attempts = ('reflink', 'hardlink')
+    elif mode == 'copy':
+        attempts = ()
+    else:
+        attempts = (mode,)
+
+    if attempts:
+        devices = (src.stat().st_dev, dst.parent.stat().st_dev)
+        attempts = [m for m in attempts if (m, *devices) not in _unsupported]
+
+    for method in attempts:
+        try:
+            _remove_existing(dst)
+            if method == 'reflink':
+                _reflink(src, dst)
+            elif method == 'hardlink':
+                os.link(src, dst)
+            else:
+                os.symlink(src.resolve(), dst)
+            return method
+        except OSError as e:
+            # 跨设备、文件系统不支持等情况，记录后继续尝试下一种方式
+            if e.errno in _UNSUPPORTED_ERRNOS:
+                _unsupported.add((method, *devices))
+            continue
+
+    _remove_existing(dst)
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def link_tree(src_dir: Union[str, Path], dst_dir: Union[str, Path], mode: str = 'copy') -> Counter:
+    """按指定模式复制整个目录树，目录本身总是新建的
+
+    Args:
+        src_dir: 源目录
+        dst_dir: 目标目录
+        mode: 见 LINK_MODES
+
+    Returns:
+        Counter: 各种方式处理的文件数量
+    """
+    src_dir, dst_dir = Path(src_dir), Path(dst_dir)
+    stats = Counter()
+    for root, _, files in os.walk(src_dir):
+        target_root = dst_dir / Path(root).relative_to(src_dir)
+        target_root.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            stats[link_or_copy(Path(root) / name, target_root / name, mode)] += 1
+    return stats
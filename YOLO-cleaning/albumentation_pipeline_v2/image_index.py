@@ -0,0 +1,75 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+# 支持的图片扩展名（小写），匹配时忽略大小写
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+@dataclass
+class ImageIndex:
+    """单个目录的图片/标签配对索引
+
+    通过一次 os.scandir 遍历图片目录、一次遍历标签目录构建，
+    后续的复制、增强、清单比对等阶段都复用同一个索引，不再重复列目录。
+    """
+    image_dir: Path
+    label_dir: Optional[Path]
+    # 按文件名排序的图片路径
+    images: List[Path] = field(default_factory=list)
+    # 小写扩展名 -> 图片路径
+    by_extension: Dict[str, List[Path]] = field(default_factory=dict)
+    # 文件名（不含扩展名） -> 标签路径，只包含实际存在的标签文件
+    labels: Dict[str, Path] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def label_path(self, image_path: Path) -> Optional[Path]:
+        """获取图片对应的标签路径，没有标签时返回None"""
+        return self.labels.get(image_path.stem)
+
+    def pairs(self) -> List[Tuple[Path, Optional[Path]]]:
+        """返回 (图片路径, 标签路径) 列表，没有标签的图片标签路径为None"""
+        return [(image, self.labels.get(image.stem)) for image in self.images]
+
+    def labeled_images(self) -> List[Path]:
+        """返回有对应标签文件的图片"""
+        return [image for image in self.images if image.stem in self.labels]
+
+
+def scan_image_dir(image_dir: Union[str, Path], label_dir: Union[str, Path, None] = None) -> ImageIndex:
+    """单次遍历构建图片/标签索引
+
+    Args:
+        image_dir: 图片目录
+        label_dir: 标签目录，为None时不建立标签配对
+
+    Returns:
+        ImageIndex: 图片/标签配对索引
+    """
+    image_dir = Path(image_dir)
+    label_dir = Path(label_dir) if label_dir is not None else None
+    index = ImageIndex(image_dir=image_dir, label_dir=label_dir)
+
+    if image_dir.is_dir():
+        names = []
+        with os.scandir(image_dir) as entries:
+            for entry in entries:
+                suffix = os.path.splitext(entry.name)[1].lower()
+                if suffix in IMAGE_SUFFIXES and entry.is_file():
+                    names.append((entry.name, suffix))
+        names.sort()
+        for name, suffix in names:
+            path = image_dir / name
+            index.images.append(path)
+            index.by_extension.setdefault(suffix, []).append(path)
+
+    if label_dir is not None and label_dir.is_dir():
+        with os.scandir(label_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.txt') and entry.is_file():
+                    index.labels[entry.name[:-4]] = label_dir / entry.name
+
+    return index
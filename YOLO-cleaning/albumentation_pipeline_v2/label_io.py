@@ -0,0 +1,252 @@
+import os
+from dataclasses import dataclass, asdict
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+# YOLO标签每行: class_id x_center y_center width height
+LABEL_COLUMNS = 5
+EMPTY_LABELS = np.zeros((0, LABEL_COLUMNS), dtype=np.float32)
+
+
+def parse_label_text(text: str) -> np.ndarray:
+    """将YOLO标签文本解析为 (N, 5) 的float32数组
+
+    文本只切分一次：逐行检查列数（只比较总数会把列数不同的行拼错成错误的边界框），
+    所有行都是5列时（最常见的情况）直接把切分结果一次性转换；含有多边形等非5列的行时只保留5列的行。
+    """
+    rows = [row for row in map(str.split, text.splitlines()) if row]
+    if not all(len(row) == LABEL_COLUMNS for row in rows):
+        rows = [row for row in rows if len(row) == LABEL_COLUMNS]
+    if not rows:
+        return EMPTY_LABELS
+    values = np.fromiter(map(float, chain.from_iterable(rows)), dtype=np.float32, count=len(rows) * LABEL_COLUMNS)
+    return values.reshape(-1, LABEL_COLUMNS)
+
+
+def read_label_array(label_path: Union[str, Path]) -> np.ndarray:
+    """读取YOLO格式标签文件为 (N, 5) 的float32数组，文件不存在时返回空数组"""
+    try:
+        with open(label_path, 'r') as f:
+            return parse_label_text(f.read())
+    except FileNotFoundError:
+        return EMPTY_LABELS
+
+
+def format_label_array(classes: Iterable, bboxes: Iterable) -> str:
+    """将类别和边界框格式化为YOLO标签文本，一次格式化全部行"""
+    classes = np.asarray(classes, dtype=np.float64).reshape(-1)
+    bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, LABEL_COLUMNS - 1)
+    if len(classes) == 0:
+        return ''
+    rows = np.column_stack([classes, bboxes])
+    template = '%d %.6f %.6f %.6f %.6f\n' * len(rows)
+    return template % tuple(rows.ravel())
+
+
+def write_label_array(label_path: Union[str, Path], classes: Iterable, bboxes: Iterable):
+    """将类别和边界框一次性写入YOLO格式标签文件"""
+    with open(label_path, 'w') as f:
+        f.write(format_label_array(classes, bboxes))
+
+
+def read_label_dir(label_dir: Union[str, Path],
+                   stems: Optional[Iterable[str]] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """读取整个标签目录，返回拼接后的标签数组及每个文件的偏移
+
+    Args:
+        label_dir: 标签目录
+        stems: 需要读取的文件名（不含扩展名），为None时读取目录下全部 .txt 文件
+
+    Returns:
+        tuple: (labels, offsets, stems)，第i个文件的标签为 labels[offsets[i]:offsets[i + 1]]
+    """
+    label_dir = Path(label_dir)
+    if stems is None:
+        stems = sorted(entry.name[:-4] for entry in os.scandir(label_dir)
+                       if entry.is_file() and entry.name.endswith('.txt'))
+    else:
+        stems = list(stems)
+
+    arrays = [read_label_array(label_dir / f"{stem}.txt") for stem in stems]
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    if arrays:
+        np.cumsum([len(a) for a in arrays], out=offsets[1:])
+        labels = np.concatenate(arrays) if offsets[-1] else EMPTY_LABELS
+    else:
+        labels = EMPTY_LABELS
+    return labels, offsets, stems
+
+
+@dataclass
+class BboxReport:
+    """数据集级边界框检查统计"""
+    images: int = 0
+    total: int = 0
+    # 不合法的边界框：非有限值、宽高不为正或坐标超出 [0, 1]
+    invalid: int = 0
+    # 中心点被调整以保证边界框不超出图像的边界框
+    clamped: int = 0
+    # 最终被移除的边界框
+    dropped: int = 0
+    # 检查后没有剩余边界框的图片
+    empty_images: int = 0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def summary(self) -> str:
+        return (f"{self.images} 张图片共 {self.total} 个边界框: 无效 {self.invalid}, "
+                f"修正 {self.clamped}, 丢弃 {self.dropped}, 无边界框图片 {self.empty_images}")
+
+
+def preprocess_label_array(labels: np.ndarray, offsets: np.ndarray, clip: bool = False,
+                           epsilon: float = 1e-6) -> Tuple[np.ndarray, np.ndarray, BboxReport]:
+    """对整个数据集拼接后的标签一次性完成校验、修正和归一化
+
+    与 AugmentationTransforms.preprocess_bboxes 的逐图片处理等价：
+    丢弃坐标超出 [0, 1] 的边界框，将接近0/1的值吸附到0/1，并把中心点限制在 [w/2, 1 - w/2] 内。
+
+    Args:
+        labels: (N, 5) 拼接后的标签 [class_id, x_center, y_center, width, height]
+        offsets: (M + 1,) 每张图片在labels中的偏移
+        clip: 为True时先将超出图像的边界框裁剪到图像内再校验，而不是直接丢弃
+        epsilon: 吸附到0/1的容差
+
+    Returns:
+        tuple: (处理后的标签, 新的偏移, BboxReport)
+    """
+    labels = np.asarray(labels, dtype=np.float32).reshape(-1, LABEL_COLUMNS)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_images = len(offsets) - 1
+    report = BboxReport(images=num_images, total=len(labels))
+    if not len(labels):
+        report.empty_images = num_images
+        return labels.copy(), np.zeros_like(offsets), report
+
+    image_ids = np.repeat(np.arange(num_images), np.diff(offsets))
+    boxes = labels[:, 1:].astype(np.float32, copy=True)
+
+    finite = np.isfinite(labels).all(axis=1)
+    in_range = ((boxes >= 0) & (boxes <= 1)).all(axis=1)
+    positive = (boxes[:, 2] > 0) & (boxes[:, 3] > 0)
+    valid = finite & in_range & positive
+    report.invalid = int((~valid).sum())
+
+    if clip:
+        # 转为xyxy裁剪到图像内再转回，能修复的边界框保留
+        with np.errstate(invalid='ignore'):
+            xy_min = np.clip(boxes[:, :2] - boxes[:, 2:] / 2, 0, 1)
+            xy_max = np.clip(boxes[:, :2] + boxes[:, 2:] / 2, 0, 1)
+        boxes[:, :2] = (xy_min + xy_max) / 2
+        boxes[:, 2:] = xy_max - xy_min
+        valid = finite & (boxes[:, 2] > 0) & (boxes[:, 3] > 0)
+
+    # 处理接近0和1的值
+    boxes[np.abs(boxes) < epsilon] = 0
+    boxes[np.abs(boxes - 1) < epsilon] = 1
+
+    # 调整中心点坐标，保证边界框不超出图像
+    centers = np.clip(boxes[:, :2], boxes[:, 2:] / 2, 1 - boxes[:, 2:] / 2)
+    clamped = (centers != boxes[:, :2]).any(axis=1) & valid
+    boxes[:, :2] = centers
+    report.clamped = int(clamped.sum())
+    report.dropped = int((~valid).sum())
+
+    processed = np.column_stack([labels[valid, :1], boxes[valid]]).astype(np.float32)
+    counts = np.bincount(image_ids[valid], minlength=num_images)
+    new_offsets = np.zeros_like(offsets)
+    np.cumsum(counts, out=new_offsets[1:])
+    report.empty_images = int((counts == 0).sum())
+    return processed, new_offsets, report
+
+
+class LabelCache:
+    """单个split的二进制标签缓存
+
+    全部标签拼接为一个 (N, 5) 的float32数组保存为 .npy，可内存映射加载；
+    另存文件名、偏移及每个文件的 (size, mtime) 用于判断缓存是否过期。
+    """
+
+    def __init__(self, labels: np.ndarray, offsets: np.ndarray, stems: List[str]):
+        self.labels = labels
+        self.offsets = offsets
+        self.stems = stems
+        self._index: Dict[str, int] = {stem: i for i, stem in enumerate(stems)}
+
+    def __len__(self) -> int:
+        return len(self.stems)
+
+    def __contains__(self, stem: str) -> bool:
+        return stem in self._index
+
+    def get(self, stem: str) -> np.ndarray:
+        """获取单个文件的标签，不存在时返回空数组"""
+        i = self._index.get(stem)
+        if i is None:
+            return EMPTY_LABELS
+        return self.labels[self.offsets[i]:self.offsets[i + 1]]
+
+    @staticmethod
+    def cache_paths(label_dir: Union[str, Path]) -> Tuple[Path, Path]:
+        """缓存文件路径: labels/train -> labels/train.cache.npy, labels/train.cache_index.npz"""
+        label_dir = Path(label_dir)
+        return (label_dir.parent / f"{label_dir.name}.cache.npy",
+                label_dir.parent / f"{label_dir.name}.cache_index.npz")
+
+    @staticmethod
+    def _scan_stats(label_dir: Path) -> Tuple[List[str], np.ndarray]:
+        """扫描标签目录，返回文件名和 (size, mtime_ns)"""
+        stems, stats = [], []
+        for entry in os.scandir(label_dir):
+            if entry.name.endswith('.txt') and entry.is_file():
+                st = entry.stat()
+                stems.append(entry.name[:-4])
+                stats.append((st.st_size, st.st_mtime_ns))
+        order = sorted(range(len(stems)), key=stems.__getitem__)
+        stems = [stems[i] for i in order]
+        stats = np.array([stats[i] for i in order], dtype=np.int64).reshape(-1, 2)
+        return stems, stats
+
+    @classmethod
+    def build(cls, label_dir: Union[str, Path], save: bool = True) -> 'LabelCache':
+        """读取标签目录并（可选）写入缓存文件"""
+        label_dir = Path(label_dir)
+        stems, stats = cls._scan_stats(label_dir)
+        labels, offsets, stems = read_label_dir(label_dir, stems)
+
+        if save:
+            labels_path, index_path = cls.cache_paths(label_dir)
+            np.save(labels_path, labels)
+            np.savez(index_path, stems=np.array(stems), offsets=offsets, stats=stats)
+        return cls(labels, offsets, stems)
+
+    @classmethod
+    def load(cls, label_dir: Union[str, Path], mmap: bool = True) -> Optional['LabelCache']:
+        """加载缓存，缓存不存在或标签文件有变化时返回None"""
+        label_dir = Path(label_dir)
+        labels_path, index_path = cls.cache_paths(label_dir)
+        if not labels_path.exists() or not index_path.exists():
+            return None
+
+        with np.load(index_path) as index:
+            cached_stems = index['stems'].tolist()
+            offsets = index['offsets']
+            cached_stats = index['stats']
+
+        stems, stats = cls._scan_stats(label_dir)
+        if stems != cached_stems or not np.array_equal(stats, cached_stats):
+            return None
+
+        labels = np.load(labels_path, mmap_mode='r' if mmap else None)
+        return cls(labels, offsets, stems)
+
+    @classmethod
+    def load_or_build(cls, label_dir: Union[str, Path], mmap: bool = True) -> 'LabelCache':
+        """优先加载有效缓存，否则重新构建"""
+        cache = cls.load(label_dir, mmap=mmap)
+        if cache is None:
+            cache = cls.build(label_dir)
+        return cache
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import albumentations as A
+
+
+def file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    """计算文件内容哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def transform_config_hash(transform: A.Compose, num_samples: int, output: Optional[Dict] = None,
+                          labels: Optional[Dict] = None, seed: Optional[int] = None) -> str:
+    """计算数据增强配置的哈希，任何影响输出的配置变化时所有输出都需要重新生成
+
+    Args:
+        transform: 数据增强转换器
+        num_samples: 每张图片的增强数量
+        output: 输出编码器配置
+        labels: 标签预处理配置，如 {'bbox_clip': True}
+        seed: 随机种子
+    """
+    config = {
+        'transform': A.to_dict(transform),
+        'num_samples': num_samples,
+        'output': output or {},
+        'labels': labels or {},
+        'seed': seed,
+    }
+    payload = json.dumps(config, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    """单张源图片的处理记录"""
+    key: str
+    image_hash: str
+    label_hash: str
+    config_hash: str
+    # 用于跳过重复哈希计算的文件状态 (size, mtime_ns)
+    image_stat: Tuple[int, int] = (0, 0)
+    label_stat: Tuple[int, int] = (0, 0)
+    outputs: List[str] = field(default_factory=list)
+
+
+class AugmentationManifest:
+    """逐图片的增强清单
+
+    清单以JSON Lines格式追加写入，每处理完一张图片立即落盘，
+    因此中断后重新运行只需处理未完成、新增或内容发生变化的图片。
+    """
+
+    def __init__(self, manifest_path: Path, config_hash: str):
+        self.manifest_path = Path(manifest_path)
+        self.config_hash = config_hash
+        self.entries: Dict[str, ManifestEntry] = {}
+        self._file = None
+        self._load()
+
+    def _load(self):
+        """加载已有清单，同一key以最后一条记录为准"""
+        if not self.manifest_path.exists():
+            return
+
+        num_lines = 0
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                num_lines += 1
+                try:
+                    data = json.loads(line)
+                    data['image_stat'] = tuple(data['image_stat'])
+                    data['label_stat'] = tuple(data['label_stat'])
+                    entry = ManifestEntry(**data)
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # 中断时可能留下不完整的最后一行
+                    continue
+                self.entries[entry.key] = entry
+
+        # 被覆盖的旧记录过多时压缩清单
+        if num_lines > 2 * len(self.entries):
+            self._rewrite()
+
+    def _rewrite(self):
+        """用当前记录重写清单文件"""
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(asdict(entry), ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.manifest_path)
+
+    def _hash_with_cache(self, path: Path, cached_hash: Optional[str],
+                         cached_stat: Tuple[int, int]) -> Tuple[str, Tuple[int, int]]:
+        """文件大小和修改时间未变化时复用已记录的哈希"""
+        if not path.exists():
+            return '', (0, 0)
+        st = path.stat()
+        stat = (st.st_size, st.st_mtime_ns)
+        if cached_hash is not None and stat == cached_stat:
+            return cached_hash, stat
+        return file_hash(path), stat
+
+    def build_entry(self, key: str, image_path: Path, label_path: Path) -> ManifestEntry:
+        """计算源图片和标签的哈希，生成待比较/记录的清单项"""
+        previous = self.entries.get(key)
+        image_hash, image_stat = self._hash_with_cache(
+            image_path,
+            previous.image_hash if previous else None,
+            previous.image_stat if previous else (0, 0)
+        )
+        label_hash, label_stat = self._hash_with_cache(
+            label_path,
+            previous.label_hash if previous else None,
+            previous.label_stat if previous else (0, 0)
+        )
+        return ManifestEntry(
+            key=key,
+            image_hash=image_hash,
+            label_hash=label_hash,
+            config_hash=self.config_hash,
+            image_stat=image_stat,
+            label_stat=label_stat
+        )
+
+    def is_up_to_date(self, entry: ManifestEntry) -> bool:
+        """判断清单中的记录与当前源文件、配置是否一致，且输出文件仍然存在"""
+        previous = self.entries.get(entry.key)
+        if previous is None:
+            return False
+        if (previous.image_hash, previous.label_hash, previous.config_hash) != \
+                (entry.image_hash, entry.label_hash, entry.config_hash):
+            return False
+        return all(os.path.exists(p) for p in previous.outputs)
+
+    def record(self, entry: ManifestEntry, outputs: Iterable[Path]):
+        """记录一张已完成的图片并立即落盘
+
+        Args:
+            entry (ManifestEntry): 由 build_entry 生成的清单项
+            outputs: 实际生成的输出文件
+        """
+        entry.outputs = [str(p) for p in outputs]
+        self.entries[entry.key] = entry
+
+        if self._file is None:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.manifest_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(asdict(entry), ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """关闭清单文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
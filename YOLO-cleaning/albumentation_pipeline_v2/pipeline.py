@@ -1,10 +1,27 @@
 from .config import AugmentationConfig
 from .dataset import DatasetManager
 from .transforms import AugmentationTransforms
+from .manifest import AugmentationManifest, ManifestEntry, transform_config_hash
+from .file_ops import link_tree
+from .encoders import EncodeStats
+from .label_io import LabelCache
+from .timing import StageTimes
 from tqdm import tqdm
 import os
 from pathlib import Path
 import shutil
+import random
+import zlib
+from collections import Counter, deque
+from functools import partial
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+import cv2
+import numpy as np
+
+# worker进程内的流水线实例，由 _init_worker 创建
+_worker_pipeline = None
 
 class AugmentationPipeline:
     """数据增强主流程类"""
@@ -13,9 +30,20 @@ class AugmentationPipeline:
         self.config = config
         self.transform = AugmentationTransforms.create_default_transform()
         self.dataset = DatasetManager(config)
+        # 处理失败的图片 (图片路径, 错误信息)
+        self.failures: List[Tuple[str, str]] = []
+        # 各阶段（解码、标签、增强）耗时统计，编码/写盘统计见 dataset.encode_stats
+        self.stage_times = StageTimes()
+
+        # 批量模式下的后台编码/写盘线程池和复用的输出缓冲区
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._output_buffer: Optional[np.ndarray] = None
+
+        # 逐图片增强清单，run() 时创建
+        self.manifest: Optional[AugmentationManifest] = None
         
     def copy_other_splits(self):
-        """复制非增强split的数据和标签到新数据集"""
+        """复制非增强split的数据和标签到新数据集，按 config.link_mode 复制或链接"""
         base_splits = ['train', 'val', 'test']
         # 只处理存在的且不是当前split的目录
         splits = [s for s in base_splits if (
@@ -24,6 +52,7 @@ class AugmentationPipeline:
         )]
         data_types = [('images', 'new_images'), ('labels', 'new_labels')]
         
+        stats = Counter()
         for split in splits:
             for src_key, dst_key in data_types:
                 src_dir = os.path.join(self.dataset.paths[src_key], split)
@@ -33,7 +62,10 @@ class AugmentationPipeline:
                 dst_dir = os.path.join(self.dataset.paths[dst_key], split)
                 if os.path.exists(dst_dir):
                     shutil.rmtree(dst_dir)
-                shutil.copytree(src_dir, dst_dir)
+                stats.update(link_tree(src_dir, dst_dir, self.config.link_mode))
+
+        if stats:
+            print(f"复制其他split文件: {dict(stats)}")
         
     def run(self):
         """执行数据增强流程"""
@@ -55,6 +87,18 @@ class AugmentationPipeline:
         
         # 准备数据集
         self.dataset.prepare()
+
+        if self.config.incremental:
+            self.manifest = AugmentationManifest(
+                self.dataset.get_manifest_path(),
+                transform_config_hash(
+                    self.transform,
+                    self.config.num_samples,
+                    self.dataset.encoder.describe(),
+                    labels={'bbox_clip': self.config.bbox_clip},
+                    seed=self.config.seed
+                )
+            )
         
         print("\n=== 开始处理图片 ===")
         for split in ['train', 'val'] if self.config.split == 'all' else [self.config.split]:
@@ -75,12 +119,139 @@ class AugmentationPipeline:
             
             self._process_images(split, input_image_dir, output_image_dir)
         
+        print(f"\n编码统计: {self.dataset.encode_stats.summary()}")
+        print(f"阶段耗时: {self.stage_times.summary()}")
+
         # 保存增强记录
         self.dataset.save_augmentation_record(self.transform)
         print("\n=== 数据增强完成 ===")
         
         self.copy_other_splits()
-        
+        self.close()
+
+    def close(self):
+        """关闭后台写盘线程和增强清单"""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if self.manifest is not None:
+            self.manifest.close()
+
+    def stream(self, split: Optional[str] = None, batch_size: int = 16, prefetch: int = 2,
+               shuffle: bool = False) -> Iterator[Tuple[List[np.ndarray], List[np.ndarray], List[np.ndarray]]]:
+        """生成器模式：不写盘，直接产出增强后的样本批次，供训练任务在线消费
+
+        解码和转换在后台执行（num_workers > 1 时为进程池，否则为单个后台线程），
+        同时在途的图片数量有上限，消费者处理不过来时后台会暂停，内存占用保持有界。
+
+        Args:
+            split (str): 数据集分割名称，默认使用 config.split
+            batch_size (int): 每批样本数
+            prefetch (int): 预取的批次数
+            shuffle (bool): 是否打乱图片顺序，设置了 config.seed 时顺序可复现
+
+        Yields:
+            tuple: (images, bboxes, class_labels)，分别为RGB图片、(N, 4) YOLO边界框、(N,) 类别的列表
+
+        Example:
+            >>> for images, bboxes, class_labels in pipeline.stream('train', batch_size=32):
+            ...     train_step(images, bboxes, class_labels)
+        """
+        split = split or self.config.split
+        self.dataset.set_split(split)
+        image_paths = self.dataset.get_image_index(split).labeled_images()
+        if shuffle:
+            random.Random(self.config.seed).shuffle(image_paths)
+        if not image_paths:
+            return
+        processed_labels = self._prepare_labels(split)
+
+        # 每张图片产出 num_samples 个样本，据此换算在途图片数上限
+        max_pending = max(self.config.num_workers,
+                          -(-prefetch * batch_size // max(1, self.config.num_samples)))
+
+        images, bboxes, class_labels = [], [], []
+        for img_path, samples, error in self._iter_samples(split, image_paths, max_pending, processed_labels):
+            if error:
+                self.failures.append((img_path, error))
+                continue
+            for image, sample_bboxes, sample_labels in samples:
+                images.append(image)
+                bboxes.append(sample_bboxes)
+                class_labels.append(sample_labels)
+                if len(images) == batch_size:
+                    yield images, bboxes, class_labels
+                    images, bboxes, class_labels = [], [], []
+        if images:
+            yield images, bboxes, class_labels
+
+    def _iter_samples(self, split, image_paths, max_pending, processed_labels):
+        """在后台生成样本，最多 max_pending 张图片同时在途，按输入顺序产出 (图片路径, 样本, 错误信息)
+
+        进程池模式下worker回传各自的阶段耗时，在这里合并到 self.stage_times。
+        """
+        in_workers = self.config.num_workers > 1
+        if in_workers:
+            executor = ProcessPoolExecutor(
+                max_workers=self.config.num_workers,
+                initializer=_init_worker,
+                initargs=(self.config, split, processed_labels)
+            )
+            submit = partial(executor.submit, _generate_in_worker)
+        else:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='aug-stream')
+            submit = partial(executor.submit, _try_generate, self)
+
+        paths = iter(image_paths)
+        pending = deque(submit(path) for path in islice(paths, max_pending))
+        try:
+            while pending:
+                result = pending.popleft().result()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append(submit(next_path))
+                if in_workers:
+                    # 合并worker回传的阶段耗时
+                    *result, stage_times = result
+                    self.stage_times.merge(stage_times)
+                yield tuple(result)
+        finally:
+            # 消费者提前退出时取消尚未开始的任务
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _load_sample(self, image_path) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """读取图片和标签并预处理边界框，没有有效标签时返回None"""
+        # 先读取标签，没有有效标签的图片无需解码
+        labels = self.dataset.read_labels(image_path)
+        if not labels:
+            return None
+
+        # 读取图片
+        with self.stage_times.measure('read'):
+            image = self.dataset.read_image(image_path)
+
+        # 预处理边界框（已做过数据集级预处理时跳过）
+        bboxes = labels.bboxes if labels.preprocessed else AugmentationTransforms.preprocess_bboxes(labels.bboxes)
+        return image, bboxes, labels.classes
+
+    def _generate_samples(self, image_path) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """对单张图片生成 num_samples 个增强样本，不写盘"""
+        sample = self._load_sample(image_path)
+        if sample is None:
+            return []
+        image, bboxes, class_labels = sample
+
+        samples = []
+        for _ in range(self.config.num_samples):
+            with self.stage_times.measure('transform'):
+                transformed = self.transform(image=image, bboxes=bboxes, class_labels=class_labels)
+            samples.append((
+                transformed['image'],
+                np.asarray(transformed['bboxes'], dtype=np.float32).reshape(-1, 4),
+                np.asarray(transformed['class_labels'], dtype=np.int64)
+            ))
+        return samples
+
     def _process_images(self, split, input_dir, output_dir):
         """处理指定split的所有图片
         
@@ -88,65 +259,148 @@ class AugmentationPipeline:
             split (str): 数据集分割名称 ('train' 或 'val')
             input_dir (str): 输入图片目录路径
             output_dir (str): 输出图片目录路径
+
+        Returns:
+            list: 处理失败的 (图片路径, 错误信息) 列表
         """
         try:
             self.dataset.set_split(split)
             
-            # 使用新的图片文件匹配方式
-            input_path = Path(input_dir)
-            image_paths = []
-            image_extensions = [
-                '*.jpg', '*.jpeg', '*.JPG', '*.JPEG',
-                '*.png', '*.PNG',
-                '*.bmp', '*.BMP',
-                '*.tif', '*.tiff', '*.TIF', '*.TIFF'
-            ]
-            
-            for ext in image_extensions:
-                image_paths.extend(list(input_path.glob(ext)))
-            
+            # 单次遍历目录构建的图片/标签索引，后续阶段复用
+            image_paths = self.dataset.get_image_index(split).images
+
             if not image_paths:
                 print(f"警告: {split} 集中没有找到图片")
-                return
-            
-            for img_path in tqdm(image_paths, desc=f"正在进行数据增强： {split} 集图片"):
-                try:
-                    self._augment_single_image(img_path)
-                except Exception as e:
-                    print(f"\n警告: 处理图片 {img_path} 时出错: {str(e)}")
-                    continue
+                return []
+
+            # 增量模式下跳过清单中已是最新的图片
+            entries = self._select_pending(split, image_paths)
+            if entries is not None:
+                skipped = len(image_paths) - len(entries)
+                image_paths = [p for p in image_paths if str(p) in entries]
+                if skipped:
+                    print(f"跳过 {skipped} 张已是最新的图片，待处理 {len(image_paths)} 张")
+                if not image_paths:
+                    return []
+
+            processed_labels = self._prepare_labels(split)
+
+            if self.config.num_workers > 1:
+                num_workers = min(self.config.num_workers, len(image_paths))
+                results = self._iter_results_parallel(split, image_paths, num_workers, processed_labels)
+                desc = f"正在进行数据增强({num_workers}进程)： {split} 集图片"
+            else:
+                results = self._iter_results_serial(image_paths)
+                desc = f"正在进行数据增强： {split} 集图片"
+
+            failures = []
+            for img_path, outputs, error in tqdm(results, total=len(image_paths), desc=desc):
+                if error:
+                    failures.append((img_path, error))
+                elif entries is not None:
+                    self.manifest.record(entries[img_path], outputs)
+
+            self.failures.extend(failures)
+            if failures:
+                print(f"\n警告: {split} 集中有 {len(failures)} 张图片处理失败")
+            return failures
         except Exception as e:
             print(f"\n错误: 处理 {split} 集时发生错误: {str(e)}")
             raise
-        
-    def _augment_single_image(self, image_path):
+
+    def _prepare_labels(self, split) -> LabelCache:
+        """在启动worker前完成数据集级的标签读取和边界框检查，结果传给各worker复用"""
+        with self.stage_times.measure('labels'):
+            processed_labels = self.dataset.prepare_labels(split)
+        print(f"边界框检查: {self.dataset.bbox_reports[split].summary()}")
+        return processed_labels
+
+    def _select_pending(self, split, image_paths) -> Optional[Dict[str, ManifestEntry]]:
+        """根据增强清单筛选需要处理的图片
+
+        Args:
+            split (str): 数据集分割名称
+            image_paths (list): 全部图片路径
+
+        Returns:
+            dict: 需要处理的 {图片路径: 清单项}，未启用增量模式时返回None
+        """
+        if self.manifest is None:
+            return None
+
+        pending = {}
+        for img_path in image_paths:
+            entry = self.manifest.build_entry(
+                key=f"{split}/{img_path.name}",
+                image_path=img_path,
+                label_path=self.dataset.get_label_path(img_path)
+            )
+            if not self.manifest.is_up_to_date(entry):
+                pending[str(img_path)] = entry
+        return pending
+
+    def _iter_results_serial(self, image_paths):
+        """在当前进程中逐张处理图片，产出 (图片路径, 输出文件, 错误信息)"""
+        for img_path in image_paths:
+            outputs, error = _try_augment(self, img_path)
+            yield str(img_path), outputs, error
+
+    def _iter_results_parallel(self, split, image_paths, num_workers, processed_labels):
+        """使用进程池并行处理图片，每个worker持有独立的转换器
+
+        Args:
+            split (str): 数据集分割名称
+            image_paths (list): 需要处理的图片路径
+            num_workers (int): 进程数
+            processed_labels (LabelCache): 主进程中预处理好的标签
+
+        Yields:
+            tuple: (图片路径, 输出文件, 错误信息)
+        """
+        chunksize = max(1, len(image_paths) // (num_workers * 8))
+
+        with ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=_init_worker,
+                initargs=(self.config, split, processed_labels)
+        ) as executor:
+            results = executor.map(_augment_in_worker, image_paths, chunksize=chunksize)
+            for img_path, outputs, error, encode_stats, stage_times in results:
+                # 合并worker回传的编码/写盘统计和阶段耗时
+                self.dataset.encode_stats.merge(encode_stats)
+                self.stage_times.merge(stage_times)
+                yield img_path, outputs, error
+
+    def _augment_single_image(self, image_path) -> List[Path]:
         """处理单张图片并保存到新路径
         
         Args:
             image_path (str): 原始图片的路径
+
+        Returns:
+            list: 生成的图片和标签文件路径
         """
-        # 读取图片
-        image = self.dataset.read_image(image_path)
-        
-        # 读取标签
-        labels = self.dataset.read_labels(image_path)
-        if not labels:
-            return
-        
-        # 预处理边界框
-        bboxes = AugmentationTransforms.preprocess_bboxes(labels.bboxes)
+        sample = self._load_sample(image_path)
+        if sample is None:
+            return []
+        image, bboxes, class_labels = sample
         
         # 获取原始文件名（不含路径）
         original_filename = Path(image_path).name
         base_name = Path(original_filename).stem
         
+        if self.config.batch_samples:
+            return self._augment_batch(image, bboxes, class_labels, image_path)
+
         # 生成增强样本
+        outputs = []
         for i in range(self.config.num_samples):
-            transformed = self.transform(
-                image=image,
-                bboxes=bboxes,
-                class_labels=labels.classes
-            )
+            with self.stage_times.measure('transform'):
+                transformed = self.transform(
+                    image=image,
+                    bboxes=bboxes,
+                    class_labels=class_labels
+                )
             
             # 构造新的文件名：原始名称_aug_序号
             augmented_filename = f"{base_name}_aug_{i}"
@@ -157,4 +411,113 @@ class AugmentationPipeline:
                 transformed=transformed,
                 aug_index=i,
                 augmented_filename=augmented_filename
-            ) 
\ No newline at end of file
+            )
+            outputs.extend(self.dataset.get_augmented_paths(augmented_filename, image_path))
+        return outputs
+
+    def _augment_batch(self, image, bboxes, class_labels, image_path):
+        """批量模式：对同一张已解码的图片生成全部增强样本
+
+        每个样本转换完成后立即转为BGR写入预分配的输出缓冲区，并交给后台线程编码写盘，
+        使后续样本的转换与前面样本的JPEG编码、写盘重叠进行。返回前等待本图片的全部写入完成，
+        因此写入错误会归属到当前图片，缓冲区也可在下一张图片中安全复用。
+
+        Args:
+            image (np.ndarray): RGB格式的原始图片
+            bboxes (np.ndarray): 预处理后的边界框
+            class_labels (list): 类别标签
+            image_path (Path): 原始图片路径
+
+        Returns:
+            list: 生成的图片和标签文件路径
+        """
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=self.config.writer_threads,
+                                              thread_name_prefix='aug-writer')
+
+        base_name = Path(image_path).stem
+        futures = []
+        outputs = []
+        try:
+            for i in range(self.config.num_samples):
+                with self.stage_times.measure('transform'):
+                    transformed = self.transform(
+                        image=image,
+                        bboxes=bboxes,
+                        class_labels=class_labels
+                    )
+                output = self._get_output_slot(i, transformed['image'])
+                cv2.cvtColor(transformed['image'], cv2.COLOR_RGB2BGR, dst=output)
+                augmented_filename = f"{base_name}_aug_{i}"
+                futures.append(self._writer.submit(
+                    self.dataset.write_augmented_files,
+                    output,
+                    transformed['bboxes'],
+                    transformed['class_labels'],
+                    augmented_filename,
+                    Path(image_path)
+                ))
+                outputs.extend(self.dataset.get_augmented_paths(augmented_filename, image_path))
+        finally:
+            # 等待本批次写入完成，缓冲区之后才能被复用
+            wait(futures)
+        for future in futures:
+            future.result()
+        return outputs
+
+    def _get_output_slot(self, index: int, image: np.ndarray) -> np.ndarray:
+        """获取第index个样本的预分配输出数组，尺寸或类型变化时重新分配"""
+        batch_shape = (self.config.num_samples, *image.shape)
+        if (self._output_buffer is None or self._output_buffer.shape != batch_shape
+                or self._output_buffer.dtype != image.dtype):
+            self._output_buffer = np.empty(batch_shape, dtype=image.dtype)
+        return self._output_buffer[index]
+
+
+def _image_seed(seed: int, image_path) -> int:
+    """单张图片的随机种子，由 seed 和文件名确定，与由哪个进程、按什么顺序处理无关"""
+    return (seed + zlib.crc32(Path(image_path).name.encode('utf-8'))) % 2 ** 32
+
+
+def _seed_for_image(pipeline: AugmentationPipeline, image_path):
+    """设置了 config.seed 时，处理每张图片前重新设置转换器和全局随机数生成器的种子"""
+    if pipeline.config.seed is not None:
+        AugmentationTransforms.seed_transform(pipeline.transform, _image_seed(pipeline.config.seed, image_path))
+
+
+def _try_augment(pipeline: AugmentationPipeline, image_path) -> Tuple[List[Path], Optional[str]]:
+    """处理单张图片，返回 (输出文件, 错误信息) 而不是抛出异常"""
+    try:
+        _seed_for_image(pipeline, image_path)
+        return pipeline._augment_single_image(image_path), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+
+def _init_worker(config: AugmentationConfig, split: str, processed_labels: LabelCache):
+    """进程池worker初始化：创建独立的流水线和转换器"""
+    global _worker_pipeline
+    _worker_pipeline = AugmentationPipeline(config)
+    _worker_pipeline.dataset.set_split(split)
+    _worker_pipeline.dataset.set_processed_labels(split, processed_labels)
+
+
+def _augment_in_worker(image_path) -> Tuple[str, List[Path], Optional[str], EncodeStats, StageTimes]:
+    """worker中处理单张图片，将结果和本张图片的编码统计、阶段耗时回传给主进程"""
+    outputs, error = _try_augment(_worker_pipeline, image_path)
+    return (str(image_path), outputs, error,
+            _worker_pipeline.dataset.encode_stats.pop(), _worker_pipeline.stage_times.pop())
+
+
+def _try_generate(pipeline: AugmentationPipeline, image_path) -> Tuple[str, list, Optional[str]]:
+    """生成单张图片的增强样本，返回 (图片路径, 样本, 错误信息) 而不是抛出异常"""
+    try:
+        _seed_for_image(pipeline, image_path)
+        return str(image_path), pipeline._generate_samples(image_path), None
+    except Exception as e:
+        return str(image_path), [], f"{type(e).__name__}: {e}"
+
+
+def _generate_in_worker(image_path) -> Tuple[str, list, Optional[str], StageTimes]:
+    """worker中生成单张图片的增强样本，连同本张图片的阶段耗时回传给主进程"""
+    return (*_try_generate(_worker_pipeline, image_path), _worker_pipeline.stage_times.pop())
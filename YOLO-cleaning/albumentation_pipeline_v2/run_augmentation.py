@@ -7,7 +7,8 @@ def main():
         version="augmented_v0",
         num_samples=3,
         create_new_dataset=True,
-        split='train'
+        split='train',
+        num_workers=0  # 0 表示使用全部CPU核心
     )
     
     pipeline = AugmentationPipeline(config)
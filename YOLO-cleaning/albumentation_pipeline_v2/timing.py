@@ -0,0 +1,61 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class StageTimes:
+    """按阶段累计耗时和次数，可在线程间共享，也可从worker进程回传后合并
+
+    阶段名称约定: read（图片解码）、labels（标签读取和边界框检查）、transform（数据增强）、
+    encode/write（图片编码和写盘，来自 EncodeStats）。
+    """
+
+    def __init__(self, seconds: Dict[str, float] = None, counts: Dict[str, int] = None):
+        self.seconds: Dict[str, float] = dict(seconds or {})
+        self.counts: Dict[str, int] = dict(counts or {})
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, count: int = 1):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + count
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """统计代码块耗时，计入 stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def merge(self, other: 'StageTimes'):
+        with self._lock:
+            for stage, seconds in other.seconds.items():
+                self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+                self.counts[stage] = self.counts.get(stage, 0) + other.counts.get(stage, 0)
+
+    def pop(self) -> 'StageTimes':
+        """取出当前统计并清零"""
+        with self._lock:
+            snapshot = StageTimes(self.seconds, self.counts)
+            self.seconds.clear()
+            self.counts.clear()
+        return snapshot
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {stage: {'seconds': self.seconds[stage], 'count': self.counts.get(stage, 0)}
+                for stage in self.seconds}
+
+    def summary(self) -> str:
+        if not self.seconds:
+            return "无阶段统计"
+        return ", ".join(f"{stage} {seconds:.2f}s/{self.counts.get(stage, 0)}次"
+                         for stage, seconds in self.seconds.items())
+
+    def __getstate__(self):
+        return {'seconds': self.seconds, 'counts': self.counts}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
@@ -1,3 +1,4 @@
+import random
 import albumentations as A
 import numpy as np
 from typing import List, Dict
@@ -15,6 +16,15 @@ class AugmentationTransforms:
             label_fields=['class_labels']
         ))
     
+    @staticmethod
+    def seed_transform(transform: A.Compose, seed: int):
+        """为转换器及全局随机数生成器设置种子，保证每张图片的增强结果可复现"""
+        random.seed(seed)
+        np.random.seed(seed)
+        # albumentations>=1.4.22 的 Compose 持有独立的随机数生成器
+        if hasattr(transform, 'set_random_seed'):
+            transform.set_random_seed(seed)
+
     @staticmethod
     def preprocess_bboxes(bboxes: List[List[float]]) -> np.ndarray:
         """预处理边界框"""
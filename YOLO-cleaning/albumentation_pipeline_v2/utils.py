@@ -2,19 +2,12 @@ from pathlib import Path
 from typing import List
 import cv2
 import numpy as np
+from .label_io import read_label_array
 
-def read_yolo_label(label_path: Path) -> List[List[float]]:
-    """读取YOLO格式的标注文件"""
-    if not label_path.exists():
-        return []
-        
-    labels = []
-    with open(label_path, 'r') as f:
-        for line in f:
-            data = list(map(float, line.strip().split()))
-            labels.append(data)
-    return labels
+def read_yolo_label(label_path: Path) -> np.ndarray:
+    """读取YOLO格式的标注文件为 (N, 5) 数组"""
+    return read_label_array(label_path)
 
 def ensure_valid_bbox(bbox: List[float]) -> bool:
     """验证边界框是否有效"""
-    return all(0.0 <= x <= 1.0 for x in bbox) 
\ No newline at end of file
+    return all(0.0 <= x <= 1.0 for x in bbox)
\ No newline at end of file
@@ -9,13 +9,19 @@ from typing import Optional, Dict, List, Tuple
 from datetime import datetime
 import numpy as np
 import json
+import sys
+from collections import Counter
 
-image_extensions = [
-    '*.jpg', '*.jpeg', '*.JPG', '*.JPEG',
-    '*.png', '*.PNG',
-    '*.bmp', '*.BMP',
-    '*.tif', '*.tiff', '*.TIF', '*.TIFF'
-]
+# 复用 albumentation_pipeline_v2 中的标签读写模块；作为脚本直接运行时
+# （python augmentation/image_transform_pipeline.py）把 YOLO-cleaning 目录加入搜索路径，
+# 作为模块导入（python -m augmentation.image_transform_pipeline、benchmark）时不修改 sys.path
+if not __package__:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from albumentation_pipeline_v2.label_io import (  # noqa: E402
+    preprocess_label_array, read_label_dir, write_label_array)
+from albumentation_pipeline_v2.image_index import scan_image_dir  # noqa: E402
+from albumentation_pipeline_v2.file_ops import link_or_copy  # noqa: E402
+from albumentation_pipeline_v2.timing import StageTimes  # noqa: E402
 
 
 def load_yaml_config(yaml_path: str) -> Dict:
@@ -99,26 +105,6 @@ def copy_dataset_structure(
         yaml.dump(new_config, f, default_flow_style=False)
 
 
-def read_yolo_label(label_path: Path) -> List[List[float]]:
-    """
-    读取YOLO格式的标注文件
-    
-    Args:
-        label_path: 标注文件路径
-    Returns:
-        标注列表 [class_id, x_center, y_center, width, height]
-    """
-    if not label_path.exists():
-        return []
-
-    labels = []
-    with open(label_path, 'r') as f:
-        for line in f:
-            data = list(map(float, line.strip().split()))
-            labels.append(data)
-    return labels
-
-
 def yolo_to_albumentations(
         bbox: List[float],
         img_width: int,
@@ -138,35 +124,6 @@ def yolo_to_albumentations(
     return [x_min, y_min, x_max, y_max]
 
 
-def preprocess_bboxes(bboxes):
-    """预处理bbox，处理浮点数精度问题和边界框坐标"""
-    EPSILON = 1e-6
-    processed = np.array(bboxes)
-
-    # 将接近0的值设为0
-    processed[np.abs(processed) < EPSILON] = 0
-    # 将接近1的值设为1
-    processed[np.abs(processed - 1) < EPSILON] = 1
-
-    # 调整中心点，确保x_min和y_min不会为负
-    center_coords = processed[..., :2]  # 获取中心点坐标
-    dimensions = processed[..., 2:]  # 获取宽高
-
-    # 计算最小允许的中心点坐标，防止边界框超出图像
-    min_centers = dimensions / 2
-    # 计算最大允许的中心点坐标
-    max_centers = 1 - dimensions / 2
-
-    # 将中心点限制在合理范围内
-    center_coords = np.maximum(min_centers, np.minimum(max_centers, center_coords))
-
-    # 重新组合结果
-    processed[..., :2] = center_coords
-    processed[..., 2:] = dimensions
-
-    return processed
-
-
 def create_augmentation_record(
         base_path: Path,
         transform_params: Dict,
@@ -203,7 +160,9 @@ def augment_images(
         split: str = 'train',
         num_samples: int = 5,
         create_new_dataset: bool = False,
-        version: Optional[str] = None
+        version: Optional[str] = None,
+        link_mode: str = 'copy',
+        stage_times: Optional[StageTimes] = None
 ):
     """
     根据yaml配置对指定split的图片进行数据增强
@@ -214,16 +173,22 @@ def augment_images(
         num_samples: 每张图片增强的数量
         create_new_dataset: 是否创建新的数据集结构
         version: 新数据集版本标识，如果为None则使用时间戳
+        link_mode: 原始文件复制到新数据集的方式，copy/reflink/hardlink/symlink/auto，
+            链接失败时自动回退到复制
+        stage_times: 各阶段耗时统计（read/labels/transform/encode/write），为None时内部创建
     """
     if split not in ['train', 'val', 'all']:
         raise ValueError("split must be one of 'train', 'val', or 'all'")
+    if stage_times is None:
+        stage_times = StageTimes()
 
     # 设置版本标识
     if create_new_dataset:
         if version is None:
             version = datetime.now().strftime('%Y%m%d_%H%M%S')
         new_paths = create_new_dataset_structure(yaml_path, version)
-        copy_dataset_structure(yaml_path, new_paths)
+        # 标签会在下面逐split复制原始文件时一并复制
+        copy_dataset_structure(yaml_path, new_paths, copy_labels=False)
         print(f"\n=== 创建新数据集结构 ===")
         print(f"新数据集路径: {new_paths['base']}")
 
@@ -259,22 +224,20 @@ def augment_images(
     for split_name in ['train', 'val']:
         input_dir = base_path / config[split_name].lstrip('./')
         label_dir = base_path / 'labels' / split_name
+        # 单次遍历图片和标签目录，复制和增强阶段共用
+        index = scan_image_dir(input_dir, label_dir)
 
         if create_new_dataset:
             output_dir = new_paths[f'images_{split_name}']
             output_label_dir = new_paths[f'labels_{split_name}']
-            # 首先收集所有需要复制的文件
-            image_files_to_copy = []
-            for ext in image_extensions:
-                image_files_to_copy.extend(list(input_dir.glob(ext)))
-
             # 使用tqdm显示复制进度
             print(f"\n复制原始文件到 {split_name} 集:")
-            for img_path in tqdm(image_files_to_copy, desc=f"复制{split_name}集文件"):
-                shutil.copy2(img_path, output_dir)
-                label_path = label_dir / f"{img_path.stem}.txt"
-                if label_path.exists():
-                    shutil.copy2(label_path, output_label_dir)
+            copy_stats = Counter()
+            for img_path, label_path in tqdm(index.pairs(), desc=f"复制{split_name}集文件"):
+                copy_stats[link_or_copy(img_path, output_dir / img_path.name, link_mode)] += 1
+                if label_path is not None:
+                    copy_stats[link_or_copy(label_path, output_label_dir / label_path.name, link_mode)] += 1
+            print(f"复制方式统计: {dict(copy_stats)}")
 
             # 只对指定的split进行增强
             if split_name not in splits:
@@ -292,14 +255,25 @@ def augment_images(
         print(f"输出图片目录: {output_dir}")
         print(f"输出标签目录: {output_label_dir}")
 
-        # 获取所有支持格式的图片文件
-        image_files = []
-        for ext in image_extensions:
-            image_files.extend(list(input_dir.glob(ext)))
+        # 只有存在标签文件的图片才需要增强
+        image_files = index.labeled_images()
+
+        # 一次性读取整个split的标签，并对全部边界框做向量化的校验和预处理
+        with stage_times.measure('labels'):
+            labels, offsets, _ = read_label_dir(label_dir, [p.stem for p in image_files])
+            labels, offsets, report = preprocess_label_array(labels, offsets)
+        print(f"边界框检查: {report.summary()}")
+
+        for idx, img_path in enumerate(tqdm(image_files, desc=f"增强{split_name}集")):
+            rows = labels[offsets[idx]:offsets[idx + 1]]
+            if not len(rows):  # 如果没有有效的边界框，跳过这张图片
+                continue
+            bboxes = rows[:, 1:]
+            class_labels = rows[:, 0].astype(np.int64)
 
-        for img_path in tqdm(image_files, desc=f"增强{split_name}集"):
             # 读取图片
-            image = cv2.imread(str(img_path))
+            with stage_times.measure('read'):
+                image = cv2.imread(str(img_path))
             if image is None:
                 print(f"警告: 无法读取图片 {img_path}")
                 continue
@@ -307,36 +281,15 @@ def augment_images(
             height, width = image.shape[:2]
             image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
-            # 读取对应的标签文件
-            label_path = label_dir / f"{img_path.stem}.txt"
-            labels = read_yolo_label(label_path)
-
-            if not labels:
-                continue
-
-            # 准备数据增强的标注格式
-            bboxes = []
-            class_labels = []
-            for label in labels:
-                class_labels.append(int(label[0]))
-                bbox = label[1:]  # 裁剪边界框坐标
-                if all(0.0 <= x <= 1.0 for x in bbox):  # 确保所有坐标都在有效范围内
-                    bboxes.append(bbox)
-                else:
-                    continue  # 跳过无效的边界框
-
-            if not bboxes:  # 如果没有有效的边界框，跳过这张图片
-                continue
-
             # 对每张图片生成多个增强版本
             for i in range(num_samples):
                 # 应用数据增强
-                bboxes = preprocess_bboxes(bboxes)
-                transformed = transform(
-                    image=image,
-                    bboxes=bboxes,
-                    class_labels=class_labels
-                )
+                with stage_times.measure('transform'):
+                    transformed = transform(
+                        image=image,
+                        bboxes=bboxes,
+                        class_labels=class_labels
+                    )
 
                 aug_image = cv2.cvtColor(transformed['image'], cv2.COLOR_RGB2BGR)
                 aug_bboxes = transformed['bboxes']
@@ -345,15 +298,18 @@ def augment_images(
                 # 保存增强后的图片
                 output_filename = f"{img_path.stem}_aug_{i + 1}.jpg"
                 output_path = output_dir / output_filename
-                cv2.imwrite(str(output_path), aug_image)
-
-                # 保存增强后的标签
-                output_label_path = output_label_dir / f"{img_path.stem}_aug_{i + 1}.txt"
-                with open(output_label_path, 'w') as f:
-                    for bbox, class_label in zip(aug_bboxes, aug_labels):
-                        # 写入YOLO格式：class_id x_center y_center width height
-                        line = f"{class_label} {' '.join(map(str, bbox))}\n"
-                        f.write(line)
+                with stage_times.measure('encode'):
+                    success, buffer = cv2.imencode('.jpg', aug_image)
+                if not success:
+                    print(f"警告: 图片编码失败 {output_path}")
+                    continue
+                with stage_times.measure('write'):
+                    buffer.tofile(str(output_path))
+
+                    # 保存增强后的标签
+                    output_label_path = output_label_dir / f"{img_path.stem}_aug_{i + 1}.txt"
+                    # 写入YOLO格式：class_id x_center y_center width height
+                    write_label_array(output_label_path, aug_labels, aug_bboxes)
 
 
 if __name__ == "__main__":
@@ -1,56 +1,278 @@
 """
 This is a script for auto labelling images using custom YOLO model.
+
+图片在后台线程中读取解码并放入队列，主线程按批次推理；原图按字节复制（或链接）到输出目录，
+不重新编码；每个批次的检测框一次性按置信度和类别过滤，转换为YOLO格式写入标注文件。
+
+每批标注写完后把文件名追加到输出目录的运行记录（autolabel_manifest.jsonl），
+中断后再次运行会跳过已完成的图片。
 """
 import argparse
+import json
 import os
+import queue
+import shutil
+import threading
 from pathlib import Path
-from ultralytics import YOLO
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
 import cv2
 import numpy as np
+import torch
+from ultralytics import YOLO
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+# 原图放到输出目录的方式：复制、硬链接、符号链接
+LINK_MODES = ('copy', 'hardlink', 'symlink')
+DEFAULT_BATCH_SIZE = 16
+# 与ultralytics预测的默认置信度一致
+DEFAULT_CONF = 0.25
+MANIFEST_NAME = 'autolabel_manifest.jsonl'
+
+_END = None
+
+
+def place_image(src: Path, dst: Path, link_mode: str = 'copy'):
+    """把原图按字节放到输出目录；硬链接失败（如跨文件系统）时退回复制
+
+    先写到同目录的临时文件再替换目标，失败时不会删掉已有文件；目标就是原图本身时不做任何操作。
+    """
+    if dst.exists() and os.path.samefile(src, dst):
+        return
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    if tmp.exists() or tmp.is_symlink():
+        tmp.unlink()
+    try:
+        if link_mode == 'symlink':
+            os.symlink(src.resolve(), tmp)
+        elif link_mode == 'hardlink':
+            try:
+                os.link(src, tmp)
+            except OSError:
+                shutil.copyfile(src, tmp)
+        else:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if tmp.exists() or tmp.is_symlink():
+            tmp.unlink()
+
+
+def _decode_worker(files: List[Path], output_images: Path, link_mode: str,
+                   out_queue: queue.Queue, stop: threading.Event):
+    """后台线程：读取解码图片并放入原图，解码结果放入队列；出错时把异常放入队列交给主线程抛出"""
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for img_file in files:
+            # np.fromfile + imdecode 支持中文路径
+            img = cv2.imdecode(np.fromfile(img_file, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                print(f"无法读取图片: {img_file}")
+                continue
+            place_image(img_file, output_images / img_file.name, link_mode)
+            if not put((img_file, img)):
+                return
+    except Exception as e:
+        put(e)
+        return
+    put(_END)
+
+
+def iter_batches(files: List[Path], output_images: Path, link_mode: str,
+                 batch_size: int) -> Iterator[List[Tuple[Path, np.ndarray]]]:
+    """由后台解码线程供给的图片批次，队列最多缓存两个批次"""
+    out_queue: queue.Queue = queue.Queue(maxsize=batch_size * 2)
+    stop = threading.Event()
+    worker = threading.Thread(target=_decode_worker, args=(files, output_images, link_mode, out_queue, stop),
+                              daemon=True)
+    worker.start()
+    try:
+        batch = []
+        while (item := out_queue.get()) is not _END:
+            if isinstance(item, Exception):
+                raise item
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        stop.set()
+        worker.join()
+
+
+def batch_labels(results, conf: float = 0.0, classes: Optional[Sequence[int]] = None) -> List[np.ndarray]:
+    """把一个批次的检测结果一次性过滤并转换为每张图片的 (n, 5) 数组：类别、x、y、w、h（归一化）
 
+    Args:
+        results: 模型对一个批次的预测结果
+        conf: 置信度低于该值的检测框丢弃
+        classes: 只保留这些类别，None 表示全部保留
+    """
+    counts = [len(r.boxes) for r in results]
+    if not sum(counts):
+        return [np.empty((0, 5), dtype=np.float32) for _ in results]
+    boxes = torch.cat([torch.cat((r.boxes.cls[:, None], r.boxes.conf[:, None], r.boxes.xywhn), dim=1)
+                       for r in results])
+    owner = torch.repeat_interleave(torch.arange(len(results), device=boxes.device),
+                                    torch.tensor(counts, device=boxes.device))
+    keep = boxes[:, 1] >= conf
+    if classes is not None:
+        keep &= torch.isin(boxes[:, 0], torch.tensor(list(classes), dtype=boxes.dtype, device=boxes.device))
+    counts = torch.bincount(owner[keep], minlength=len(results)).tolist()
+    labels = boxes[keep][:, [0, 2, 3, 4, 5]].cpu().numpy()
+    return np.split(labels, np.cumsum(counts)[:-1])
+
+
+def write_labels(label_path: Path, labels: np.ndarray):
+    with open(label_path, 'w') as f:
+        if len(labels):
+            np.savetxt(f, labels, fmt='%d %.6f %.6f %.6f %.6f')
+
+
+class RunManifest:
+    """运行记录：第一行为运行参数，之后每行一张已完成的图片
+
+    参数与上次不一致时（如换了输入文件夹、权重或阈值）拒绝续跑，避免同一输出目录混入不同设置的标注；
+    已有记录中没有参数行（空文件或被截断）时同样拒绝。崩溃时可能留下不完整的最后一行，读取时忽略。
+    """
+
+    def __init__(self, path: Path, settings: Dict, restart: bool = False):
+        self.path = path
+        self.done: Set[str] = set()
+        if path.exists() and not restart:
+            complete = self._load(settings)
+            self._file = open(path, 'a', encoding='utf-8')
+            if not complete:
+                # 补上换行，避免新记录接在崩溃留下的半行后面
+                self._file.write('\n')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._write({'settings': settings})
+            self._file.flush()
+
+    def _load(self, settings: Dict) -> bool:
+        """读取已完成的图片，返回最后一行是否完整"""
+        line = '\n'
+        found_settings = False
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if 'settings' in record:
+                    found_settings = True
+                    if record['settings'] != settings:
+                        raise ValueError(f"{self.path} 中的运行参数与本次不同: {record['settings']}，"
+                                         f"使用 --restart 重新开始")
+                elif 'file' in record:
+                    self.done.add(record['file'])
+        if not found_settings:
+            raise ValueError(f"{self.path} 中没有运行参数，无法确认能否续跑，使用 --restart 重新开始")
+        return line.endswith('\n')
+
+    def _write(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def mark_done(self, names: Sequence[str]):
+        """标注文件写完后调用，落盘后才算完成"""
+        for name in names:
+            self._write({'file': name})
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.update(names)
+
+    def close(self):
+        self._file.close()
+
+
+def process_images(input_folder: str, weights_path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                   link_mode: str = 'copy', output_root: str = '.', conf: float = DEFAULT_CONF,
+                   classes: Optional[Sequence[int]] = None, restart: bool = False):
+    """自动标注文件夹中的图片
+
+    Args:
+        input_folder: 输入图片文件夹
+        weights_path: YOLO模型权重文件
+        batch_size: 每批推理的图片数
+        link_mode: 原图放到输出目录的方式：copy、hardlink、symlink
+        output_root: 输出根目录，其下生成 images、labels 和运行记录
+        conf: 置信度阈值
+        classes: 保留的类别编号，None 表示全部保留
+        restart: 忽略运行记录，全部重新标注
+    """
+    if link_mode not in LINK_MODES:
+        raise ValueError(f"link_mode 只支持 {LINK_MODES}")
+    classes = sorted(set(classes)) if classes is not None else None
+
+    # 创建输出文件夹
+    output_root = Path(output_root)
+    output_images = output_root / 'images'
+    output_labels = output_root / 'labels'
+    if output_images.resolve() == Path(input_folder).resolve():
+        raise ValueError(f"输出图片目录 {output_images} 与输入文件夹相同，请用 --output-root 指定其他目录")
+    output_images.mkdir(parents=True, exist_ok=True)
+    output_labels.mkdir(parents=True, exist_ok=True)
+
+    settings = {'input': str(Path(input_folder).resolve()), 'weights': str(Path(weights_path).resolve()),
+                'conf': conf, 'classes': classes}
+    manifest = RunManifest(output_root / MANIFEST_NAME, settings, restart)
+    files = sorted(p for p in Path(input_folder).glob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    pending = [p for p in files if p.name not in manifest.done]
+    if len(pending) < len(files):
+        print(f"跳过已完成的 {len(files) - len(pending)} 张图片")
 
-def process_images(input_folder: str, weights_path: str):
     # 加载YOLO模型
     model = YOLO(weights_path)
 
-    # 创建输出文件夹
-    output_images = Path('images')
-    output_labels = Path('labels')
-    output_images.mkdir(exist_ok=True)
-    output_labels.mkdir(exist_ok=True)
-
-    # 处理输入文件夹中的每张图片
-    for img_file in Path(input_folder).glob('*'):
-        if img_file.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp']:
-            # 读取图片
-            img = cv2.imread(str(img_file))
-
-            # 进行预测
-            results = model(img)
-
-            # 保存图片
-            cv2.imwrite(str(output_images / img_file.name), img)
-
-            # 保存标注
-            with open(output_labels / f"{img_file.stem}.txt", 'w') as f:
-                for r in results:
-                    boxes = r.boxes
-                    for box in boxes:
-                        cls, x, y, w, h = box.cls.cpu().numpy()[0], *box.xywhn.cpu().numpy()[0]
-                        f.write(f"{int(cls)} {x} {y} {w} {h}\n")
+    processed = 0
+    try:
+        for batch in iter_batches(pending, output_images, link_mode, batch_size):
+            img_files, imgs = zip(*batch)
+            # 一次推理整个批次；conf 同时传给模型，使低于默认值的阈值也能生效
+            results = model(list(imgs), conf=conf, verbose=False)
+            for img_file, labels in zip(img_files, batch_labels(results, conf, classes)):
+                write_labels(output_labels / f"{img_file.stem}.txt", labels)
+            manifest.mark_done([img_file.name for img_file in img_files])
+            processed += len(batch)
+            print(f"已处理 {processed}/{len(pending)}")
+    finally:
+        manifest.close()
 
     print(f"处理完成。图片保存在 {output_images} 文件夹，标注保存在 {output_labels} 文件夹。")
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description='使用YOLO模型处理图片并生成标注')
     parser.add_argument('input_folder', type=str, help='输入图片文件夹路径')
     parser.add_argument('weights_path', type=str, help='YOLO模型权重文件路径')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批推理的图片数')
+    parser.add_argument('--link-mode', choices=LINK_MODES, default='copy',
+                        help='原图放到输出目录的方式：复制、硬链接、符号链接')
+    parser.add_argument('-o', '--output-root', default='.', help='输出根目录，其下生成 images 和 labels')
+    parser.add_argument('--conf', type=float, default=DEFAULT_CONF, help='置信度阈值')
+    parser.add_argument('--classes', type=int, nargs='+', help='只保留这些类别编号')
+    parser.add_argument('--restart', action='store_true', help='忽略运行记录，全部重新标注')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-    process_images(args.input_folder, args.weights_path)
+    try:
+        process_images(args.input_folder, args.weights_path, args.batch_size, args.link_mode,
+                       args.output_root, args.conf, args.classes, args.restart)
+    except ValueError as e:
+        parser.error(str(e))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
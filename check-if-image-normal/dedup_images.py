@@ -0,0 +1,245 @@
+"""近重复帧去重
+
+对目录中的图片计算感知哈希（dhash/phash），与持久化索引中已有的图片做汉明距离检索，
+距离不超过 radius 的视为近重复。索引保存为 .npz，新的数据可以增量去重：
+已在索引中且未修改的图片直接跳过，新图片与之前所有批次的图片比较。
+
+每组近重复图片中按路径排序最先出现的一张作为代表，只有代表进入检索表，
+其余记录 duplicate_of（代表的路径）和距离。
+
+用法:
+    python dedup_images.py /data/camera_dump_0901 -i dedup_index.npz --radius 6
+    python dedup_images.py /data/camera_dump_0902 -i dedup_index.npz --list > duplicates.tsv
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from perceptual_hash import HASH_BITS, HASH_FUNCTIONS, MultiIndexHashTable, to_signed
+from screen_images import DEFAULT_CHUNK_SIZE, FileInfo, _chunks, _init_worker, iter_image_files
+
+# 哈希只需要灰度图，直接以缩小的灰度解码
+REDUCE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+DEFAULT_RADIUS = 6
+_UNSIGNED_MASK = (1 << HASH_BITS) - 1
+
+# 索引文件的列及其类型；hash 以有符号int64保存
+INDEX_COLUMNS = {
+    'path': str,
+    'size': np.int64,
+    'mtime_ns': np.int64,
+    'hash': np.int64,
+    'duplicate_of': str,
+    'distance': np.int64,
+    'error': str,
+}
+
+
+@dataclass
+class DedupConfig:
+    # 哈希算法：dhash 或 phash；同一个索引必须始终使用同一种
+    kind: str = 'dhash'
+    # 汉明距离不超过该值视为近重复
+    radius: int = DEFAULT_RADIUS
+    # 多段索引的段数，必须整除64
+    chunks: int = 4
+    # 解码时的缩小倍数，哈希只用到32x32以内的缩略图
+    reduce: int = 8
+
+
+@dataclass
+class DedupReport:
+    total: int = 0
+    skipped: int = 0
+    hashed: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    # 本次新发现的近重复：(路径, 代表路径, 距离)
+    duplicates: List[Tuple[str, str, int]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        rate = self.hashed / self.seconds if self.seconds else 0.0
+        return (f"共 {self.total} 张: 跳过 {self.skipped}, 计算 {self.hashed}, "
+                f"近重复 {len(self.duplicates)}, 读取失败 {self.failed}; "
+                f"耗时 {self.seconds:.1f}s ({rate:.1f} 张/s)")
+
+
+def hash_image(file_info: FileInfo, kind: str, reduce: int) -> Dict:
+    """计算单张图片的感知哈希，返回一行索引记录（尚未与索引比较）"""
+    path, size, mtime_ns = file_info
+    row = {'path': path, 'size': size, 'mtime_ns': mtime_ns, 'hash': 0, 'duplicate_of': '', 'distance': 0,
+           'error': ''}
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+        gray = cv2.imdecode(data, REDUCE_FLAGS[reduce]) if data.size else None
+        if gray is None:
+            row['error'] = 'decode'
+        else:
+            row['hash'] = to_signed(HASH_FUNCTIONS[kind](gray))
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def hash_chunk(files: List[FileInfo], kind: str, reduce: int) -> List[Dict]:
+    return [hash_image(file_info, kind, reduce) for file_info in files]
+
+
+class HashIndex:
+    """持久化的感知哈希索引，以路径为键；检索表在加载时由代表图片重建"""
+
+    def __init__(self, config: DedupConfig):
+        self.config = config
+        self.rows: Dict[str, Dict] = {}
+        self.table: MultiIndexHashTable[str] = MultiIndexHashTable(config.radius, config.chunks)
+
+    @classmethod
+    def load(cls, path: str, config: DedupConfig) -> 'HashIndex':
+        index = cls(config)
+        if not os.path.exists(path):
+            return index
+        with np.load(path, allow_pickle=False) as data:
+            kind = str(data['kind'])
+            if kind != config.kind:
+                raise ValueError(f"索引 {path} 使用 {kind}，与当前的 {config.kind} 不一致")
+            columns = {name: data[name].tolist() for name in INDEX_COLUMNS}
+        names = list(columns)
+        for values in zip(*(columns[name] for name in names)):
+            index._insert(dict(zip(names, values)))
+        return index
+
+    def _insert(self, row: Dict):
+        self.rows[row['path']] = row
+        if not row['error'] and not row['duplicate_of']:
+            self.table.add(row['hash'] & _UNSIGNED_MASK, row['path'])
+
+    def is_current(self, file_info: FileInfo) -> bool:
+        path, size, mtime_ns = file_info
+        row = self.rows.get(path)
+        return row is not None and row['size'] == size and row['mtime_ns'] == mtime_ns
+
+    def nearest(self, value: int, exclude: str) -> Optional[Tuple[str, int]]:
+        """距离最近的代表图片；修改过的图片在检索表中的旧记录会被跳过"""
+        for path, distance in self.table.query(value):
+            row = self.rows.get(path)
+            if path == exclude or row is None or row['duplicate_of']:
+                continue
+            if (value ^ (row['hash'] & _UNSIGNED_MASK)).bit_count() == distance:
+                return path, distance
+        return None
+
+    def add(self, row: Dict) -> Dict:
+        """与已有代表图片比较后写入索引，返回补充了 duplicate_of/distance 的记录"""
+        if not row['error']:
+            match = self.nearest(row['hash'] & _UNSIGNED_MASK, row['path'])
+            if match is not None:
+                row['duplicate_of'], row['distance'] = match
+        self._insert(row)
+        return row
+
+    def save(self, path: str):
+        """先写临时文件再替换，中途中断不会损坏已有索引"""
+        rows = list(self.rows.values())
+        columns = {name: np.array([row[name] for row in rows], dtype=dtype) for name, dtype in INDEX_COLUMNS.items()}
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, kind=np.array(self.config.kind), **columns)
+        os.replace(tmp_path, path)
+
+
+def dedup_directory(root: str, index_path: str, config: Optional[DedupConfig] = None,
+                    workers: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> DedupReport:
+    """对目录中的图片做近重复检测，并把结果合并进索引
+
+    Args:
+        root: 图片目录，递归扫描
+        index_path: 索引文件（.npz），不存在时新建
+        config: 去重参数
+        workers: 计算哈希的进程数，<= 0 表示使用全部CPU核心
+        chunk_size: 每个任务的图片数
+
+    Returns:
+        DedupReport: 统计及本次新发现的近重复
+    """
+    config = config or DedupConfig()
+    if config.kind not in HASH_FUNCTIONS:
+        raise ValueError(f"kind 只支持 {sorted(HASH_FUNCTIONS)}")
+    if config.reduce not in REDUCE_FLAGS:
+        raise ValueError(f"reduce 只支持 {sorted(REDUCE_FLAGS)}")
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    start = time.perf_counter()
+    report = DedupReport()
+
+    index = HashIndex.load(index_path, config)
+    pending: List[FileInfo] = []
+    for file_info in iter_image_files(root):
+        report.total += 1
+        if index.is_current(file_info):
+            report.skipped += 1
+        else:
+            pending.append(file_info)
+
+    if workers <= 1:
+        results = (hash_chunk(chunk, config.kind, config.reduce) for chunk in _chunks(pending, chunk_size))
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        results = executor.map(hash_chunk, _chunks(pending, chunk_size), repeat(config.kind), repeat(config.reduce))
+    try:
+        # 按路径顺序逐张比较，同一段连续帧中的第一张成为代表
+        for rows in results:
+            for row in rows:
+                index.add(row)
+                report.hashed += 1
+                if row['error']:
+                    report.failed += 1
+                elif row['duplicate_of']:
+                    report.duplicates.append((row['path'], row['duplicate_of'], row['distance']))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        index.save(index_path)
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="基于感知哈希的近重复帧检测，支持增量索引")
+    parser.add_argument('root', help="图片目录，递归扫描")
+    parser.add_argument('-i', '--index', default='dedup_index.npz', help="索引文件（.npz），不存在时新建")
+    parser.add_argument('--kind', default='dhash', choices=sorted(HASH_FUNCTIONS), help="哈希算法")
+    parser.add_argument('--radius', type=int, default=DEFAULT_RADIUS, help="汉明距离不超过该值视为近重复")
+    parser.add_argument('--chunks', type=int, default=4, help="多段索引的段数，必须整除64")
+    parser.add_argument('--reduce', type=int, default=8, choices=sorted(REDUCE_FLAGS), help="解码时的缩小倍数")
+    parser.add_argument('-w', '--workers', type=int, default=0, help="进程数，0 表示使用全部CPU核心")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="每个任务的图片数")
+    parser.add_argument('--list', action='store_true', help="输出本次发现的近重复：路径、代表路径、距离（制表符分隔）")
+    args = parser.parse_args(argv)
+
+    config = DedupConfig(kind=args.kind, radius=args.radius, chunks=args.chunks, reduce=args.reduce)
+    try:
+        report = dedup_directory(args.root, args.index, config, args.workers, args.chunk_size)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.list:
+        for path, original, distance in report.duplicates:
+            print(f"{path}\t{original}\t{distance}")
+    print(report.summary(), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
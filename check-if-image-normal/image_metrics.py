@@ -0,0 +1,249 @@
+"""可插拔的图片质量指标
+
+每个指标分两步：
+    compute  在worker中对单张图片计算原始数值（所有指标共用一次解码和一次灰度转换）
+    evaluate 在主进程中对结果表的整列做向量化判断，返回不合格的掩码
+
+原始数值保存在结果文件中，只修改阈值时无需重新解码图片。
+自定义指标继承 Metric 并用 @register_metric 注册即可通过名称启用。
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+import cv2
+import numpy as np
+
+from is_normal_image import ENTROPY_THRESHOLD, color_entropy
+from perceptual_hash import dhash, hamming_distance, to_signed
+
+# JPEG结束标记；部分相机会在文件末尾补零
+JPEG_EOI = b'\xff\xd9'
+PNG_IEND = b'IEND'
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+@dataclass
+class ImageSample:
+    """一次解码得到的图片数据，供所有指标共用"""
+    path: str
+    # 文件原始字节
+    data: np.ndarray
+    # 缩小解码后的BGR图片，解码失败时为None
+    image: Optional[np.ndarray]
+    _gray: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def gray(self) -> Optional[np.ndarray]:
+        if self._gray is None and self.image is not None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+
+class Metric:
+    """指标基类
+
+    Attributes:
+        name: 指标名称，也是不合格原因中的标识
+        columns: 写入结果表的列及其类型
+        thresholds: 默认阈值，可通过 ScreeningConfig.thresholds 覆盖
+        needs_image: 为False时解码失败也会计算（如根据文件字节判断截断）
+    """
+    name: str = ''
+    columns: Dict[str, type] = {}
+    thresholds: Dict[str, float] = {}
+    needs_image: bool = True
+
+    def compute(self, sample: ImageSample) -> Dict:
+        raise NotImplementedError
+
+    def evaluate(self, columns: Dict[str, np.ndarray], thresholds: Dict[str, float]) -> np.ndarray:
+        """返回不合格的布尔掩码；数值为NaN（未计算）的行视为合格"""
+        raise NotImplementedError
+
+
+METRICS: Dict[str, Type[Metric]] = {}
+
+
+def register_metric(cls: Type[Metric]) -> Type[Metric]:
+    METRICS[cls.name] = cls
+    return cls
+
+
+def missing_value(dtype: type):
+    """指标未计算（如解码失败）时该列的值"""
+    if dtype is str:
+        return ''
+    if np.issubdtype(dtype, np.bool_):
+        return False
+    if np.issubdtype(dtype, np.integer):
+        return 0
+    return np.nan
+
+
+@register_metric
+class EntropyMetric(Metric):
+    """HSV颜色直方图熵，过低说明颜色单一（花屏、遮挡等）"""
+    name = 'entropy'
+    columns = {'entropy': np.float64}
+    thresholds = {'entropy_min': ENTROPY_THRESHOLD}
+
+    def compute(self, sample: ImageSample) -> Dict:
+        return {'entropy': color_entropy(sample.image)}
+
+    def evaluate(self, columns, thresholds):
+        return columns['entropy'] <= thresholds['entropy_min']
+
+
+@register_metric
+class BlurMetric(Metric):
+    """拉普拉斯方差，过低说明图片模糊；在缩小后的图片上计算，数值比全分辨率偏大"""
+    name = 'blur'
+    columns = {'laplacian_var': np.float64}
+    thresholds = {'blur_min': 100.0}
+
+    def compute(self, sample: ImageSample) -> Dict:
+        return {'laplacian_var': float(cv2.Laplacian(sample.gray, cv2.CV_64F).var())}
+
+    def evaluate(self, columns, thresholds):
+        return columns['laplacian_var'] < thresholds['blur_min']
+
+
+@register_metric
+class ExposureMetric(Metric):
+    """过曝（灰度>=250）和欠曝（灰度<=5）像素占比"""
+    name = 'exposure'
+    columns = {'overexposed': np.float64, 'underexposed': np.float64}
+    thresholds = {'overexposed_max': 0.5, 'underexposed_max': 0.5}
+
+    def compute(self, sample: ImageSample) -> Dict:
+        # 灰度直方图一次统计，避免为两个比例各生成一个布尔数组
+        hist = np.bincount(sample.gray.ravel(), minlength=256)
+        total = sample.gray.size
+        return {'overexposed': hist[250:].sum() / total, 'underexposed': hist[:6].sum() / total}
+
+    def evaluate(self, columns, thresholds):
+        return ((columns['overexposed'] > thresholds['overexposed_max'])
+                | (columns['underexposed'] > thresholds['underexposed_max']))
+
+
+@register_metric
+class SolidColorMetric(Metric):
+    """灰度标准差过低说明是纯色帧（包括黑屏、白屏）"""
+    name = 'solid'
+    columns = {'gray_mean': np.float64, 'gray_std': np.float64}
+    thresholds = {'solid_std_max': 3.0}
+
+    def compute(self, sample: ImageSample) -> Dict:
+        mean, std = cv2.meanStdDev(sample.gray)
+        return {'gray_mean': float(mean[0, 0]), 'gray_std': float(std[0, 0])}
+
+    def evaluate(self, columns, thresholds):
+        return columns['gray_std'] <= thresholds['solid_std_max']
+
+
+@register_metric
+class TruncationMetric(Metric):
+    """根据文件末尾的结束标记判断JPEG/PNG是否被截断；OpenCV能解码截断的JPEG，只是下半部分为灰色"""
+    name = 'truncated'
+    columns = {'truncated': np.bool_}
+    needs_image = False
+
+    def compute(self, sample: ImageSample) -> Dict:
+        tail = sample.data[-64:].tobytes().rstrip(b'\x00\r\n ')
+        extension = os.path.splitext(sample.path)[1].lower()
+        if extension in JPEG_EXTENSIONS:
+            truncated = not tail.endswith(JPEG_EOI)
+        elif extension == '.png':
+            truncated = PNG_IEND not in tail[-12:]
+        else:
+            truncated = False
+        return {'truncated': truncated}
+
+    def evaluate(self, columns, thresholds):
+        return columns['truncated']
+
+
+@register_metric
+class DuplicateMetric(Metric):
+    """与同一目录中按文件名排序的上一帧几乎相同（dHash汉明距离不超过阈值）的帧视为重复"""
+    name = 'duplicate'
+    columns = {'dhash': np.int64}
+    thresholds = {'duplicate_distance_max': 2}
+
+    def compute(self, sample: ImageSample) -> Dict:
+        # 以有符号整数保存，npz中列类型统一为int64
+        return {'dhash': to_signed(dhash(sample.gray))}
+
+    def evaluate(self, columns, thresholds):
+        paths = columns['path']
+        duplicate = np.zeros(len(paths), dtype=bool)
+        if len(paths) < 2:
+            return duplicate
+        order = np.argsort(paths, kind='stable')
+        directories = np.array([os.path.dirname(path) for path in paths[order]])
+        hashes = columns['dhash'][order]
+        valid = ~columns['error'][order].astype(bool) if 'error' in columns else np.ones(len(paths), bool)
+        distance = hamming_distance(hashes[1:], hashes[:-1])
+        same = ((directories[1:] == directories[:-1]) & valid[1:] & valid[:-1]
+                & (distance <= thresholds['duplicate_distance_max']))
+        duplicate[order[1:]] = same
+        return duplicate
+
+
+DEFAULT_METRICS = ('entropy', 'blur', 'exposure', 'solid', 'truncated', 'duplicate')
+
+
+def build_metrics(names: Sequence[str]) -> List[Metric]:
+    unknown = [name for name in names if name not in METRICS]
+    if unknown:
+        raise ValueError(f"未知的指标: {unknown}，可用: {sorted(METRICS)}")
+    return [METRICS[name]() for name in names]
+
+
+def default_thresholds(metrics: Sequence[Metric]) -> Dict[str, float]:
+    thresholds = {}
+    for metric in metrics:
+        thresholds.update(metric.thresholds)
+    return thresholds
+
+
+def missing_values(metrics: Sequence[Metric]) -> Dict:
+    """所有指标列都取未计算时的值"""
+    return {column: missing_value(dtype) for metric in metrics for column, dtype in metric.columns.items()}
+
+
+def compute_metrics(sample: ImageSample, metrics: Sequence[Metric]) -> Dict:
+    """对一张图片计算所有指标，返回合并后的列值"""
+    values = {}
+    for metric in metrics:
+        if sample.image is None and metric.needs_image:
+            values.update(missing_values([metric]))
+        else:
+            values.update(metric.compute(sample))
+    return values
+
+
+def evaluate_metrics(columns: Dict[str, np.ndarray], metrics: Sequence[Metric],
+                     thresholds: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """对结果表整列判断，返回 (是否正常, 不合格原因) 两列；原因为逗号分隔的指标名称"""
+    size = len(columns['path'])
+    failed: Dict[str, np.ndarray] = {}
+    for metric in metrics:
+        with np.errstate(invalid='ignore'):
+            failed[metric.name] = np.asarray(metric.evaluate(columns, thresholds), dtype=bool)
+    errors = columns['error'].astype(bool) if 'error' in columns else np.zeros(size, dtype=bool)
+    abnormal = errors.copy()
+    for mask in failed.values():
+        abnormal |= mask
+    reasons = np.array([','.join(name for name, mask in failed.items() if mask[i]) for i in range(size)],
+                       dtype=str) if size else np.array([], dtype=str)
+    return ~abnormal, reasons
+
+
+def parse_threshold(text: str) -> Tuple[str, float]:
+    """解析命令行中的 name=value 阈值"""
+    name, sep, value = text.partition('=')
+    if not sep:
+        raise ValueError(f"阈值格式应为 name=value: {text}")
+    return name.strip(), float(value)
@@ -1,16 +1,25 @@
+from typing import Optional
+
 import cv2
 import numpy as np
 
+# 颜色分布熵低于该阈值的图片认为不正常
+ENTROPY_THRESHOLD = 5.0
 
-def is_normal_image(image_path: str) -> bool:
-    # 读取图片
-    image = cv2.imread(image_path)
 
-    # 检查图片是否成功读取
-    if image is None:
-        print(f"无法读取图片: {image_path}")
-        return False
+def read_image(image_path: str, flags: int = cv2.IMREAD_COLOR) -> Optional[np.ndarray]:
+    """读取图片，支持中文路径；flags 可使用 cv2.IMREAD_REDUCED_COLOR_4 等在解码时直接缩小"""
+    try:
+        data = np.fromfile(image_path, dtype=np.uint8)
+    except OSError:
+        return None
+    if data.size == 0:
+        return None
+    return cv2.imdecode(data, flags)
+
 
+def color_entropy(image: np.ndarray) -> float:
+    """计算BGR图片HSV颜色直方图（H、S两个通道）的熵"""
     # 将图片转换为HSV颜色空间
     hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
 
@@ -21,11 +30,25 @@ def is_normal_image(image_path: str) -> bool:
     hist = cv2.normalize(hist, hist).flatten()
 
     # 计算颜色分布的熵
-    hist_entropy = -np.sum(hist * np.log2(hist + 1e-7))
-    print(f"图片的颜色分布熵: {hist_entropy}")
+    return float(-np.sum(hist * np.log2(hist + 1e-7)))
+
 
-    # 设置一个阈值来判断图片是否正常
-    entropy_threshold = 5.0
+def image_entropy(image_path: str, flags: int = cv2.IMREAD_COLOR) -> Optional[float]:
+    """返回图片的颜色分布熵，无法读取时返回None"""
+    image = read_image(image_path, flags)
+    if image is None:
+        return None
+    return color_entropy(image)
+
+
+def is_normal_image(image_path: str, entropy_threshold: float = ENTROPY_THRESHOLD) -> bool:
+    # 读取图片并计算颜色分布熵
+    hist_entropy = image_entropy(image_path)
+
+    # 检查图片是否成功读取
+    if hist_entropy is None:
+        print(f"无法读取图片: {image_path}")
+        return False
 
     # 如果熵值低于阈值，认为图片不正常
     return hist_entropy > entropy_threshold
@@ -46,7 +69,9 @@ if __name__ == "__main__":
     # 遍历每个图片文件并判断是否正常
     for image_file in image_files:
         image_path = os.path.join(images_dir, image_file)
-        if is_normal_image(image_path):
+        entropy = image_entropy(image_path)
+        print(f"图片的颜色分布熵: {entropy}")
+        if entropy is not None and entropy > ENTROPY_THRESHOLD:
             print(f"{image_file} 是正常的")
         else:
             print(f"{image_file} 不是正常的")
@@ -0,0 +1,106 @@
+"""感知哈希与汉明距离检索
+
+dhash/phash 都输出64位整数；MultiIndexHashTable 把哈希切成若干段分别建索引（multi-index hashing），
+根据抽屉原理，汉明距离不超过 radius 的两个哈希至少有一段的距离不超过 radius // 段数，
+因此只需在每段枚举少量邻近值查表，再对候选逐个计算完整距离，不用和全部哈希比较。
+"""
+from collections import defaultdict
+from itertools import combinations
+from typing import Callable, Dict, Generic, Hashable, List, Tuple, TypeVar
+
+import cv2
+import numpy as np
+
+HASH_BITS = 64
+
+
+def _pack_bits(bits: np.ndarray) -> int:
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def dhash(gray: np.ndarray) -> int:
+    """64位差异哈希：缩小到9x8后比较水平相邻像素"""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return _pack_bits((small[:, 1:] > small[:, :-1]).ravel())
+
+
+def phash(gray: np.ndarray) -> int:
+    """64位DCT感知哈希：缩小到32x32做DCT，取左上8x8低频系数与其中位数比较"""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    # 直流分量只反映整体亮度，不参与中位数
+    return _pack_bits((low > np.median(low.ravel()[1:])).ravel())
+
+
+HASH_FUNCTIONS: Dict[str, Callable[[np.ndarray], int]] = {
+    'dhash': dhash,
+    'phash': phash,
+}
+
+
+def to_signed(value: int) -> int:
+    """64位无符号哈希转为有符号整数，便于存入int64列"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def hamming_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """两组64位哈希（int64/uint64数组）逐个的汉明距离"""
+    xor = np.bitwise_xor(a.astype(np.uint64), b.astype(np.uint64))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+T = TypeVar('T', bound=Hashable)
+
+
+class MultiIndexHashTable(Generic[T]):
+    """64位哈希的汉明距离近邻检索
+
+    Args:
+        radius: 查询的最大汉明距离
+        chunks: 哈希切分的段数，必须整除64；段数越多每段越短，radius较大时查表次数更少但候选更多
+    """
+
+    def __init__(self, radius: int, chunks: int = 4):
+        if chunks <= 0 or HASH_BITS % chunks:
+            raise ValueError(f"chunks 必须整除 {HASH_BITS}: {chunks}")
+        self.radius = radius
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self._chunk_mask = (1 << self.chunk_bits) - 1
+        # 每段只需枚举距离不超过 radius // chunks 的值
+        sub_radius = radius // chunks
+        self._flips = [sum(1 << bit for bit in bits)
+                       for distance in range(sub_radius + 1)
+                       for bits in combinations(range(self.chunk_bits), distance)]
+        self._tables: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(chunks)]
+        self._hashes: List[int] = []
+        self._items: List[T] = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _split(self, value: int) -> List[int]:
+        return [(value >> (i * self.chunk_bits)) & self._chunk_mask for i in range(self.chunks)]
+
+    def add(self, value: int, item: T):
+        position = len(self._items)
+        self._hashes.append(value)
+        self._items.append(item)
+        for table, part in zip(self._tables, self._split(value)):
+            table[part].append(position)
+
+    def query(self, value: int) -> List[Tuple[T, int]]:
+        """返回距离不超过 radius 的 (item, 距离)，按距离从小到大排序"""
+        candidates = set()
+        for table, part in zip(self._tables, self._split(value)):
+            for flip in self._flips:
+                bucket = table.get(part ^ flip)
+                if bucket:
+                    candidates.update(bucket)
+        matches = []
+        for position in candidates:
+            distance = (value ^ self._hashes[position]).bit_count()
+            if distance <= self.radius:
+                matches.append((self._items[position], distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
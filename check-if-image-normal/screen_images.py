@@ -0,0 +1,300 @@
+"""批量图片质量筛查
+
+递归扫描目录中的图片，在进程池中以缩小分辨率解码（cv2.IMREAD_REDUCED_COLOR_*）一次，
+在同一份解码结果上计算所有启用的指标（见 image_metrics），结果按列保存为 .npz 文件。
+重新运行时，路径、大小和修改时间都未变化的图片直接跳过，中途中断后再次运行会从上次保存的位置继续。
+是否正常由各指标的原始数值和阈值在保存时统一判断，只修改阈值不需要重新解码。
+
+用法:
+    python screen_images.py /data/camera_dump -o results.npz --workers 8 --reduce 4
+    python screen_images.py /data/camera_dump --metrics entropy,blur --threshold blur_min=50
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import islice, repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from image_metrics import (DEFAULT_METRICS, ImageSample, Metric, build_metrics, compute_metrics,
+                           default_thresholds, evaluate_metrics, missing_values, parse_threshold)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+# 解码缩小倍数对应的imread标志，JPEG在解码阶段直接按DCT缩放，比解码后再缩放快得多
+REDUCE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+DEFAULT_CHUNK_SIZE = 64
+# 每处理多少张图片保存一次结果
+DEFAULT_SAVE_EVERY = 2000
+
+# 结果文件的基础列及其类型，各指标的列由指标自己声明
+BASE_COLUMNS = {
+    'path': str,
+    'size': np.int64,
+    'mtime_ns': np.int64,
+    'error': str,
+}
+# 保存时根据阈值统一计算的判定列
+VERDICT_COLUMNS = {
+    'normal': np.bool_,
+    'reasons': str,
+}
+
+FileInfo = Tuple[str, int, int]
+
+
+@dataclass
+class ScreeningConfig:
+    # 启用的指标名称，见 image_metrics.METRICS
+    metrics: Tuple[str, ...] = DEFAULT_METRICS
+    # 覆盖指标的默认阈值，如 {'blur_min': 50}
+    thresholds: Dict[str, float] = field(default_factory=dict)
+    # 解码时的缩小倍数：1、2、4、8
+    reduce: int = 4
+
+    def build(self) -> Tuple[List[Metric], Dict[str, float]]:
+        """实例化指标并合并阈值"""
+        metrics = build_metrics(self.metrics)
+        thresholds = default_thresholds(metrics)
+        unknown = set(self.thresholds) - set(thresholds)
+        if unknown:
+            raise ValueError(f"未知的阈值: {sorted(unknown)}，可用: {sorted(thresholds)}")
+        thresholds.update(self.thresholds)
+        return metrics, thresholds
+
+
+@dataclass
+class ScreeningReport:
+    total: int = 0
+    skipped: int = 0
+    scored: int = 0
+    abnormal: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    # 各指标不合格的图片数（本次扫描到的全部图片，包括跳过的）
+    reasons: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        rate = self.scored / self.seconds if self.seconds else 0.0
+        text = (f"共 {self.total} 张: 跳过 {self.skipped}, 处理 {self.scored}, "
+                f"异常 {self.abnormal}, 读取失败 {self.failed}; "
+                f"耗时 {self.seconds:.1f}s ({rate:.1f} 张/s)")
+        if self.reasons:
+            text += "\n" + ", ".join(f"{name}: {count}" for name, count in sorted(self.reasons.items()))
+        return text
+
+
+def iter_image_files(root: str, extensions: Sequence[str] = IMAGE_EXTENSIONS) -> Iterator[FileInfo]:
+    """用 os.scandir 递归遍历目录，产出 (路径, 大小, 修改时间ns)，目录项的stat信息直接复用"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in extensions:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # 失效的符号链接、扫描期间被删除的文件等直接跳过
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime_ns
+        stack.extend(reversed(subdirectories))
+
+
+def score_image(file_info: FileInfo, metrics: Sequence[Metric], reduce: int) -> Dict:
+    """读取并解码单张图片一次，计算所有指标，返回一行结果"""
+    path, size, mtime_ns = file_info
+    # 先填上所有指标列，读取出错时这一行的列也是完整的
+    row = {'path': path, 'size': size, 'mtime_ns': mtime_ns, 'error': '', **missing_values(metrics)}
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+        image = cv2.imdecode(data, REDUCE_FLAGS[reduce]) if data.size else None
+        if image is None:
+            row['error'] = 'decode'
+        row.update(compute_metrics(ImageSample(path, data, image), metrics))
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def score_chunk(files: List[FileInfo], metrics: Sequence[Metric], reduce: int) -> List[Dict]:
+    return [score_image(file_info, metrics, reduce) for file_info in files]
+
+
+def _init_worker():
+    # 每个进程只用一个OpenCV线程，避免进程数 x 线程数超额占用CPU
+    cv2.setNumThreads(1)
+
+
+class ResultTable:
+    """按列保存的筛查结果，以路径为键；文件格式为 numpy .npz，每列一个数组
+
+    结果文件缺少当前启用指标的列时（如新增了指标），其中的行都视为过期，会重新计算。
+    """
+
+    def __init__(self, metrics: Sequence[Metric], thresholds: Dict[str, float],
+                 rows: Optional[Dict[str, Dict]] = None):
+        self.metrics = list(metrics)
+        self.thresholds = thresholds
+        self.schema = dict(BASE_COLUMNS)
+        for metric in self.metrics:
+            self.schema.update(metric.columns)
+        self.rows: Dict[str, Dict] = rows or {}
+
+    @classmethod
+    def load(cls, path: str, metrics: Sequence[Metric], thresholds: Dict[str, float]) -> 'ResultTable':
+        table = cls(metrics, thresholds)
+        if not os.path.exists(path):
+            return table
+        with np.load(path, allow_pickle=False) as data:
+            if not set(table.schema) <= set(data.files):
+                return table
+            columns = {name: data[name].tolist() for name in table.schema}
+        names = list(columns)
+        table.rows = {values[0]: dict(zip(names, values)) for values in zip(*(columns[name] for name in names))}
+        return table
+
+    def is_current(self, file_info: FileInfo) -> bool:
+        """图片是否已有结果且之后未被修改"""
+        path, size, mtime_ns = file_info
+        row = self.rows.get(path)
+        return row is not None and row['size'] == size and row['mtime_ns'] == mtime_ns
+
+    def update(self, rows: Iterable[Dict]):
+        for row in rows:
+            self.rows[row['path']] = row
+
+    def columns(self, paths: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """指标列加上判定列；paths 指定时只返回这些图片"""
+        rows = list(self.rows.values()) if paths is None else [self.rows[path] for path in paths]
+        columns = {name: np.array([row[name] for row in rows], dtype=dtype) for name, dtype in self.schema.items()}
+        columns['normal'], columns['reasons'] = evaluate_metrics(columns, self.metrics, self.thresholds)
+        return columns
+
+    def save(self, path: str):
+        """先写临时文件再替换，中途中断不会损坏已有结果"""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **self.columns())
+        os.replace(tmp_path, path)
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def screen_directory(root: str, results_path: str, config: Optional[ScreeningConfig] = None,
+                     workers: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     save_every: int = DEFAULT_SAVE_EVERY, rescore: bool = False) -> ScreeningReport:
+    """筛查目录中的所有图片并保存结果
+
+    Args:
+        root: 图片目录，递归扫描
+        results_path: 结果文件（.npz）
+        config: 筛查参数
+        workers: 进程数，<= 0 表示使用全部CPU核心
+        chunk_size: 每个任务的图片数
+        save_every: 每处理多少张图片保存一次结果
+        rescore: 忽略已有结果，全部重新计算
+
+    Returns:
+        ScreeningReport: 筛查统计
+    """
+    config = config or ScreeningConfig()
+    if config.reduce not in REDUCE_FLAGS:
+        raise ValueError(f"reduce 只支持 {sorted(REDUCE_FLAGS)}")
+    metrics, thresholds = config.build()
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    start = time.perf_counter()
+    report = ScreeningReport()
+
+    if rescore:
+        table = ResultTable(metrics, thresholds)
+    else:
+        table = ResultTable.load(results_path, metrics, thresholds)
+    seen: List[str] = []
+    pending: List[FileInfo] = []
+    for file_info in iter_image_files(root):
+        report.total += 1
+        seen.append(file_info[0])
+        if table.is_current(file_info):
+            report.skipped += 1
+        else:
+            pending.append(file_info)
+
+    unsaved = 0
+    if workers <= 1:
+        results = (score_chunk(chunk, metrics, config.reduce) for chunk in _chunks(pending, chunk_size))
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        results = executor.map(score_chunk, _chunks(pending, chunk_size), repeat(metrics), repeat(config.reduce))
+    try:
+        for rows in results:
+            table.update(rows)
+            report.scored += len(rows)
+            unsaved += len(rows)
+            if unsaved >= save_every:
+                table.save(results_path)
+                unsaved = 0
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        # 中断时也保存已完成的部分
+        if unsaved or not os.path.exists(results_path):
+            table.save(results_path)
+
+    # 判定依赖同目录中的相邻帧（重复帧），因此在全部结果上统一计算
+    columns = table.columns(seen)
+    errors = columns['error'].astype(bool)
+    report.failed = int(errors.sum())
+    report.abnormal = int((~columns['normal']).sum())
+    report.reasons = dict(Counter(name for reasons in columns['reasons'] if reasons for name in reasons.split(',')))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量筛查图片质量（熵、模糊、曝光、纯色、截断、重复帧）")
+    parser.add_argument('root', help="图片目录，递归扫描")
+    parser.add_argument('-o', '--output', default='screening_results.npz', help="结果文件（.npz）")
+    parser.add_argument('-w', '--workers', type=int, default=0, help="进程数，0 表示使用全部CPU核心")
+    parser.add_argument('--reduce', type=int, default=4, choices=sorted(REDUCE_FLAGS), help="解码时的缩小倍数")
+    parser.add_argument('--metrics', default=','.join(DEFAULT_METRICS), help="启用的指标，逗号分隔")
+    parser.add_argument('--threshold', action='append', default=[], metavar='NAME=VALUE',
+                        help="覆盖指标阈值，可重复，如 --threshold blur_min=50")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="每个任务的图片数")
+    parser.add_argument('--rescore', action='store_true', help="忽略已有结果，全部重新计算")
+    args = parser.parse_args(argv)
+
+    metric_names = tuple(name.strip() for name in args.metrics.split(',') if name.strip())
+    try:
+        thresholds = dict(parse_threshold(text) for text in args.threshold)
+        config = ScreeningConfig(metrics=metric_names, thresholds=thresholds, reduce=args.reduce)
+        config.build()
+    except ValueError as e:
+        parser.error(str(e))
+    report = screen_directory(args.root, args.output, config, args.workers, args.chunk_size, rescore=args.rescore)
+    print(report.summary(), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import os
+import random
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from dedup_images import DedupConfig, HashIndex, dedup_directory, hash_image
+from perceptual_hash import HASH_BITS, MultiIndexHashTable, to_signed
+
+_UNSIGNED_MASK = (1 << HASH_BITS) - 1
+
+
+def _flip_bits(value: int, count: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(HASH_BITS), count):
+        value ^= 1 << bit
+    return value
+
+
+def _row(path: str, value: int, size: int = 1, mtime_ns: int = 1) -> dict:
+    return {'path': path, 'size': size, 'mtime_ns': mtime_ns, 'hash': to_signed(value), 'duplicate_of': '',
+            'distance': 0, 'error': ''}
+
+
+class TestMultiIndexHashTable(unittest.TestCase):
+    def test_query_matches_brute_force(self):
+        """测试多段索引的检索结果与逐个计算汉明距离完全一致"""
+        rng = random.Random(0)
+        for radius, chunks in [(0, 4), (2, 1), (3, 4), (5, 2), (6, 4), (7, 8), (10, 8)]:
+            with self.subTest(radius=radius, chunks=chunks):
+                # 随机哈希中混入若干近邻，使距离在 radius 附近的情况都能出现
+                hashes = [rng.getrandbits(HASH_BITS) for _ in range(300)]
+                hashes += [_flip_bits(rng.choice(hashes), rng.randint(0, radius + 2), rng) for _ in range(300)]
+                table = MultiIndexHashTable(radius, chunks)
+                for position, value in enumerate(hashes):
+                    table.add(value, position)
+
+                queries = [_flip_bits(rng.choice(hashes), rng.randint(0, radius + 2), rng) for _ in range(100)]
+                queries += [rng.getrandbits(HASH_BITS) for _ in range(20)]
+                for query in queries:
+                    expected = {(position, (query ^ value).bit_count())
+                                for position, value in enumerate(hashes) if (query ^ value).bit_count() <= radius}
+                    matches = table.query(query)
+                    self.assertEqual(set(matches), expected)
+                    self.assertEqual(len(matches), len(expected))
+                    self.assertEqual([distance for _, distance in matches],
+                                     sorted(distance for _, distance in matches))
+
+    def test_invalid_chunks(self):
+        with self.assertRaises(ValueError):
+            MultiIndexHashTable(4, chunks=3)
+
+
+class TestHashIndex(unittest.TestCase):
+    def test_modified_image_stale_entries(self):
+        """测试修改过的图片在检索表中的旧记录被跳过，新哈希可被检索"""
+        rng = random.Random(1)
+        index = HashIndex(DedupConfig(radius=4))
+        old_value = rng.getrandbits(HASH_BITS)
+        new_value = old_value ^ _UNSIGNED_MASK
+        index.add(_row('a.jpg', old_value))
+
+        # a.jpg 被修改后重新加入：检索表中仍有旧哈希，但行记录已更新
+        index.add(_row('a.jpg', new_value, mtime_ns=2))
+        self.assertIsNone(index.nearest(_flip_bits(old_value, 1, rng), 'b.jpg'))
+        self.assertEqual(index.nearest(_flip_bits(new_value, 2, rng), 'b.jpg')[0], 'a.jpg')
+        self.assertIsNone(index.nearest(new_value, 'a.jpg'))
+
+        # 修改后成为其他图片的近重复时，不再作为代表
+        index.add(_row('c.jpg', old_value))
+        row = index.add(_row('a.jpg', _flip_bits(old_value, 1, rng), mtime_ns=3))
+        self.assertEqual((row['duplicate_of'], row['distance']), ('c.jpg', 1))
+        self.assertEqual(index.nearest(_flip_bits(old_value, 1, rng), 'b.jpg')[0], 'c.jpg')
+        self.assertIsNone(index.nearest(new_value, 'b.jpg'))
+
+    def test_signed_round_trip(self):
+        """测试最高位为1的哈希以有符号int64保存到npz后仍能检索"""
+        config = DedupConfig(radius=3)
+        index = HashIndex(config)
+        high = (1 << (HASH_BITS - 1)) | 0x1234
+        index.add(_row('high.jpg', high))
+        index.add(_row('all.jpg', _UNSIGNED_MASK))
+        index.add(_row('dup.jpg', high ^ 0b11))
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'index.npz')
+            index.save(path)
+            loaded = HashIndex.load(path, config)
+            with self.assertRaises(ValueError):
+                HashIndex.load(path, DedupConfig(kind='phash'))
+
+        self.assertEqual(loaded.rows, index.rows)
+        self.assertLess(loaded.rows['high.jpg']['hash'], 0)
+        self.assertEqual(loaded.rows['high.jpg']['hash'] & _UNSIGNED_MASK, high)
+        self.assertEqual(loaded.rows['dup.jpg']['duplicate_of'], 'high.jpg')
+        # 只有代表进入检索表
+        self.assertEqual(len(loaded.table), 2)
+        self.assertEqual(loaded.nearest(high ^ 0b1, 'x.jpg'), ('high.jpg', 1))
+        self.assertEqual(loaded.nearest(_UNSIGNED_MASK, 'x.jpg'), ('all.jpg', 0))
+
+
+class TestDedupDirectory(unittest.TestCase):
+    def test_rerun_skips_unchanged(self):
+        """测试对未修改的目录再次运行时全部跳过，代表和近重复记录保持不变"""
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as root:
+            images = os.path.join(root, 'images')
+            os.makedirs(os.path.join(images, 'sub'))
+            for i in range(4):
+                image = rng.integers(0, 200, (128, 128, 3), dtype=np.uint8)
+                cv2.imwrite(os.path.join(images, f'{i}_a.png'), image)
+                # 亮度略有变化的同一帧，dHash相同
+                cv2.imwrite(os.path.join(images, 'sub', f'{i}_b.png'), image + 5)
+            with open(os.path.join(images, 'broken.png'), 'wb') as f:
+                f.write(b'not an image')
+            index_path = os.path.join(root, 'index.npz')
+
+            first = dedup_directory(images, index_path, workers=1)
+            self.assertEqual((first.total, first.skipped, first.hashed, first.failed), (9, 0, 9, 1))
+            self.assertEqual(sorted((os.path.basename(path), os.path.basename(original))
+                                    for path, original, _ in first.duplicates),
+                             [(f'{i}_b.png', f'{i}_a.png') for i in range(4)])
+            rows = HashIndex.load(index_path, DedupConfig()).rows
+
+            second = dedup_directory(images, index_path, workers=1)
+            self.assertEqual((second.total, second.skipped, second.hashed), (9, 9, 0))
+            self.assertEqual(second.duplicates, [])
+            reloaded = HashIndex.load(index_path, DedupConfig())
+            self.assertEqual(reloaded.rows, rows)
+            self.assertEqual(len(reloaded.table), 4)
+
+            # 新批次与之前的代表比较
+            image = cv2.imread(os.path.join(images, '0_a.png'))
+            cv2.imwrite(os.path.join(images, 'new.png'), image + 3)
+            third = dedup_directory(images, index_path, workers=1)
+            self.assertEqual((third.skipped, third.hashed), (9, 1))
+            self.assertEqual([os.path.basename(original) for _, original, _ in third.duplicates], ['0_a.png'])
+
+    def test_hash_image_error(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'empty.jpg')
+            open(path, 'wb').close()
+            self.assertEqual(hash_image((path, 0, 0), 'dhash', 8)['error'], 'decode')
+
+
+if __name__ == '__main__':
+    unittest.main()
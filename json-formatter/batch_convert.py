@@ -0,0 +1,254 @@
+"""NDJSON批量转换
+
+逐行读取日志文件（每行一个JSON或Python repr对象），在进程池中转换为规范JSON，
+按原顺序写出NDJSON。同时在途的行数有上限，内存占用与文件大小无关。
+
+用法:
+    python batch_convert.py app.log -o app.ndjson --workers 4 --failures failures.jsonl
+    zcat app.log.gz | python batch_convert.py - > app.ndjson
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from tiered_parser import TIER_HEURISTIC, parse_input
+
+# 每个任务处理的行数
+DEFAULT_CHUNK_SIZE = 1000
+# 失败记录中保留的原始输入长度
+FAILURE_SNIPPET_LENGTH = 200
+
+
+@dataclass
+class LineFailure:
+    line: int
+    error: str
+    text: str
+
+    def to_dict(self) -> Dict:
+        return {'line': self.line, 'error': self.error, 'text': self.text}
+
+
+@dataclass
+class BatchReport:
+    """批量转换统计"""
+    lines: int = 0
+    converted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    # 输入的UTF-8字节数（gzip输入为解压后的字节数）
+    bytes_read: int = 0
+    seconds: float = 0.0
+    tiers: Counter = field(default_factory=Counter)
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.lines / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'lines': self.lines,
+            'converted': self.converted,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'bytes_read': self.bytes_read,
+            'seconds': self.seconds,
+            'lines_per_second': self.lines_per_second,
+            'tiers': dict(self.tiers),
+        }
+
+    def summary(self) -> str:
+        mb_per_second = self.bytes_read / 1024 / 1024 / self.seconds if self.seconds else 0.0
+        tiers = ', '.join(f"{tier} {count}" for tier, count in self.tiers.most_common())
+        return (f"共 {self.lines} 行: 转换 {self.converted}, 空行 {self.skipped}, 失败 {self.failed}; "
+                f"耗时 {self.seconds:.2f}s ({self.lines_per_second:.0f} 行/s, {mb_per_second:.1f} MB/s); "
+                f"解析方式: {tiers or '无'}")
+
+
+def convert_line(line: str, strict: bool = False) -> Tuple[str, str]:
+    """将一行JSON或Python repr转换为规范JSON（键排序、紧凑分隔符）
+
+    启发式解析器对任意文本都会返回结果，因此启发式解析只得到字符串时视为失败；
+    strict 为True时不接受启发式解析的结果。
+
+    Returns:
+        tuple: (规范JSON, 解析层级)
+
+    Raises:
+        ValueError: 无法解析为对象
+    """
+    result = parse_input(line)
+    if result.tier == TIER_HEURISTIC and (strict or not isinstance(result.value, (dict, list))):
+        raise ValueError("无法解析为JSON或Python对象")
+    return json.dumps(result.value, ensure_ascii=False, sort_keys=True, separators=(',', ':')), result.tier
+
+
+def convert_chunk(first_line: int, lines: List[str], strict: bool = False
+                  ) -> Tuple[List[str], List[LineFailure], Counter, int]:
+    """转换一组连续的行
+
+    Args:
+        first_line: 第一行的行号（从1开始）
+        lines: 原始行
+        strict: 是否拒绝启发式解析的结果
+
+    Returns:
+        tuple: (规范JSON列表, 失败记录, 各解析层级的行数, 空行数)
+    """
+    outputs, failures, tiers, skipped = [], [], Counter(), 0
+    for line_number, line in enumerate(lines, first_line):
+        if not line.strip():
+            skipped += 1
+            continue
+        try:
+            output, tier = convert_line(line, strict)
+        except Exception as e:
+            failures.append(LineFailure(line_number, f"{type(e).__name__}: {e}", line[:FAILURE_SNIPPET_LENGTH]))
+            continue
+        outputs.append(output)
+        tiers[tier] += 1
+    return outputs, failures, tiers, skipped
+
+
+def _iter_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[Tuple[int, List[str], int]]:
+    """按块读取行，产出 (起始行号, 行, UTF-8字节数)"""
+    lines = iter(lines)
+    first_line = 1
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        num_bytes = sum(len(line.encode('utf-8', 'surrogatepass')) for line in chunk)
+        yield first_line, [line.rstrip('\r\n') for line in chunk], num_bytes
+        first_line += len(chunk)
+
+
+def iter_convert(lines: Iterable[str], workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 strict: bool = False, max_pending: Optional[int] = None,
+                 report: Optional[BatchReport] = None) -> Iterator[Tuple[List[str], List[LineFailure]]]:
+    """流式转换，按输入顺序逐块产出 (规范JSON列表, 失败记录)
+
+    Args:
+        lines: 输入行的可迭代对象
+        workers: 进程数，<= 1 时在当前进程中转换
+        chunk_size: 每个任务的行数
+        strict: 是否拒绝启发式解析的结果
+        max_pending: 同时在途的块数，默认为进程数的2倍
+        report: 累计统计
+    """
+    report = report if report is not None else BatchReport()
+    chunks = _iter_chunks(lines, chunk_size)
+
+    def collect(result, num_lines, num_bytes):
+        outputs, failures, tiers, skipped = result
+        report.lines += num_lines
+        report.bytes_read += num_bytes
+        report.converted += len(outputs)
+        report.failed += len(failures)
+        report.skipped += skipped
+        report.tiers.update(tiers)
+        return outputs, failures
+
+    if workers <= 1:
+        for first_line, chunk, num_bytes in chunks:
+            yield collect(convert_chunk(first_line, chunk, strict), len(chunk), num_bytes)
+        return
+
+    max_pending = max_pending or workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit(item):
+            first_line, chunk, num_bytes = item
+            return executor.submit(convert_chunk, first_line, chunk, strict), len(chunk), num_bytes
+
+        pending = deque(submit(item) for item in islice(chunks, max_pending))
+        while pending:
+            future, num_lines, num_bytes = pending.popleft()
+            next_item = next(chunks, None)
+            if next_item is not None:
+                pending.append(submit(next_item))
+            yield collect(future.result(), num_lines, num_bytes)
+
+
+def _open_input(path: str) -> TextIO:
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+def _open_output(path: str) -> TextIO:
+    if path == '-':
+        return io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', write_through=False)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def convert_file(input_path: str, output_path: str, workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 failures_path: Optional[str] = None, strict: bool = False) -> BatchReport:
+    """将输入文件逐行转换为NDJSON
+
+    Args:
+        input_path: 输入文件，'-' 表示标准输入，.gz 结尾时按gzip读取
+        output_path: 输出NDJSON文件，'-' 表示标准输出，.gz 结尾时按gzip写入
+        workers: 进程数，<= 0 表示使用全部CPU核心
+        chunk_size: 每个任务的行数
+        failures_path: 失败记录（JSONL）的保存路径，为None时不保存
+        strict: 是否拒绝启发式解析的结果
+
+    Returns:
+        BatchReport: 转换统计
+    """
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    report = BatchReport()
+    start = time.perf_counter()
+
+    failures_file = open(failures_path, 'w', encoding='utf-8') if failures_path else None
+    try:
+        with _open_input(input_path) as source, _open_output(output_path) as target:
+            for outputs, failures in iter_convert(source, workers, chunk_size, strict, report=report):
+                if outputs:
+                    target.write('\n'.join(outputs))
+                    target.write('\n')
+                if failures_file is not None:
+                    for failure in failures:
+                        failures_file.write(json.dumps(failure.to_dict(), ensure_ascii=False) + '\n')
+    finally:
+        if failures_file is not None:
+            failures_file.close()
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="将JSON/Python repr日志逐行转换为规范NDJSON")
+    parser.add_argument('input', help="输入文件，'-' 表示标准输入")
+    parser.add_argument('-o', '--output', default='-', help="输出NDJSON文件，默认为标准输出")
+    parser.add_argument('-w', '--workers', type=int, default=0, help="进程数，0 表示使用全部CPU核心")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="每个任务的行数")
+    parser.add_argument('--failures', default=None, help="失败记录（JSONL）保存路径")
+    parser.add_argument('--strict', action='store_true', help="不接受启发式解析的结果")
+    parser.add_argument('--report', default=None, help="将统计保存为JSON")
+    args = parser.parse_args(argv)
+
+    report = convert_file(args.input, args.output, args.workers, args.chunk_size, args.failures, args.strict)
+    print(report.summary(), file=sys.stderr)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, indent=2, ensure_ascii=False)
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
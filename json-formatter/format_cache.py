@@ -0,0 +1,157 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 缓存占用上限（按输入和渲染结果的大小估算）
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+MAX_CACHE_ENTRIES = 64
+# 解析后的Python对象大小约为输入文本的若干倍，按此系数估算
+PARSED_SIZE_FACTOR = 4
+
+
+def _text_size(text: str) -> int:
+    return len(text.encode('utf-8', errors='ignore')) if not text.isascii() else len(text)
+
+
+def _view_size(view: Any, text_size: int) -> int:
+    """估算视图占用：渲染结果按文本大小；路径索引、子树哈希等派生结构可通过 nbytes 报告自身大小，
+    否则与解析结果一样按输入文本大小估算（它们的条目数与文档节点数成正比，且放入缓存后还会增长）"""
+    if isinstance(view, str):
+        return _text_size(view)
+    return max(int(getattr(view, 'nbytes', 0)), text_size * PARSED_SIZE_FACTOR)
+
+
+@dataclass
+class CacheEntry:
+    """单个输入的缓存：解析结果及各视图的渲染结果"""
+    parse_result: Any
+    size: int
+    # 输入文本的字节数，用于估算派生视图的大小
+    text_size: int = 0
+    views: Dict[str, Any] = field(default_factory=dict)
+    view_sizes: Dict[str, int] = field(default_factory=dict)
+
+
+class FormatCache:
+    """按输入内容哈希缓存解析结果和渲染后的视图，按估算大小和条目数做LRU淘汰
+
+    切换视图或重复点击格式化时，同一输入只解析一次，每种视图只渲染一次。
+    懒加载树形视图展开节点时也从这里按文档ID（即输入哈希）取解析结果。
+    """
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES, max_entries: int = MAX_CACHE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # 视图的命中单独统计，避免与解析的命中率混在一起
+        self.view_hits = 0
+        self.view_misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+    def parse(self, text: str, parse_fn: Callable[[str], Any]) -> Tuple[str, Any, bool]:
+        """获取输入的解析结果，未命中时调用 parse_fn 解析并缓存
+
+        Returns:
+            tuple: (输入哈希, 解析结果, 是否命中缓存)
+        """
+        return self.get_or_compute(self.key(text), lambda: parse_fn(text), lambda _: _text_size(text))
+
+    def get_or_compute(self, key: str, compute_fn: Callable[[], Any],
+                       size_fn: Callable[[Any], int]) -> Tuple[str, Any, bool]:
+        """按给定的键获取结果，未命中时调用 compute_fn 计算并缓存
+
+        用于不是由输入文本直接解析得到的结果（如查询结果）：size_fn 根据结果返回等价的输入文本字节数，
+        条目及其视图的占用都按它估算。
+
+        Returns:
+            tuple: (键, 结果, 是否命中缓存)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, entry.parse_result, True
+            self.misses += 1
+
+        # 计算在锁外进行，避免大输入阻塞其他请求
+        parse_result = compute_fn()
+        text_size = size_fn(parse_result)
+        with self._lock:
+            if key not in self._entries:
+                size = text_size * (1 + PARSED_SIZE_FACTOR)
+                self._entries[key] = CacheEntry(parse_result, size, text_size)
+                self.total_bytes += size
+                self._evict()
+            return key, parse_result, False
+
+    def get_document(self, key: str) -> Optional[Any]:
+        """按输入哈希获取解析结果，不存在时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry.parse_result
+
+    def get_view(self, key: str, view_type: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or view_type not in entry.views:
+                self.view_misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.view_hits += 1
+            return entry.views[view_type]
+
+    def put_view(self, key: str, view_type: str, rendered: Any):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            # 替换已有视图时先扣除旧的大小
+            size = _view_size(rendered, entry.text_size) - entry.view_sizes.get(view_type, 0)
+            entry.views[view_type] = rendered
+            entry.view_sizes[view_type] = size + entry.view_sizes.get(view_type, 0)
+            entry.size += size
+            self.total_bytes += size
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        """淘汰最久未使用的条目，直到满足大小和条目数限制；最近写入的条目总是保留"""
+        while len(self._entries) > 1 and (self.total_bytes > self.max_bytes
+                                          or len(self._entries) > self.max_entries):
+            _, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'view_hits': self.view_hits,
+                'view_misses': self.view_misses,
+                'evictions': self.evictions,
+            }
+
+
+format_cache = FormatCache()
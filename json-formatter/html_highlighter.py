@@ -0,0 +1,79 @@
+import html
+import json
+from json.encoder import encode_basestring
+from typing import Any, List
+
+# 与Pygments JsonLexer相同的token类名，沿用 styles.css 中的Monokai配色
+CLASS_KEY = 'nt'
+CLASS_STRING = 's2'
+CLASS_NUMBER = 'mi'
+CLASS_CONSTANT = 'kc'
+
+FOLD_BUTTON = '<span class="fold-button">▼</span>'
+
+
+def _key_text(key: Any) -> str:
+    """与 json.dumps 一致：非字符串键（数字、布尔、None）转换为其JSON文本"""
+    return key if isinstance(key, str) else json.dumps(key)
+
+
+def _scalar_html(value: Any) -> str:
+    if isinstance(value, str):
+        # 与 json.dumps(ensure_ascii=False) 相同的转义，直接调用C实现避免逐值构造编码器
+        return f'<span class="{CLASS_STRING}">{html.escape(encode_basestring(value), quote=False)}</span>'
+    if value is None or isinstance(value, bool):
+        return f'<span class="{CLASS_CONSTANT}">{json.dumps(value)}</span>'
+    return f'<span class="{CLASS_NUMBER}">{html.escape(json.dumps(value, ensure_ascii=False), quote=False)}</span>'
+
+
+class JsonHtmlRenderer:
+    """从解析后的对象一次遍历生成带高亮、折叠按钮和缩进辅助线的HTML
+
+    输出与 json.dumps(indent=2, sort_keys=True) 的内容一致。每行一个 .line，
+    容器的子节点放在 .foldable-content 中，缩进和辅助线由CSS按嵌套层级实现，
+    不输出逐行的内联样式；折叠由 static/json_viewer.js 通过事件委托处理。
+    """
+
+    def __init__(self, sort_keys: bool = True):
+        self.sort_keys = sort_keys
+
+    def render(self, data: Any) -> str:
+        parts: List[str] = []
+        self._render_line(parts, '', data, '')
+        return ''.join(parts)
+
+    def _render_line(self, parts: List[str], prefix: str, value: Any, suffix: str):
+        """渲染一行；prefix 为键的HTML（含冒号），suffix 为行尾逗号"""
+        if isinstance(value, dict):
+            # 按键的JSON文本排序，混合类型的键也不会因无法比较而报错
+            items = sorted(value.items(), key=lambda item: _key_text(item[0])) if self.sort_keys else value.items()
+            opening, closing = '{', '}'
+        elif isinstance(value, (list, tuple)):
+            items = value
+            opening, closing = '[', ']'
+        else:
+            parts.append(f'<div class="line">{prefix}{_scalar_html(value)}{suffix}</div>')
+            return
+
+        if not value:
+            parts.append(f'<div class="line">{prefix}{opening}{closing}{suffix}</div>')
+            return
+
+        parts.append(f'<div class="line foldable">{FOLD_BUTTON}{prefix}{opening}'
+                     f'<span class="fold-summary">…{closing}{suffix}</span></div>'
+                     f'<div class="foldable-content">')
+        last = len(value) - 1
+        if opening == '{':
+            for index, (key, child) in enumerate(items):
+                key_html = html.escape(encode_basestring(_key_text(key)), quote=False)
+                self._render_line(parts, f'<span class="{CLASS_KEY}">{key_html}</span>: ', child,
+                                  ',' if index < last else '')
+        else:
+            for index, child in enumerate(items):
+                self._render_line(parts, '', child, ',' if index < last else '')
+        parts.append(f'</div><div class="line fold-end">{closing}{suffix}</div>')
+
+
+def render_json_html(data: Any, sort_keys: bool = True) -> str:
+    """渲染普通视图的JSON HTML（不含外层容器）"""
+    return JsonHtmlRenderer(sort_keys).render(data)
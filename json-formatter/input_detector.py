@@ -0,0 +1,66 @@
+import re
+import time
+from dataclasses import dataclass
+
+# 输入格式
+FORMAT_JSON = 'json'
+FORMAT_DATAVIEW = 'dataview'
+FORMAT_REPL = 'repl'
+FORMAT_REPR = 'repr'
+
+_WHITESPACE = re.compile(r'\s+')
+# repr特征：以 Name( 开头的命名对象、datetime.xxx、<Enum.MEMBER: value>
+_NAMED_OBJECT = re.compile(r'[A-Za-z_][\w.]*\(')
+_ENUM_REPR = re.compile(r'<\w+(?:\.\w+)+:')
+
+
+@dataclass
+class DetectedInput:
+    """输入格式识别结果"""
+    kind: str
+    # 去掉提示符、规范化空白后的文本
+    text: str
+    seconds: float = 0.0
+
+    @property
+    def is_python(self) -> bool:
+        """是否为Python调试输出（需要转换后才是JSON）"""
+        return self.kind != FORMAT_JSON
+
+
+class InputDetector:
+    """识别输入格式：JSON、VSCode DataView元组、REPL >>> 记录、dataclass等对象的repr
+
+    每次输入只做几次子串查找和一次锚定匹配，枚举正则只在出现 < 时运行，所有正则都已预编译。
+    文本框每次提交都会经过这里，因此不做任何完整解析。
+    """
+
+    def detect(self, text: str) -> DetectedInput:
+        start = time.perf_counter()
+        kind = FORMAT_JSON
+
+        # 移除第一行中 >>> 及之前可能的变量名和箭头；用子串查找代替正则，单行大文档也只需一次C扫描
+        prompt = text.find('>>>')
+        if prompt != -1 and text.find('\n', 0, prompt) == -1:
+            text = text[prompt + 3:]
+            kind = FORMAT_REPL
+        text = text.strip()
+
+        if text.startswith("('") and text.endswith(")"):
+            # 从VSCode DataView复制的元组，合并换行和多余空格
+            text = _WHITESPACE.sub(' ', text)
+            kind = FORMAT_DATAVIEW
+        elif kind == FORMAT_JSON and self._has_repr_marker(text):
+            kind = FORMAT_REPR
+
+        return DetectedInput(kind, text, time.perf_counter() - start)
+
+    @staticmethod
+    def _has_repr_marker(text: str) -> bool:
+        # 先用C实现的子串查找过滤，只有出现 < 时才运行枚举正则，大JSON文档几乎不产生开销
+        if _NAMED_OBJECT.match(text) or 'datetime.' in text:
+            return True
+        return '<' in text and _ENUM_REPR.search(text) is not None
+
+
+input_detector = InputDetector()
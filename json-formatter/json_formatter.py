@@ -1,13 +1,16 @@
 import gradio as gr  # type: ignore
 import json
-from pygments import highlight
-from pygments.lexers import JsonLexer
-from pygments.formatters import HtmlFormatter
 import html
-import re
-import ast
-
-from object_to_json_parser import ObjectParser
+import time
+
+from input_detector import input_detector
+from tiered_parser import TIER_JSON, ParseAttempt, ParseResult, parse_input
+from lazy_tree import create_lazy_tree_view, expand_tree_node
+from html_highlighter import render_json_html
+from format_cache import format_cache
+from json_query import PathIndex, QueryError, query_value
+from structural_diff import SubtreeHasher, diff_documents, render_diff_tree
+from share_store import PayloadError, build_share_query, decode_payload, document_store
 import os
 
 # 获取当前文件所在目录
@@ -21,78 +24,16 @@ def load_css():
         return f.read()
 
 
+def load_js(name: str) -> str:
+    """加载static目录下的JS文件"""
+    js_path = os.path.join(CURRENT_DIR, "static", name)
+    with open(js_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
 def parse_debug_output(debug_str: str) -> dict:
     """解析Python对象的调试输出字符串，转换为JSON兼容的字典"""
-    if not debug_str.strip():
-        return {}
-
-    # 移除可能的变量名和箭头
-    debug_str = re.sub(r'^.*?>>>\s*', '', debug_str)
-
-    # 预处理字符串
-    debug_str = debug_str.strip()
-
-    # 处理从VSCode DataView复制的格式
-    if debug_str.startswith("('") and debug_str.endswith(")"):
-        try:
-            # 1. 将换行符替换为空格
-            debug_str = ' '.join(line.strip() for line in debug_str.splitlines())
-            # 2. 移除多余的空格
-            debug_str = re.sub(r'\s+', ' ', debug_str)
-
-            # 将字符串作为Python表达式求值
-            parsed_tuple = ast.literal_eval(debug_str)
-            if isinstance(parsed_tuple, tuple) and len(parsed_tuple) == 2:
-                # 返回元组的第二个元素(通常是字典部分)
-                return parsed_tuple[1]
-        except Exception as e:
-            print(f"Debug: Parse error - {str(e)}")
-            pass
-
-    # 使用ObjectParser解析对象
-    parser = ObjectParser()
-    return parser.parse_object(debug_str)
-
-
-def process_json_line(line: str, indent_level: int = 0) -> tuple[str, bool]:
-    """处理单行JSON，返回处理后的行和是否需要折叠按钮"""
-    stripped = line.strip()
-    needs_fold = stripped.endswith('{') or stripped.endswith('[')
-    indent = ' ' * (indent_level * 2)
-
-    # 生成缩进辅助线的HTML
-    indent_guides = ''
-    for i in range(indent_level):
-        indent_guides += f'<span class="indent-guide" style="left: {i * 20 + 10}px"></span>'
-
-    if needs_fold:
-        fold_button = '<span class="fold-button">▼</span>'
-        return f'{indent_guides}{indent}{fold_button}{line}', True
-    return f'{indent_guides}{indent}{line}', False
-
-
-def add_fold_buttons(json_str: str) -> str:
-    """为JSON字符串添加折叠按钮"""
-    # 移除多余的空行和空格
-    lines = [line for line in json_str.split('\n') if line.strip()]
-    processed_lines = []
-    indent_level = 0
-
-    for line in lines:
-        stripped = line.strip()
-
-        # 处理缩进级别
-        if stripped.startswith('}') or stripped.startswith(']'):
-            indent_level = max(0, indent_level - 1)
-
-        processed_line, needs_fold = process_json_line(stripped, indent_level)
-        if needs_fold:
-            processed_lines.append(f'<div class="line foldable" data-indent="{indent_level}">{processed_line}</div>')
-            indent_level += 1
-        else:
-            processed_lines.append(f'<div class="line" data-indent="{indent_level}">{processed_line}</div>')
-
-    return ''.join(processed_lines)
+    return parse_input(debug_str).value
 
 
 def create_tree_view(json_data, level=0) -> str:
@@ -163,553 +104,412 @@ def create_tree_view(json_data, level=0) -> str:
         return f'<span class="tree-value copyable" data-type="{value_type}" onclick="copyToClipboard(this)" title="点击复制">{html.escape(str(json_data))}</span>'
 
 
-def format_json(input_json: str, view_type: str = "normal") -> str | dict:
-    """格式化JSON字符串并添加语法高亮"""
-    try:
-        if not input_json.strip():
-            return "请输入JSON数据" if view_type != "gradio" else {}
-
-        # 检查是否是VSCode DataView格式
-        if input_json.strip().startswith("('") and input_json.strip().endswith(")"):
-            parsed = parse_debug_output(input_json)
-        else:
-            # 尝试解析为标准JSON
-            try:
-                parsed = json.loads(input_json)
-            except json.JSONDecodeError:
-                # 如果JSON解析失败，尝试作为Python对象解析
-                parsed = parse_debug_output(input_json)
-
-        # Gradio内置JSON视图
-        if view_type == "gradio":
-            return parsed
+def render_view(parsed, view_type: str, doc_id: str) -> str:
+    """渲染树形视图或普通视图的HTML
 
+    Args:
+        parsed: 解析后的数据
+        view_type: tree/lazy_tree/normal
+        doc_id: 输入内容哈希，懒加载视图展开节点时据此取缓存的解析结果
+    """
+    if view_type in ("tree", "lazy_tree"):
         if view_type == "tree":
             tree_html = create_tree_view(parsed)
-            return f"""
-            <div class="tree-view">
-                {tree_html}
-                <div id="temp-container" style="position: absolute; top: -9999px; left: -9999px;"></div>
-            </div>
-            <style>
-                .tree-view {{
-                    background: #1e1e1e;
-                    padding: 10px;
-                    border-radius: 5px;
-                    margin: 10px 0;
-                    font-family: 'Monaco', 'Consolas', monospace;
-                    font-size: 14px;
-                    line-height: 1.5;
-                    color: #f8f8f2;
-                    overflow: auto;
-                    position: relative;
-                }}
-
-                .tree-item {{
-                    padding: 2px 0;
-                    white-space: nowrap;
-                    position: relative;
-                }}
-
-                .tree-line {{
-                    position: absolute;
-                    left: -12px;
-                    top: 0;
-                    bottom: 0;
-                    width: 1px;
-                    background-color: #444;
-                }}
-
-                .tree-item:before {{
-                    content: '';
-                    position: absolute;
-                    left: -12px;
-                    top: 50%;
-                    width: 12px;
-                    height: 1px;
-                    background-color: #444;
-                }}
-
-                .tree-item.leaf:before {{
-                    width: 8px;
-                }}
-
-                .tree-toggle {{
-                    cursor: pointer;
-                    display: inline-block;
-                    width: 20px;
-                    height: 20px;
-                    line-height: 20px;
-                    text-align: center;
-                    color: #888;
-                    user-select: none;
-                    transition: transform 0.2s;
-                    transform-origin: center center;
-                }}
-
-                .tree-toggle.collapsed {{
-                    transform: rotate(-90deg);
-                }}
-
-                .tree-key {{
-                    color: #f92672 !important;
-                    font-weight: bold;
-                    margin-right: 4px;
-                }}
-
-                .tree-value {{
-                    color: #a6e22e;
-                }}
-
-                .tree-value.copyable {{
-                    cursor: pointer;
-                    padding: 2px 4px;
-                    border-radius: 3px;
-                    transition: background-color 0.2s;
-                }}
-
-                .tree-value.copyable:hover {{
-                    background-color: rgba(255, 255, 255, 0.1);
-                }}
-
-                .tree-value[data-type="string"] {{
-                    color: #e6db74 !important;
-                }}
-                .tree-value[data-type="number"] {{
-                    color: #ae81ff !important;
-                }}
-                .tree-value[data-type="boolean"] {{
-                    color: #fd971f !important;
-                }}
-                .tree-value[data-type="null"] {{
-                    color: #888 !important;
-                }}
-
-                .tree-content {{
-                    display: block;
-                    position: relative;
-                    margin-left: 20px;
-                }}
-
-                .tree-content.collapsed {{
-                    display: none;
-                }}
-
-                /* 复制成功的动画效果 */
-                @keyframes copySuccess {{
-                    0% {{ background-color: rgba(255, 255, 255, 0.1); }}
-                    50% {{ background-color: rgba(0, 255, 0, 0.2); }}
-                    100% {{ background-color: rgba(255, 255, 255, 0.1); }}
-                }}
-
-                .copy-success {{
-                    animation: copySuccess 0.5s ease-in-out;
-                }}
-            </style>
-            <script>
-                async function copyToClipboard(element) {{
-                    const text = element.textContent;
-
-                    try {{
-                        // 优先使用现代 Clipboard API
-                        if (navigator.clipboard && window.isSecureContext) {{
-                            await navigator.clipboard.writeText(text);
-                            showCopySuccess(element);
-                            return;
-                        }}
-
-                        // 备选方案1: 使用 execCommand
-                        const textArea = document.createElement('textarea');
-                        textArea.value = text;
-                        textArea.style.position = 'fixed';
-                        textArea.style.left = '-9999px';
-                        textArea.style.top = '-9999px';
-                        document.body.appendChild(textArea);
-                        textArea.focus();
-                        textArea.select();
-
-                        try {{
-                            const successful = document.execCommand('copy');
-                            if (successful) {{
-                                showCopySuccess(element);
-                                return;
-                            }}
-                        }} catch (err) {{
-                            console.warn('execCommand 复制失败:', err);
-                        }} finally {{
-                            document.body.removeChild(textArea);
-                        }}
-
-                        // 备选方案2: 使用 Selection API
-                        const range = document.createRange();
-                        range.selectNodeContents(element);
-                        const selection = window.getSelection();
-                        selection.removeAllRanges();
-                        selection.addRange(range);
-
-                        try {{
-                            const successful = document.execCommand('copy');
-                            if (successful) {{
-                                showCopySuccess(element);
-                                return;
-                            }}
-                        }} catch (err) {{
-                            console.warn('Selection API 复制失败:', err);
-                        }}
-
-                        // 如果所有方法都失败了，提示用户
-                        console.error('所有复制方法都失败了');
-                        alert('复制失败，请尝试手动复制（Ctrl+C）');
-
-                    }} catch (err) {{
-                        console.error('复制过程出错:', err);
-                        alert('复制失败，请尝试手动复制（Ctrl+C）');
-                    }}
-                }}
-
-                function showCopySuccess(element) {{
-                    // 添加复制成功的视觉反馈
-                    element.classList.add('copy-success');
-                    setTimeout(() => {{
-                        element.classList.remove('copy-success');
-                    }}, 500);
-                }}
-
-                // 初始化复制功能
-                function initCopyListeners() {{
-                    const values = document.querySelectorAll('.tree-value.copyable');
-                    values.forEach(value => {{
-                        value.onclick = async (e) => {{
-                            e.preventDefault();
-                            e.stopPropagation();
-                            await copyToClipboard(value);
-                        }};
-                    }});
-                }}
-
-                // 确保在页面加载完成后初始化
-                if (document.readyState === 'loading') {{
-                    document.addEventListener('DOMContentLoaded', initCopyListeners);
-                }} else {{
-                    initCopyListeners();
-                }}
-
-                // 使用 MutationObserver 监听DOM变化
-                const copyObserver = new MutationObserver((mutations) => {{
-                    let shouldInit = false;
-                    mutations.forEach((mutation) => {{
-                        if (mutation.addedNodes.length) {{
-                            shouldInit = true;
-                        }}
-                    }});
-                    if (shouldInit) {{
-                        setTimeout(initCopyListeners, 0);
-                    }}
-                }});
-
-                // 开始观察DOM变化
-                copyObserver.observe(document.body, {{
-                    childList: true,
-                    subtree: true
-                }});
-
-                // 添加复制相关的样式
-                const style = document.createElement('style');
-                style.textContent = `
-                    .copy-success {{
-                        background-color: rgba(0, 255, 0, 0.2) !important;
-                        transition: background-color 0.5s ease;
-                    }}
-                    .tree-value.copyable {{
-                        cursor: pointer;
-                        padding: 2px 4px;
-                        border-radius: 3px;
-                        transition: background-color 0.2s;
-                    }}
-                    .tree-value.copyable:hover {{
-                        background-color: rgba(255, 255, 255, 0.1);
-                    }}
-                `;
-                document.head.appendChild(style);
-            </script>
-            """
-
-        # 普通视图的处理逻辑
-        formatted = json.dumps(parsed, indent=2, ensure_ascii=False, sort_keys=True)
-        formatter = HtmlFormatter(style='monokai', cssclass='highlight', nowrap=True)
-        highlighted = highlight(formatted, JsonLexer(), formatter)
-        highlighted_with_buttons = add_fold_buttons(highlighted)
-
+        else:
+            # 懒加载：解析结果已缓存，只渲染前几层，其余节点展开时再加载
+            tree_html = create_lazy_tree_view(parsed, doc_id)
         return f"""
+        <div class="tree-view">
+            {tree_html}
+            <div id="temp-container" style="position: absolute; top: -9999px; left: -9999px;"></div>
+        </div>
         <style>
-            .json-viewer {{
+            .tree-view {{
                 background: #1e1e1e;
                 padding: 10px;
                 border-radius: 5px;
                 margin: 10px 0;
-                min-height: 100px;
                 font-family: 'Monaco', 'Consolas', monospace;
                 font-size: 14px;
                 line-height: 1.5;
+                color: #f8f8f2;
                 overflow: auto;
-            }}
-
-            .line {{
-                padding: 2px 0 2px 10px;
-                white-space: pre;
-                display: block;
                 position: relative;
-                min-height: 20px;
             }}
 
-            .line:hover {{
-                background-color: rgba(255, 255, 255, 0.1);
+            .tree-item {{
+                padding: 2px 0;
+                white-space: nowrap;
+                position: relative;
             }}
 
-            .indent-guide {{
+            .tree-line {{
                 position: absolute;
+                left: -12px;
                 top: 0;
                 bottom: 0;
                 width: 1px;
                 background-color: #444;
-                pointer-events: none;
             }}
 
-            .fold-button {{
+            .tree-item:before {{
+                content: '';
+                position: absolute;
+                left: -12px;
+                top: 50%;
+                width: 12px;
+                height: 1px;
+                background-color: #444;
+            }}
+
+            .tree-item.leaf:before {{
+                width: 8px;
+            }}
+
+            .tree-toggle {{
                 cursor: pointer;
                 display: inline-block;
                 width: 20px;
+                height: 20px;
+                line-height: 20px;
                 text-align: center;
                 color: #888;
                 user-select: none;
                 transition: transform 0.2s;
-                position: relative;
-                z-index: 1;
+                transform-origin: center center;
             }}
 
-            .fold-button:hover {{
-                color: #fff;
-            }}
-
-            .fold-button.folded {{
+            .tree-toggle.collapsed {{
                 transform: rotate(-90deg);
             }}
 
-            .foldable-content {{
-                position: relative;
+            .tree-key {{
+                color: #f92672 !important;
+                font-weight: bold;
+                margin-right: 4px;
             }}
 
-            .foldable-content.folded {{
-                display: none;
+            .tree-value {{
+                color: #a6e22e;
             }}
 
-            /* Pygments Monokai 主题 - 优化高亮样式 */
-            .highlight {{ background: transparent !important; color: #f8f8f2 !important; }}
-            .highlight .p {{ color: #f8f8f2 !important; }}
-            .highlight .s2, .highlight .s1 {{ color: #a6e22e !important; }}
-            .highlight .mi, .highlight .mf {{ color: #ae81ff !important; }}
-            .highlight .kc {{ color: #fd971f !important; }}
-            .highlight .nt {{ color: #f92672 !important; }}
-
-            /* 格式化按钮样式 */
-            .format-btn.primary {{
-            background: #2196f3 !important;
-                border: none !important;
-                box-shadow: 0 2px 4px rgba(33, 150, 243, 0.3) !important;
-                transition: all 0.3s ease !important;
-                margin-right: 10px !important;
+            .tree-value.copyable {{
+                cursor: pointer;
+                padding: 2px 4px;
+                border-radius: 3px;
+                transition: background-color 0.2s;
             }}
 
-            .format-btn.primary:hover {{
-            background: #1976d2 !important;
-                box-shadow: 0 4px 8px rgba(33, 150, 243, 0.4) !important;
-                transform: translateY(-1px);
+            .tree-value.copyable:hover {{
+                background-color: rgba(255, 255, 255, 0.1);
             }}
 
-            /* 清空按钮样式 */
-            .clear-btn.secondary {{
-            background: #666 !important;
-                border: none !important;
-                box-shadow: 0 2px 4px rgba(0, 0, 0, 0.2) !important;
-                transition: all 0.3s ease !important;
+            .tree-value[data-type="string"] {{
+                color: #e6db74 !important;
             }}
-
-            .clear-btn.secondary:hover {{
-            background: #555 !important;
-                box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3) !important;
-                transform: translateY(-1px);
+            .tree-value[data-type="number"] {{
+                color: #ae81ff !important;
             }}
-
-            /* 按钮容器样式 */
-            .format-button {{
-            display: flex !important;
-                gap: 10px !important;
-                justify-content: flex-end !important;
+            .tree-value[data-type="boolean"] {{
+                color: #fd971f !important;
             }}
-
-            /* 调整JSON组件的样式 */
-            .resizable-box > .gradio-container {{
-            height: 100%;
+            .tree-value[data-type="null"] {{
+                color: #888 !important;
             }}
 
-            .resizable-box > .gradio-container > div:first-child {{
-            height: 100%;
-                margin: 0;
+            .tree-content {{
+                display: block;
+                position: relative;
+                margin-left: 20px;
             }}
 
-            .resizable-box .json-component {{
-            height: 100% !important;
-                background: transparent;
+            .tree-content.collapsed {{
+                display: none;
             }}
 
-            .resizable-box .json-component > div {{
-            height: 100% !important;
-                max-height: none !important;
+            /* 复制成功的动画效果 */
+            @keyframes copySuccess {{
+                0% {{ background-color: rgba(255, 255, 255, 0.1); }}
+                50% {{ background-color: rgba(0, 255, 0, 0.2); }}
+                100% {{ background-color: rgba(255, 255, 255, 0.1); }}
             }}
 
-            .resizable-box .json-component > div > pre {{
-            height: 100% !important;
-                max-height: none !important;
+            .copy-success {{
+                animation: copySuccess 0.5s ease-in-out;
             }}
+        </style>
+        <script>
+            async function copyToClipboard(element) {{
+                const text = element.textContent;
+
+                try {{
+                    // 优先使用现代 Clipboard API
+                    if (navigator.clipboard && window.isSecureContext) {{
+                        await navigator.clipboard.writeText(text);
+                        showCopySuccess(element);
+                        return;
+                    }}
 
-            /* 调整HTML视图的样式 */
-            .resizable-box .json-viewer {{
-            margin: 0;
-                height: 100%;
-            }}
+                    // 备选方案1: 使用 execCommand
+                    const textArea = document.createElement('textarea');
+                    textArea.value = text;
+                    textArea.style.position = 'fixed';
+                    textArea.style.left = '-9999px';
+                    textArea.style.top = '-9999px';
+                    document.body.appendChild(textArea);
+                    textArea.focus();
+                    textArea.select();
 
-            /* 调整树形视图的样式 */
-            .resizable-box .tree-view {{
-            margin: 0;
-                height: 100%;
-            }}
+                    try {{
+                        const successful = document.execCommand('copy');
+                        if (successful) {{
+                            showCopySuccess(element);
+                            return;
+                        }}
+                    }} catch (err) {{
+                        console.warn('execCommand 复制失败:', err);
+                    }} finally {{
+                        document.body.removeChild(textArea);
+                    }}
 
-            /* 移除JSON组件的label */
-            .resizable-box .gradio-container .label-wrap {{
-            display: none;
-            }}
+                    // 备选方案2: 使用 Selection API
+                    const range = document.createRange();
+                    range.selectNodeContents(element);
+                    const selection = window.getSelection();
+                    selection.removeAllRanges();
+                    selection.addRange(range);
 
-            /* 按钮组样式 */
-            .button-group {{
-            display: flex !important;
-                gap: 10px !important;
-                justify-content: flex-end !important;
-                align-items: center !important;
-            }}
+                    try {{
+                        const successful = document.execCommand('copy');
+                        if (successful) {{
+                            showCopySuccess(element);
+                            return;
+                        }}
+                    }} catch (err) {{
+                        console.warn('Selection API 复制失败:', err);
+                    }}
 
-            .button-group > div {{
-            flex: 0 0 auto !important;
-            }}
+                    // 如果所有方法都失败了，提示用户
+                    console.error('所有复制方法都失败了');
+                    alert('复制失败，请尝试手动复制（Ctrl+C）');
 
-            .format-btn.primary, .clear-btn.secondary {{
-            margin: 0 !important;
-                min-width: 80px !important;
-            }}
-        </style>
-        <script>
-            function toggleFoldButton(event) {{
-                const button = event.target;
-                if (!button.classList.contains('fold-button')) return;
-
-                button.classList.toggle('folded');
-                const line = button.closest('.line');
-                if (!line) return;
-
-                let content = line.nextElementSibling;
-                while (content && !content.classList.contains('line')) {{
-                    if (content.classList.contains('foldable-content')) {{
-                        content.classList.toggle('folded');
-                        break;
-                    }}
-                    content = content.nextElementSibling;
+                }} catch (err) {{
+                    console.error('复制过程出错:', err);
+                    alert('复制失败，请尝试手动复制（Ctrl+C）');
                 }}
-                event.stopPropagation();
             }}
 
-            function initFoldButtons() {{
-                const buttons = document.querySelectorAll('.fold-button');
-                buttons.forEach(button => {{
-                    button.removeEventListener('click', toggleFoldButton);
-                    button.addEventListener('click', toggleFoldButton);
-                }});
-
-                document.querySelectorAll('.foldable').forEach(line => {{
-                    const nextLines = [];
-                    let next = line.nextElementSibling;
-                    let depth = 1;
-
-                    while (next && depth > 0) {{
-                        const content = next.textContent.trim();
-                        if (content.endsWith('{{') || content.endsWith('[')) {{
-                            depth++;
-                        }} else if (content === '}}' || content === ']') {{
-                            depth--;
-                        }}
-                        if (depth > 0) {{
-                            nextLines.push(next);
-                        }}
-                        next = next.nextElementSibling;
-                    }}
+            function showCopySuccess(element) {{
+                // 添加复制成功的视觉反馈
+                element.classList.add('copy-success');
+                setTimeout(() => {{
+                    element.classList.remove('copy-success');
+                }}, 500);
+            }}
 
-                    if (nextLines.length > 0) {{
-                        const wrapper = document.createElement('div');
-                        wrapper.className = 'foldable-content';
-                        line.parentNode.insertBefore(wrapper, line.nextSibling);
-                        nextLines.forEach(node => wrapper.appendChild(node));
-                    }}
+            // 初始化复制功能
+            function initCopyListeners() {{
+                const values = document.querySelectorAll('.tree-value.copyable');
+                values.forEach(value => {{
+                    value.onclick = async (e) => {{
+                        e.preventDefault();
+                        e.stopPropagation();
+                        await copyToClipboard(value);
+                    }};
                 }});
             }}
 
+            // 确保在页面加载完成后初始化
+            if (document.readyState === 'loading') {{
+                document.addEventListener('DOMContentLoaded', initCopyListeners);
+            }} else {{
+                initCopyListeners();
+            }}
+
             // 使用 MutationObserver 监听DOM变化
-            if (typeof foldButtonsObserver === 'undefined') {{
-                window.foldButtonsObserver = new MutationObserver((mutations) => {{
-                    mutations.forEach((mutation) => {{
-                        if (mutation.addedNodes.length) {{
-                            setTimeout(initFoldButtons, 0);
-                        }}
-                    }});
+            const copyObserver = new MutationObserver((mutations) => {{
+                let shouldInit = false;
+                mutations.forEach((mutation) => {{
+                    if (mutation.addedNodes.length) {{
+                        shouldInit = true;
+                    }}
                 }});
+                if (shouldInit) {{
+                    setTimeout(initCopyListeners, 0);
+                }}
+            }});
 
-                foldButtonsObserver.observe(document.body, {{
-                    childList: true,
-                    subtree: true
-                }});
-            }}
+            // 开始观察DOM变化
+            copyObserver.observe(document.body, {{
+                childList: true,
+                subtree: true
+            }});
 
-            // 初始化
-            document.addEventListener('DOMContentLoaded', initFoldButtons);
-            setTimeout(initFoldButtons, 100);
+            // 添加复制相关的样式
+            const style = document.createElement('style');
+            style.textContent = `
+                .copy-success {{
+                    background-color: rgba(0, 255, 0, 0.2) !important;
+                    transition: background-color 0.5s ease;
+                }}
+                .tree-value.copyable {{
+                    cursor: pointer;
+                    padding: 2px 4px;
+                    border-radius: 3px;
+                    transition: background-color 0.2s;
+                }}
+                .tree-value.copyable:hover {{
+                    background-color: rgba(255, 255, 255, 0.1);
+                }}
+            `;
+            document.head.appendChild(style);
         </script>
-        <div class="json-viewer">
-            <div class="highlight">
-                {highlighted_with_buttons}
-            </div>
-        </div>
         """
 
+    # 普通视图：一次遍历直接生成高亮、可折叠的HTML，样式见 styles.css，折叠见 json_viewer.js
+    return f'<div class="json-viewer"><div class="highlight">{render_json_html(parsed)}</div></div>'
+
+
+def _path_index(doc_id: str, document) -> PathIndex:
+    """获取文档的路径索引，首次递归查询时构建，与解析结果一起缓存"""
+    index = format_cache.get_view(doc_id, "path_index")
+    if index is None:
+        index = PathIndex(document)
+        format_cache.put_view(doc_id, "path_index", index)
+    return index
+
+
+def apply_query(doc_id: str, document, query: str):
+    """对已解析的文档执行查询，查询结果按 (文档, 表达式) 缓存，可像普通文档一样渲染各视图
+
+    缓存占用按查询结果序列化后的大小估算，而不是缓存键的长度。
+
+    Returns:
+        tuple: (查询结果的文档ID, 查询结果的ParseResult, 是否命中缓存)
+    """
+    def run():
+        start = time.perf_counter()
+        value = query_value(document, query, lambda: _path_index(doc_id, document))
+        return ParseResult(value, "query", [ParseAttempt("query", time.perf_counter() - start)])
+
+    def result_size(result: ParseResult) -> int:
+        # ensure_ascii 时字符数即字节数，非ASCII字符按转义后的长度略微高估
+        return len(json.dumps(result.value, default=str))
+
+    key = format_cache.key(f"\0query\0{doc_id}\0{query.strip()}")
+    return format_cache.get_or_compute(key, run, result_size)
+
+
+def format_json(input_json: str, view_type: str = "normal", query: str = "") -> str | dict:
+    """格式化JSON字符串并添加语法高亮，解析结果和渲染后的视图按输入哈希缓存
+
+    query 不为空时只展示查询结果（JSONPath风格，见 json_query）。
+    """
+    try:
+        if not input_json.strip():
+            return "请输入JSON数据" if view_type != "gradio" else {}
+
+        # 依次尝试JSON、Python字面量、repr和启发式解析，同一输入只解析一次
+        doc_id, parse_result, cache_hit = format_cache.parse(input_json, parse_input)
+        status = parse_result.summary() + ("，已缓存" if cache_hit else "")
+        timings = ', '.join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in parse_result.timings().items())
+
+        if query and query.strip():
+            doc_id, parse_result, query_hit = apply_query(doc_id, parse_result.value, query)
+            matches = len(parse_result.value) if isinstance(parse_result.value, list) else 1
+            status += f"；查询 {matches} 项 ({parse_result.seconds * 1000:.1f} ms{'，已缓存' if query_hit else ''})"
+        parsed = parse_result.value
+
+        # Gradio内置JSON视图
+        if view_type == "gradio":
+            return parsed
+
+        rendered = format_cache.get_view(doc_id, view_type)
+        if rendered is None:
+            rendered = render_view(parsed, view_type, doc_id)
+            format_cache.put_view(doc_id, view_type, rendered)
+
+        return (f'<div class="parse-info" title="{html.escape(timings)}">解析方式: {html.escape(status)}</div>'
+                f'{rendered}')
+
     except json.JSONDecodeError as e:
         return f"JSON解析错误: {str(e)}" if view_type != "gradio" else {}
+    except QueryError as e:
+        return f"查询错误: {str(e)}" if view_type != "gradio" else {}
     except Exception as e:
         return f"发生错误: {str(e)}" if view_type != "gradio" else {}
 
 
+def _subtree_hasher(doc_id: str) -> SubtreeHasher:
+    """获取文档的子树哈希，与解析结果一起缓存，重复对比时无需重新计算"""
+    hasher = format_cache.get_view(doc_id, "subtree_hashes")
+    if hasher is None:
+        hasher = SubtreeHasher()
+        format_cache.put_view(doc_id, "subtree_hashes", hasher)
+    return hasher
+
+
+def compare_json(left_text: str, right_text: str) -> str:
+    """对比两个JSON或Python对象输入，返回只包含变化路径的差异树HTML"""
+    if not left_text.strip() or not right_text.strip():
+        return "请输入要对比的两份数据"
+    try:
+        left_id, left, _ = format_cache.parse(left_text, parse_input)
+        right_id, right, _ = format_cache.parse(right_text, parse_input)
+        result = diff_documents(left.value, right.value, _subtree_hasher(left_id), _subtree_hasher(right_id))
+    except Exception as e:
+        return f"发生错误: {str(e)}"
+    return (f'<div class="parse-info">{html.escape(result.summary())}</div>'
+            f'<div class="tree-view diff-view">{render_diff_tree(result)}</div>')
+
+
+def to_json_text(input_text: str, detected=None) -> str | None:
+    """将Python调试输出转换为缩进的JSON文本
+
+    转换结果按输入哈希缓存；转换后的JSON文本也以同一解析结果登记到缓存，
+    随后格式化这段文本时直接命中，不再解析第二次。
+    """
+    doc_id, parse_result, _ = format_cache.parse(input_text, lambda text: parse_input(text, detected))
+    json_text = format_cache.get_view(doc_id, "json_text")
+    if json_text is None and parse_result.value is not None:
+        json_text = json.dumps(parse_result.value, ensure_ascii=False, indent=2)
+        format_cache.put_view(doc_id, "json_text", json_text)
+        format_cache.parse(json_text, lambda text: ParseResult(parse_result.value, TIER_JSON,
+                                                               input_format=parse_result.input_format))
+    return json_text
+
+
 def load_from_params(request: gr.Request):
-    """从URL查询参数中加载JSON数据"""
+    """从URL查询参数中加载JSON数据
+
+    支持的参数（按优先级）：
+        z: 压缩后base64url编码的文档，见 share_store.encode_payload
+        id: 保存在服务端的文档ID，见 share_store.build_share_query
+        json: JSON文本
+        object: Python对象的repr
+    """
     try:
+        # 压缩载荷或服务端文档，内容可能是JSON或Python调试输出
+        payload = request.query_params.get("z", "")
+        doc_id = request.query_params.get("id", "")
+        if payload or doc_id:
+            text = decode_payload(payload) if payload else document_store.get(doc_id)
+            if not text:
+                return ""
+            detected = input_detector.detect(text)
+            return (to_json_text(text, detected) or "") if detected.is_python else text
+
         # 尝试获取json参数
         json_data = request.query_params.get("json", "")
         if json_data:
-            # 尝试解析JSON以验证其有效性
-            json.loads(json_data)
-            return json_data
+            # 验证JSON的有效性，解析结果留在缓存中供格式化时使用
+            _, parse_result, _ = format_cache.parse(json_data, parse_input)
+            return json_data if parse_result.tier == TIER_JSON else ""
 
         # 尝试获取object参数
         object_data = request.query_params.get("object", "")
         if object_data:
-            # 使用parse_debug_output解析对象格式
-            parsed_data = parse_debug_output(object_data)
-            if parsed_data:
-                return json.dumps(parsed_data, ensure_ascii=False, indent=2)
+            return to_json_text(object_data) or ""
 
     except:
         return ""
@@ -721,16 +521,31 @@ def process_input(input_text: str, request: gr.Request):
     if not input_text:
         return load_from_params(request)
 
-    # 检查是否是Python调试输出格式
-    if '>>>' in input_text or any(x in input_text for x in ['datetime.', '<UserRole.', '<MessageType.']):
-        parsed_data = parse_debug_output(input_text)
-        if parsed_data is not None:
-            return json.dumps(parsed_data, ensure_ascii=False, indent=2)
+    # 检查是否是Python调试输出格式（REPL记录、DataView元组、对象repr）
+    detected = input_detector.detect(input_text)
+    if detected.is_python:
+        # 复用已有的格式识别结果，切换视图时无需重新解析
+        json_text = to_json_text(input_text, detected)
+        if json_text is not None:
+            return json_text
 
     return input_text
 
 
-with gr.Blocks(theme=gr.themes.Soft()) as demo:
+def create_share_link(input_text: str, request: gr.Request):
+    """生成当前输入的分享链接：小文档压缩后放进URL，大文档保存到服务端只带ID"""
+    if not input_text.strip():
+        return gr.update(visible=False, value="")
+    # Gradio的请求发往API路由，页面地址取自Referer
+    page_url = (request.headers.get("referer") or "").split("?", 1)[0]
+    try:
+        query = build_share_query(input_text)
+    except PayloadError as e:
+        return gr.update(visible=True, value=f"无法分享: {e}")
+    return gr.update(visible=True, value=f"{page_url}?{query}")
+
+
+with gr.Blocks(theme=gr.themes.Soft(), head=f"<script>{load_js('lazy_tree.js')}</script><script>{load_js('json_viewer.js')}</script>") as demo:
     gr.Markdown("# Shumin's magic tool")
 
     # 加载外部CSS
@@ -752,7 +567,7 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
     with gr.Row(elem_classes="control-panel"):
         with gr.Column(scale=2):
             view_type = gr.Radio(
-                choices=["树形视图", "普通视图", "Gradio视图"],
+                choices=["树形视图", "懒加载视图", "普通视图", "Gradio视图"],
                 value="树形视图",
                 label="",
                 elem_classes="view-type-radio",
@@ -774,6 +589,37 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
                     size="lg",
                     elem_classes="clear-btn"
                 )
+                share_btn = gr.Button(
+                    "分享",
+                    variant="secondary",
+                    size="lg",
+                    elem_classes="clear-btn"
+                )
+
+    query_input = gr.Textbox(
+        label="查询",
+        placeholder="JSONPath查询，如 messages[*].content、$..id、users[?(@.role == 'admin')].name，回车执行",
+        lines=1,
+        interactive=True
+    )
+
+    share_link = gr.Textbox(
+        label="分享链接",
+        show_copy_button=True,
+        interactive=False,
+        visible=False
+    )
+
+    # 对比模式：与上面的输入做结构化对比
+    with gr.Accordion("对比", open=False):
+        compare_json_input = gr.Textbox(
+            label="对比JSON",
+            placeholder="在此粘贴要与上面输入对比的JSON或Python对象...",
+            lines=6,
+            max_lines=30,
+            interactive=True
+        )
+        compare_btn = gr.Button("对比", variant="secondary", elem_classes="clear-btn")
 
     with gr.Row():
         with gr.Column(elem_classes="resizable-box", scale=1):
@@ -789,16 +635,17 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
                 visible=False
             )
 
-    def update_view(input_text: str, view_type: str, request: gr.Request):
+    def update_view(input_text: str, view_type: str, query: str, request: gr.Request):
         input_text = process_input(input_text, request)
         # 转换视图类型
         view_map = {
             "树形视图": "tree",
+            "懒加载视图": "lazy_tree",
             "普通视图": "normal",
             "Gradio视图": "gradio"
         }
         internal_view_type = view_map.get(view_type, "tree")
-        result = format_json(input_text, internal_view_type)
+        result = format_json(input_text, internal_view_type, query)
         if internal_view_type == "gradio":
             return {
                 output_html: gr.update(visible=False),
@@ -820,6 +667,9 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
             input_json: gr.update(value="")
         }
 
+    # 懒加载视图展开节点时调用的接口
+    gr.api(expand_tree_node, api_name="expand_tree_node")
+
     # 绑定清空按钮点击事件
     clear_btn.click(
         fn=clear_all,
@@ -827,6 +677,26 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
         outputs=[output_html, output_json, input_json]
     )
 
+    # 生成分享链接
+    share_btn.click(
+        fn=create_share_link,
+        inputs=[input_json],
+        outputs=[share_link]
+    )
+
+    def update_diff(input_text: str, compare_text: str):
+        return {
+            output_html: gr.update(visible=True, value=compare_json(input_text, compare_text)),
+            output_json: gr.update(visible=False)
+        }
+
+    # 绑定对比按钮点击事件
+    compare_btn.click(
+        fn=update_diff,
+        inputs=[input_json, compare_json_input],
+        outputs=[output_html, output_json]
+    )
+
     # 添加示例数据
     examples = gr.Examples(
         examples=[
@@ -841,26 +711,33 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
     # 页面加载时自动格式化
     @demo.load(outputs=[output_html, output_json, input_json])
     def on_load(request: gr.Request):
-        return update_view("", "树形视图", request)
+        return update_view("", "树形视图", "", request)
 
     # 绑定按钮点击事件
     format_btn.click(
         fn=update_view,
-        inputs=[input_json, view_type],
+        inputs=[input_json, view_type, query_input],
         outputs=[output_html, output_json, input_json]
     )
 
     # 输入框回车时自动格式化
     input_json.submit(
         fn=update_view,
-        inputs=[input_json, view_type],
+        inputs=[input_json, view_type, query_input],
+        outputs=[output_html, output_json, input_json]
+    )
+
+    # 查询框回车时执行查询
+    query_input.submit(
+        fn=update_view,
+        inputs=[input_json, view_type, query_input],
         outputs=[output_html, output_json, input_json]
     )
 
     # 视图类型改变时自动更新
     view_type.change(
         fn=update_view,
-        inputs=[input_json, view_type],
+        inputs=[input_json, view_type, query_input],
         outputs=[output_html, output_json, input_json]
     )
 
@@ -0,0 +1,376 @@
+"""JSONPath风格的查询
+
+支持的语法（开头的 $ 可省略）:
+    $.a.b / a.b          按键取值
+    ['a b'] / ['a','b']  带特殊字符的键、多个键
+    [0] / [-1] / [1:5]   下标、负下标、切片
+    [*] / .*             所有子节点
+    ..key / ..*          递归查找任意层级的键 / 所有后代
+    [?(@.age > 25)]      过滤：支持 == != < <= > >=、=~（正则），&& ||，以及 [?(@.key)] 判断键存在
+
+例如 messages[*].content、$..id、users[?(@.role == 'admin')].name
+"""
+import ast
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+PathType = Tuple[Union[str, int], ...]
+Match = Tuple[PathType, Any]
+
+# 步骤类型
+STEP_KEY = 'key'
+STEP_INDEX = 'index'
+STEP_SLICE = 'slice'
+STEP_WILDCARD = 'wildcard'
+STEP_DESCENDANT = 'descendant'
+STEP_FILTER = 'filter'
+
+_NAME_PATTERN = re.compile(r'[\w$][\w$\-]*')
+_INDEX_PATTERN = re.compile(r'-?\d+')
+_SLICE_PATTERN = re.compile(r'(-?\d*)\s*:\s*(-?\d*)(?:\s*:\s*(-?\d*))?')
+_COMPARISON_PATTERN = re.compile(r'(@(?:\.[\w$\-]+|\[[^\]]*\])*)\s*(==|!=|<=|>=|<|>|=~)\s*(.+)', re.DOTALL)
+_RELATIVE_PATTERN = re.compile(r'@((?:\.[\w$\-]+|\[[^\]]*\])*)')
+
+
+class QueryError(ValueError):
+    """查询表达式不合法"""
+
+
+@dataclass(frozen=True)
+class Step:
+    kind: str
+    # 键名（STEP_KEY为键的元组）、下标、切片、递归查找的键（None表示所有后代）或过滤函数
+    arg: Any = None
+
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    expression: str
+    steps: Tuple[Step, ...]
+
+    @property
+    def is_definite(self) -> bool:
+        """是否最多只匹配一个节点（只由单个键和下标组成）"""
+        return all(step.kind == STEP_INDEX or (step.kind == STEP_KEY and len(step.arg) == 1)
+                   for step in self.steps)
+
+
+def _find_bracket_end(text: str, start: int) -> int:
+    """返回与 text[start] 处的 [ 匹配的 ] 的位置，跳过引号和括号内的内容"""
+    depth = 0
+    quote = None
+    i = start
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char in '[(':
+            depth += 1
+        elif char in '])':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise QueryError(f"缺少 ]: {text[start:]}")
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    """按分隔符拆分，忽略引号和括号内的分隔符"""
+    parts, depth, quote, last, i = [], 0, None, 0, 0
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char in '[(':
+            depth += 1
+        elif char in '])':
+            depth -= 1
+        elif depth == 0 and text.startswith(separator, i):
+            parts.append(text[last:i])
+            last = i + len(separator)
+            i = last
+            continue
+        i += 1
+    parts.append(text[last:])
+    return parts
+
+
+def _parse_literal(text: str) -> Any:
+    text = text.strip()
+    if text in ('true', 'false', 'null'):
+        return json.loads(text)
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        raise QueryError(f"无法解析的值: {text}")
+
+
+def _compile_filter(text: str) -> Callable[[Any], bool]:
+    """编译过滤表达式为判断函数"""
+    alternatives = []
+    for alternative in _split_top_level(text, '||'):
+        conditions = [_compile_condition(part.strip()) for part in _split_top_level(alternative, '&&')]
+        alternatives.append(conditions)
+    return lambda node: any(all(condition(node) for condition in conditions) for conditions in alternatives)
+
+
+_MISSING = object()
+
+
+def _compile_condition(text: str) -> Callable[[Any], bool]:
+    if text.startswith('(') and text.endswith(')'):
+        return _compile_filter(text[1:-1])
+
+    match = _RELATIVE_PATTERN.fullmatch(text)
+    if match:
+        steps = _compile_steps(match.group(1))
+        return lambda node: _resolve_relative(node, steps) is not _MISSING
+
+    match = _COMPARISON_PATTERN.fullmatch(text)
+    if not match:
+        raise QueryError(f"无法解析的过滤条件: {text}")
+    steps = _compile_steps(match.group(1)[1:])
+    operator, operand = match.group(2), match.group(3).strip()
+
+    if operator == '=~':
+        regex_match = re.fullmatch(r'/(.*)/(i?)', operand, re.DOTALL)
+        pattern = re.compile(regex_match.group(1), re.IGNORECASE if regex_match.group(2) else 0) \
+            if regex_match else re.compile(_parse_literal(operand))
+        return lambda node: isinstance(value := _resolve_relative(node, steps), str) and bool(pattern.search(value))
+
+    expected = _parse_literal(operand)
+    compare = {
+        '==': lambda a, b: a == b and type(a) is type(b) or (_is_number(a) and _is_number(b) and a == b),
+        '!=': lambda a, b: not (a == b and type(a) is type(b) or (_is_number(a) and _is_number(b) and a == b)),
+        '<': lambda a, b: a < b,
+        '<=': lambda a, b: a <= b,
+        '>': lambda a, b: a > b,
+        '>=': lambda a, b: a >= b,
+    }[operator]
+
+    def condition(node: Any) -> bool:
+        value = _resolve_relative(node, steps)
+        if value is _MISSING:
+            return operator == '!='
+        try:
+            return bool(compare(value, expected))
+        except TypeError:
+            # 类型不同无法比较大小时视为不满足
+            return False
+
+    return condition
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _resolve_relative(node: Any, steps: Tuple[Step, ...]) -> Any:
+    """过滤条件中 @ 之后的简单路径（只含键和下标）"""
+    for step in steps:
+        try:
+            if step.kind == STEP_KEY and isinstance(node, dict):
+                node = node[step.arg[0]]
+            elif step.kind == STEP_INDEX and isinstance(node, list):
+                node = node[step.arg]
+            else:
+                return _MISSING
+        except (KeyError, IndexError):
+            return _MISSING
+    return node
+
+
+def _compile_bracket(content: str) -> Step:
+    content = content.strip()
+    if content == '*':
+        return Step(STEP_WILDCARD)
+    if content.startswith('?'):
+        return Step(STEP_FILTER, _compile_filter(content[1:].strip()))
+    if _INDEX_PATTERN.fullmatch(content):
+        return Step(STEP_INDEX, int(content))
+    match = _SLICE_PATTERN.fullmatch(content)
+    if match:
+        return Step(STEP_SLICE, slice(*(int(part) if part else None for part in match.groups())))
+    keys = []
+    for part in _split_top_level(content, ','):
+        key = _parse_literal(part)
+        if not isinstance(key, str):
+            raise QueryError(f"不支持的下标: {part.strip()}")
+        keys.append(key)
+    return Step(STEP_KEY, tuple(keys))
+
+
+def _compile_steps(text: str) -> Tuple[Step, ...]:
+    steps: List[Step] = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char.isspace():
+            i += 1
+        elif text.startswith('..', i):
+            i += 2
+            if text.startswith('*', i):
+                steps.append(Step(STEP_DESCENDANT, None))
+                i += 1
+            elif text.startswith('[', i):
+                # ..[0]、..['key'] 等价于 ..* 之后再取下标或键
+                steps.append(Step(STEP_DESCENDANT, None))
+            else:
+                match = _NAME_PATTERN.match(text, i)
+                if not match:
+                    raise QueryError(f".. 之后缺少键名: {text[i:]}")
+                steps.append(Step(STEP_DESCENDANT, match.group()))
+                i = match.end()
+        elif char == '.':
+            i += 1
+            if text.startswith('*', i):
+                steps.append(Step(STEP_WILDCARD))
+                i += 1
+            else:
+                match = _NAME_PATTERN.match(text, i)
+                if not match:
+                    raise QueryError(f". 之后缺少键名: {text[i:]}")
+                steps.append(Step(STEP_KEY, (match.group(),)))
+                i = match.end()
+        elif char == '[':
+            end = _find_bracket_end(text, i)
+            steps.append(_compile_bracket(text[i + 1:end]))
+            i = end + 1
+        else:
+            match = _NAME_PATTERN.match(text, i)
+            if not match or steps:
+                raise QueryError(f"无法解析: {text[i:]}")
+            # 省略 $ 时开头的键名
+            steps.append(Step(STEP_KEY, (match.group(),)))
+            i = match.end()
+    return tuple(steps)
+
+
+@lru_cache(maxsize=256)
+def compile_query(expression: str) -> CompiledQuery:
+    """编译查询表达式，结果按表达式缓存"""
+    text = expression.strip()
+    if text.startswith('$'):
+        text = text[1:]
+    return CompiledQuery(expression, _compile_steps(text))
+
+
+def _children(node: Any) -> Iterator[Tuple[Union[str, int], Any]]:
+    if isinstance(node, dict):
+        return iter(node.items())
+    if isinstance(node, list):
+        return enumerate(node)
+    return iter(())
+
+
+def _descendants(path: PathType, node: Any) -> Iterator[Match]:
+    """按文档顺序（先序）遍历所有后代，不含自身；使用显式栈，不受递归深度限制"""
+    stack = [(path, _children(node))]
+    while stack:
+        parent_path, children = stack[-1]
+        for key, child in children:
+            child_path = parent_path + (key,)
+            yield child_path, child
+            if isinstance(child, (dict, list)):
+                stack.append((child_path, _children(child)))
+                break
+        else:
+            stack.pop()
+
+
+class PathIndex:
+    """按键名索引文档中所有 (路径, 值)，首次递归查找（..key）时构建
+
+    与解析结果一起缓存，同一文档的后续递归查询直接查表。
+    """
+
+    def __init__(self, document: Any):
+        self.by_key: Dict[str, List[Match]] = {}
+        self.size = 0
+        for path, value in _descendants((), document):
+            if isinstance(path[-1], str):
+                self.by_key.setdefault(path[-1], []).append((path, value))
+                self.size += 1
+
+    def lookup(self, key: str) -> List[Match]:
+        return self.by_key.get(key, [])
+
+    @property
+    def nbytes(self) -> int:
+        """缓存占用的粗略估算：每条记录一个 (路径元组, 值) 及列表槽位"""
+        return self.size * 160
+
+
+def _apply_step(step: Step, matches: List[Match], index_fn: Optional[Callable[[], PathIndex]]) -> List[Match]:
+    result: List[Match] = []
+    for path, node in matches:
+        if step.kind == STEP_KEY:
+            if isinstance(node, dict):
+                result.extend((path + (key,), node[key]) for key in step.arg if key in node)
+        elif step.kind == STEP_INDEX:
+            if isinstance(node, list) and -len(node) <= step.arg < len(node):
+                index = step.arg % len(node)
+                result.append((path + (index,), node[index]))
+        elif step.kind == STEP_SLICE:
+            if isinstance(node, list):
+                indices = range(len(node))[step.arg]
+                result.extend((path + (i,), node[i]) for i in indices)
+        elif step.kind == STEP_WILDCARD:
+            result.extend((path + (key,), child) for key, child in _children(node))
+        elif step.kind == STEP_FILTER:
+            result.extend((path + (key,), child) for key, child in _children(node) if step.arg(child))
+        elif step.kind == STEP_DESCENDANT:
+            if step.arg is None:
+                result.extend(_descendants(path, node))
+            elif not path and index_fn is not None:
+                # 从根开始的递归查找直接查索引
+                result.extend(index_fn().lookup(step.arg))
+            else:
+                for child_path, child in _descendants(path, node):
+                    if child_path[-1] == step.arg:
+                        result.append((child_path, child))
+    return result
+
+
+def run_query(document: Any, expression: str,
+              index_fn: Optional[Callable[[], PathIndex]] = None) -> Tuple[CompiledQuery, List[Match]]:
+    """对文档执行查询
+
+    Args:
+        document: 解析后的文档
+        expression: 查询表达式
+        index_fn: 返回文档 PathIndex 的函数，用于从根开始的递归查找；为None时遍历文档
+
+    Returns:
+        tuple: (编译后的查询, [(路径, 值)])
+    """
+    query = compile_query(expression)
+    matches: List[Match] = [((), document)]
+    for step in query.steps:
+        matches = _apply_step(step, matches, index_fn)
+        if not matches:
+            break
+    return query, matches
+
+
+def query_value(document: Any, expression: str, index_fn: Optional[Callable[[], PathIndex]] = None) -> Any:
+    """执行查询并返回用于展示的值：确定路径且只匹配一个节点时返回该节点，否则返回匹配值的列表"""
+    query, matches = run_query(document, expression, index_fn)
+    if query.is_definite:
+        if not matches:
+            raise QueryError(f"路径不存在: {expression}")
+        return matches[0][1]
+    return [value for _, value in matches]
@@ -0,0 +1,135 @@
+import html
+import json
+from typing import Any, List, Union
+
+from format_cache import format_cache
+
+# 首次渲染展开的层数，更深的节点在展开时再向服务端请求
+LAZY_TREE_DEPTH = 2
+# 每次渲染的最大子节点数，超出部分通过"显示更多"分页加载
+LAZY_TREE_PAGE_SIZE = 200
+
+PathType = List[Union[str, int]]
+
+
+def value_type_name(value) -> str:
+    if value is None:
+        return "null"
+    elif isinstance(value, bool):
+        return "boolean"
+    elif isinstance(value, (int, float)):
+        return "number"
+    elif isinstance(value, str):
+        return "string"
+    else:
+        return type(value).__name__
+
+
+def resolve_path(data: Any, path: PathType) -> Any:
+    """按路径（键或下标列表）取子节点"""
+    node = data
+    for key in path:
+        if isinstance(node, list):
+            node = node[int(key)]
+        else:
+            node = node[key]
+    return node
+
+
+def _children(node: Any, offset: int, limit: int):
+    """返回 (键标签, 路径键, 值) 的迭代器和子节点总数"""
+    if isinstance(node, dict):
+        keys = list(node.keys())[offset:offset + limit]
+        return ((html.escape(str(key)), key, node[key]) for key in keys), len(node)
+    return ((f"[{i}]", i, node[i]) for i in range(offset, min(offset + limit, len(node)))), len(node)
+
+
+def _summary(node: Any) -> str:
+    if isinstance(node, dict):
+        return f"{{{len(node)}}}"
+    return f"[{len(node)}]"
+
+
+def render_children(doc_id: str, node: Any, path: PathType, depth: int,
+                    offset: int = 0, limit: int = LAZY_TREE_PAGE_SIZE) -> str:
+    """渲染容器节点的子节点
+
+    Args:
+        doc_id: 文档ID
+        node: 容器节点（dict 或 list）
+        path: 容器节点的路径
+        depth: 继续内联渲染的层数，为0时子容器只输出占位，展开时再加载
+        offset: 分页起始位置
+        limit: 本次渲染的最大子节点数
+    """
+    items = []
+    children, total = _children(node, offset, limit)
+    for label, key, value in children:
+        child_path = path + [key]
+        if isinstance(value, (dict, list)):
+            if depth > 0:
+                content = render_children(doc_id, value, child_path, depth - 1, limit=limit)
+                state = ''
+            else:
+                content = ''
+                state = ' collapsed'
+            items.append(
+                f'<div class="tree-item">'
+                f'<div class="tree-line"></div>'
+                f'<div class="tree-toggle lazy-toggle{state}">▼</div>'
+                f'<span class="tree-key">{label}</span> <span class="tree-summary">{_summary(value)}</span>'
+                f'<div class="tree-content{state}" data-doc="{doc_id}" data-path="{html.escape(json.dumps(child_path))}"'
+                f' data-loaded="{"1" if depth > 0 else "0"}">{content}</div>'
+                f'</div>'
+            )
+        else:
+            items.append(
+                f'<div class="tree-item leaf">'
+                f'<div class="tree-line"></div>'
+                f'<span class="tree-key">{label}</span>: '
+                f'<span class="tree-value copyable" data-type="{value_type_name(value)}" onclick="copyToClipboard(this)" '
+                f'title="点击复制">{html.escape(str(value))}</span>'
+                f'</div>'
+            )
+
+    remaining = total - offset - limit
+    if remaining > 0:
+        items.append(
+            f'<div class="tree-more" data-doc="{doc_id}" data-path="{html.escape(json.dumps(path))}" '
+            f'data-offset="{offset + limit}">显示更多（剩余 {remaining} 项）</div>'
+        )
+    return ''.join(items)
+
+
+def create_lazy_tree_view(json_data: Any, doc_id: str, depth: int = LAZY_TREE_DEPTH) -> str:
+    """创建懒加载的树形视图HTML，只渲染前 depth 层，更深的节点展开时通过 expand_tree_node 加载"""
+    if isinstance(json_data, (dict, list)):
+        return render_children(doc_id, json_data, [], depth - 1)
+    return (f'<span class="tree-value copyable" data-type="{value_type_name(json_data)}" '
+            f'onclick="copyToClipboard(this)" title="点击复制">{html.escape(str(json_data))}</span>')
+
+
+def expand_tree_node(doc_id: str, path_json: str, offset: int = 0) -> str:
+    """返回文档中指定路径节点的子节点HTML，供前端展开节点或加载更多时调用
+
+    Args:
+        doc_id: create_lazy_tree_view 使用的文档ID（输入内容哈希，ParseResult 保存在 format_cache 中）
+        path_json: JSON编码的路径，如 '["messages", 0]'
+        offset: 分页起始位置
+    """
+    parse_result = format_cache.get_document(doc_id)
+    if parse_result is None:
+        return '<div class="tree-error">文档已过期，请重新格式化</div>'
+    data = parse_result.value
+    try:
+        path = json.loads(path_json)
+        node = resolve_path(data, path)
+        # offset 来自公开的API，可能不是数字
+        offset = int(offset)
+        if offset < 0:
+            raise ValueError(offset)
+    except (ValueError, KeyError, IndexError, TypeError):
+        return '<div class="tree-error">节点不存在</div>'
+    if not isinstance(node, (dict, list)):
+        return ''
+    return render_children(doc_id, node, path, 0, offset=offset)
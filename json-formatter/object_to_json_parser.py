@@ -1,18 +1,48 @@
+import json
 import re
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+# 词法单元类型
+_STRING, _ENUM, _PUNCT, _ATOM = 'string', 'enum', 'punct', 'atom'
+
+# 单次扫描的词法规则：引号字符串（未闭合时延伸到末尾）、<枚举>、括号及分隔符、其余连续字符
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<string>'(?:[^'\\]|\\.)*(?:'|\Z)|"(?:[^"\\]|\\.)*(?:"|\Z))
+  | (?P<enum><[^<>]*>)
+  | (?P<punct>[\[\](){},:=])
+  | (?P<atom>[^\s\[\](){},:='"<>]+|[^\s])
+""", re.VERBOSE | re.DOTALL)
+
+_OPENERS = {'[': ']', '(': ')', '{': '}'}
+_CLOSERS = frozenset(']})')
+# 值的结束符：逗号和右括号；字典的键还可以以冒号或等号结束
+_VALUE_STOPS = frozenset(',]})')
+_KEY_STOPS = frozenset(',]}):=')
+_NUMBER_PATTERN = re.compile(r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+# 用于匹配datetime对象
+_DATETIME_PATTERN = re.compile(
+    r'datetime\.datetime\((\d{4}),\s*(\d{1,2}),\s*(\d{1,2}),\s*(\d{1,2}),\s*(\d{1,2})(?:,\s*(?:\d{1,2})?)?(?:,\s*tzinfo=datetime\.timezone\.utc)?\)'
+)
+# 用于匹配枚举值
+_ENUM_PATTERN = re.compile(r'<\w+\.(\w+):\s*\'(\w+)\'>')
 
 
 class ObjectParser:
+    """将Python对象的repr输出（命名对象、列表、字典、datetime、枚举等）解析为JSON兼容的结构
+
+    先用一个正则单次扫描得到词法单元（只记录起止位置），再递归下降构建结果，
+    所有子串都按位置切片获得，嵌套的值不会被重复扫描，耗时与输入长度成线性关系。
+    """
+
     def __init__(self):
-        # 用于匹配基本的键值对模式
-        self.kv_pattern = re.compile(r'(\w+)=(.+?)(?=,\s*\w+=|$)')
-        # 用于匹配datetime对象
-        self.datetime_pattern = re.compile(
-            r'datetime\.datetime\((\d{4}),\s*(\d{1,2}),\s*(\d{1,2}),\s*(\d{1,2}),\s*(\d{1,2})(?:,\s*(?:\d{1,2})?)?(?:,\s*tzinfo=datetime\.timezone\.utc)?\)'
-        )
-        # 用于匹配枚举值
-        self.enum_pattern = re.compile(r'<\w+\.(\w+):\s*\'(\w+)\'>')
+        # 正则在模块级预编译，实例化开销很小
+        self.datetime_pattern = _DATETIME_PATTERN
+        self.enum_pattern = _ENUM_PATTERN
+
+        self._text = ''
+        self._tokens: List[Tuple[str, int, int]] = []
 
     def parse_datetime(self, datetime_str: str) -> str:
         """解析datetime字符串为ISO格式"""
@@ -31,7 +61,32 @@ class ObjectParser:
         return enum_str
 
     def parse_value(self, value: str) -> Any:
-        """解析值的类型"""
+        """解析值的类型，命名对象解析为字典（不保留对象名称）"""
+        return self._parse_text(value, wrap_named=False)
+
+    def parse_object(self, obj_str: str) -> Union[Dict, List, Any]:
+        """解析对象字符串为字典或列表，最外层及列表中的命名对象解析为 {对象名称: 属性字典}"""
+        if not obj_str:
+            return {}
+        return self._parse_text(obj_str, wrap_named=True)
+
+    def _parse_text(self, text: str, wrap_named: bool) -> Any:
+        self._text = text
+        self._tokens = [(m.lastgroup, m.start(), m.end()) for m in _TOKEN_PATTERN.finditer(text)]
+        if not self._tokens:
+            return self._parse_scalar(text)
+        try:
+            value, i = self._parse_value_at(0, wrap_named)
+            if i < len(self._tokens):
+                # 值后面还有多余内容（如未加引号的文本），整体按标量处理
+                return self._parse_scalar(text)
+            return value
+        finally:
+            self._text = ''
+            self._tokens = []
+
+    def _parse_scalar(self, value: str) -> Any:
+        """解析不含嵌套结构的值：None、布尔、数字、datetime、枚举、字符串"""
         value = value.strip()
 
         # 处理None
@@ -43,12 +98,11 @@ class ObjectParser:
             return value == 'True'
 
         # 处理数字
-        try:
-            if '.' in value:
+        if _NUMBER_PATTERN.fullmatch(value):
+            try:
+                return int(value)
+            except ValueError:
                 return float(value)
-            return int(value)
-        except ValueError:
-            pass
 
         # 处理datetime
         if 'datetime.datetime' in value:
@@ -61,224 +115,180 @@ class ObjectParser:
         # 处理字符串形式的列表
         if (value.startswith('"[') and value.endswith(']"')) or \
            (value.startswith("'[") and value.endswith("]'")):
-            # 移除外层引号
-            inner_value = value[1:-1]
-            return self.parse_object(inner_value)
+            # 移除外层引号，按独立的输入解析
+            return ObjectParser().parse_object(value[1:-1])
 
         # 处理字符串（移除引号）
-        if (value.startswith("'") and value.endswith("'")) or \
-           (value.startswith('"') and value.endswith('"')):
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
             return value[1:-1]
 
-        # 处理列表
-        if value.startswith('[') and value.endswith(']'):
-            return self.parse_object(value)
-
-        # 处理字典
-        if value.startswith('{') and value.endswith('}'):
-            return self._parse_dict(value[1:-1])
-
-        # 处理命名对象
-        if '(' in value and value.endswith(')'):
-            obj_content = value[value.index('(')+1:-1]
-            return self._parse_dict(obj_content)
-
         return value
 
-    def _split_items(self, items_str: str) -> List[str]:
-        """分割列表或字典中的项"""
-        if not items_str.strip():
-            return []
-
+    def _kind(self, i: int) -> Optional[str]:
+        return self._tokens[i][0] if i < len(self._tokens) else None
+
+    def _char(self, i: int) -> Optional[str]:
+        """第i个词法单元为括号或分隔符时返回该字符"""
+        if i < len(self._tokens) and self._tokens[i][0] == _PUNCT:
+            return self._text[self._tokens[i][1]]
+        return None
+
+    def _slice(self, first: int, last: int) -> str:
+        """第first到第last-1个词法单元对应的原文"""
+        return self._text[self._tokens[first][1]:self._tokens[last - 1][2]]
+
+    def _skip_group(self, i: int) -> int:
+        """第i个词法单元为左括号，返回与之匹配的右括号之后的位置"""
+        depth = 0
+        while i < len(self._tokens):
+            char = self._char(i)
+            if char in _OPENERS:
+                depth += 1
+            elif char in _CLOSERS:
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        return i
+
+    def _skip_value(self, i: int) -> int:
+        """跳过从i开始直到同层的逗号或右括号，返回停止的位置"""
+        depth = 0
+        while i < len(self._tokens):
+            char = self._char(i)
+            if char in _OPENERS:
+                depth += 1
+            elif char in _CLOSERS:
+                if depth == 0:
+                    return i
+                depth -= 1
+            elif char == ',' and depth == 0:
+                return i
+            i += 1
+        return i
+
+    def _parse_value_at(self, i: int, wrap_named: bool = False,
+                        stops: frozenset = _VALUE_STOPS) -> Tuple[Any, int]:
+        """从第i个词法单元开始解析一个值，返回 (值, 下一个位置)
+
+        值之后若不是结束符（例如未加引号的带空格文本），则把到分隔符为止的原文整体按标量解析。
+        """
+        value, end = self._parse_structure(i, wrap_named)
+        if end < len(self._tokens) and self._char(end) not in stops:
+            end = self._skip_value(end)
+            value = self._parse_scalar(self._slice(i, end))
+        return value, end
+
+    def _parse_structure(self, i: int, wrap_named: bool) -> Tuple[Any, int]:
+        kind = self._kind(i)
+        char = self._char(i)
+
+        if char == '[':
+            items, end = self._parse_items(i + 1, ']')
+            return items, end
+        if char == '(':
+            # 元组按列表处理
+            items, end = self._parse_items(i + 1, ')')
+            return items, end
+        if char == '{':
+            return self._parse_mapping(i + 1)
+
+        if kind == _ATOM and self._char(i + 1) == '(':
+            name = self._slice(i, i + 1)
+            if 'datetime.datetime' in name:
+                end = self._skip_group(i + 1)
+                return self.parse_datetime(self._slice(i, end)), end
+            value, end = self._parse_call(i + 2)
+            return ({name: value} if wrap_named else value), end
+
+        if kind is None or char is not None:
+            # 缺少值（如 "a=,"），按空字符串处理
+            return '', i
+        token = self._slice(i, i + 1)
+        if kind == _STRING:
+            return self._parse_string(token), i + 1
+        if kind == _ENUM:
+            return self.parse_enum(token), i + 1
+        return self._parse_scalar(token), i + 1
+
+    def _parse_string(self, token: str) -> Any:
+        """解析引号字符串，内容为列表时（如 "['a', 'b']"）继续解析"""
+        if len(token) < 2 or token[-1] != token[0]:
+            # 未闭合的引号
+            return token
+        inner = token[1:-1]
+        if inner.startswith('[') and inner.endswith(']'):
+            return ObjectParser().parse_object(inner)
+        return inner
+
+    def _expect_close(self, i: int, closer: str) -> int:
+        """跳过右括号，输入被截断时容忍缺失"""
+        return i + 1 if self._char(i) == closer else i
+
+    def _parse_items(self, i: int, closer: str) -> Tuple[List, int]:
+        """解析逗号分隔的列表项，列表中的命名对象保留对象名称"""
         items = []
-        current_item = ''
-        bracket_count = 0
-        quote_char = None
-        in_datetime = False
-
-        i = 0
-        while i < len(items_str):
-            char = items_str[i]
-
-            # 检测datetime开始
-            if items_str[i:].startswith('datetime.datetime'):
-                in_datetime = True
-
-            # 处理引号
-            if char in '"\'':
-                if quote_char is None:
-                    quote_char = char
-                elif char == quote_char and items_str[i-1] != '\\':
-                    quote_char = None
-
-            # 如果在引号内，直接添加字符
-            if quote_char is not None:
-                current_item += char
+        while i < len(self._tokens) and self._char(i) != closer:
+            if self._char(i) == ',':
                 i += 1
                 continue
-
-            # 如果在datetime内部，需要特殊处理
-            if in_datetime:
-                current_item += char
-                if char == ')':
-                    in_datetime = False
+            if self._char(i) in _CLOSERS:
+                # 括号不匹配，跳过多余的右括号
                 i += 1
                 continue
+            value, i = self._parse_value_at(i, wrap_named=True)
+            items.append(value)
+        return items, self._expect_close(i, closer)
 
-            # 处理逗号分隔
-            if char == ',' and bracket_count == 0:
-                if current_item.strip():
-                    items.append(current_item.strip())
-                current_item = ''
-                i += 1
-                while i < len(items_str) and items_str[i].isspace():
-                    i += 1
-                continue
-
-            current_item += char
-
-            if char in '[{(':
-                bracket_count += 1
-            elif char in ']})':
-                bracket_count -= 1
-
-            i += 1
-
-        if current_item.strip():
-            items.append(current_item.strip())
-
-        return items
-
-    def _parse_dict(self, dict_str: str) -> Dict:
-        """解析字典内容"""
-        if not dict_str.strip():
-            return {}
-
+    def _parse_mapping(self, i: int) -> Tuple[Union[Dict, List], int]:
+        """解析 {key: value} 或 {key=value}，没有键值分隔符的 {a, b} 按集合解析为列表"""
         result = {}
-        current_key = None
-        current_value = ''
-        bracket_count = 0
-        quote_char = None
-        in_datetime = False
-
-        i = 0
-        while i < len(dict_str):
-            char = dict_str[i]
-
-            # 检测datetime开始
-            if dict_str[i:].startswith('datetime.datetime'):
-                in_datetime = True
-
-            # 处理引号
-            if char in '"\'':
-                if quote_char is None:
-                    quote_char = char
-                elif char == quote_char and dict_str[i-1] != '\\':
-                    quote_char = None
-
-            # 如果在引号内，直接添加字符
-            if quote_char is not None:
-                if current_key is None:
-                    current_value += char
-                else:
-                    current_value += char
-                i += 1
-                continue
-
-            # 如果在datetime内部，需要特殊处理
-            if in_datetime:
-                current_value += char
-                if char == ')':
-                    in_datetime = False
+        items = []
+        while i < len(self._tokens) and self._char(i) != '}':
+            if self._char(i) == ',' or self._char(i) in _CLOSERS:
                 i += 1
                 continue
-
-            # 处理等号（键值分隔符）
-            if char == '=' and bracket_count == 0 and current_key is None:
-                current_key = current_value.strip()
-                current_value = ''
+            key, i = self._parse_value_at(i, stops=_KEY_STOPS)
+            if self._char(i) in (':', '='):
+                value, i = self._parse_value_at(i + 1)
+                if isinstance(key, (dict, list)):
+                    key = json.dumps(key, ensure_ascii=False)
+                result[key] = value
+            else:
+                items.append(key)
+        end = self._expect_close(i, '}')
+        if items and not result:
+            return items, end
+        return result, end
+
+    def _parse_call(self, i: int) -> Tuple[Any, int]:
+        """解析命名对象的参数
+
+        含关键字参数时返回属性字典（位置参数以序号为键）；只有一个位置参数时返回该值（如 UUID('...')），
+        多个位置参数时返回列表。
+        """
+        kwargs = {}
+        args = []
+        while i < len(self._tokens) and self._char(i) != ')':
+            if self._char(i) == ',' or self._char(i) in _CLOSERS:
                 i += 1
                 continue
-
-            # 处理逗号（键值对分隔符）
-            if char == ',' and bracket_count == 0 and current_key is not None:
-                if current_value.strip():
-                    # 递归解析值
-                    parsed_value = self.parse_value(current_value.strip())
-                    # 如果解析后仍然是字符串且看起来像是列表或对象，再次尝试解析
-                    if isinstance(parsed_value, str):
-                        if parsed_value.startswith('[') and parsed_value.endswith(']'):
-                            parsed_value = self.parse_object(parsed_value)
-                        elif parsed_value.startswith('{') and parsed_value.endswith('}'):
-                            parsed_value = self._parse_dict(parsed_value[1:-1])
-                        elif '(' in parsed_value and parsed_value.endswith(')'):
-                            obj_content = parsed_value[parsed_value.index('(')+1:-1]
-                            parsed_value = self._parse_dict(obj_content)
-                    result[current_key] = parsed_value
-                current_key = None
-                current_value = ''
-                i += 1
-                while i < len(dict_str) and dict_str[i].isspace():
-                    i += 1
-                continue
-
-            current_value += char
-
-            if char in '[{(':
-                bracket_count += 1
-            elif char in ']})':
-                bracket_count -= 1
-
-            i += 1
-
-        # 处理最后一个键值对
-        if current_key is not None and current_value.strip():
-            # 递归解析值
-            parsed_value = self.parse_value(current_value.strip())
-            # 如果解析后仍然是字符串且看起来像是列表或对象，再次尝试解析
-            if isinstance(parsed_value, str):
-                if parsed_value.startswith('[') and parsed_value.endswith(']'):
-                    parsed_value = self.parse_object(parsed_value)
-                elif parsed_value.startswith('{') and parsed_value.endswith('}'):
-                    parsed_value = self._parse_dict(parsed_value[1:-1])
-                elif '(' in parsed_value and parsed_value.endswith(')'):
-                    obj_content = parsed_value[parsed_value.index('(')+1:-1]
-                    parsed_value = self._parse_dict(obj_content)
-            result[current_key] = parsed_value
-
-        return result
-
-    def parse_object(self, obj_str: str) -> Union[Dict, List, Any]:
-        """解析对象字符串为字典或列表"""
-        if not obj_str:
-            return {}
-
-        # 处理最外层的命名对象
-        obj_str = obj_str.strip()
-
-        # 处理列表
-        if obj_str.startswith('[') and obj_str.endswith(']'):
-            items = self._split_items(obj_str[1:-1])
-            parsed_items = []
-            for item in items:
-                item = item.strip()
-                # 如果是命名对象，解析为字典
-                if '(' in item and item.endswith(')'):
-                    # 获取对象名称和内容
-                    obj_name = item[:item.index('(')]
-                    obj_content = item[item.index('(')+1:-1]
-                    parsed_items.append({obj_name: self._parse_dict(obj_content)})
-                else:
-                    parsed_items.append(self.parse_value(item))
-            return parsed_items
-
-        # 处理命名对象
-        if '(' in obj_str and obj_str.endswith(')'):
-            obj_name = obj_str[:obj_str.index('(')]
-            obj_content = obj_str[obj_str.index('(')+1:-1]
-            return {obj_name: self._parse_dict(obj_content)}
-
-        return self.parse_value(obj_str)
+            if self._kind(i) == _ATOM and self._char(i + 1) == '=':
+                key = self._slice(i, i + 1)
+                value, end = self._parse_value_at(i + 2)
+                # 与原实现一致，忽略没有值的参数（如 "a=,"）
+                if end > i + 2:
+                    kwargs[key] = value
+                i = end
+            else:
+                value, i = self._parse_value_at(i)
+                args.append(value)
+        end = self._expect_close(i, ')')
+        if kwargs or not args:
+            result = {str(index): value for index, value in enumerate(args)}
+            result.update(kwargs)
+            return result, end
+        return (args[0] if len(args) == 1 else args), end
 
 
 def parse_debug_output(debug_str: str) -> Dict:
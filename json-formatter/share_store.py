@@ -0,0 +1,179 @@
+"""分享链接的载荷编解码和服务端文档存储
+
+小文档压缩后直接放进URL（?z=<base64url(deflate(utf-8))>），超过URL长度限制的文档
+保存到服务端本地目录，链接中只带内容哈希（?id=<哈希>）。
+"""
+import base64
+import binascii
+import os
+import re
+import threading
+import zlib
+from typing import List, Optional, Tuple
+
+from format_cache import FormatCache
+
+# 压缩载荷在URL中的最大长度，超出时改为保存到服务端并使用文档ID
+MAX_URL_PAYLOAD = 8000
+# 解压后文档的最大字节数，防止压缩炸弹
+MAX_DOCUMENT_BYTES = 64 * 1024 * 1024
+# 服务端存储目录，可通过环境变量覆盖
+DEFAULT_STORE_DIR = os.environ.get(
+    "JSON_FORMATTER_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".shared"))
+# 服务端存储的总大小上限（压缩后的字节数），超出时删除最久未访问的文档；可通过环境变量覆盖
+MAX_STORE_BYTES = int(os.environ.get("JSON_FORMATTER_STORE_QUOTA", 512 * 1024 * 1024))
+
+_DOC_ID_PATTERN = re.compile(r'[0-9a-f]{24}')
+
+
+class PayloadError(ValueError):
+    """载荷无法解码或超出大小限制"""
+
+
+def encode_payload(text: str) -> str:
+    """压缩文本并编码为URL安全的base64（不带填充）"""
+    compressed = zlib.compress(text.encode('utf-8'), 9)
+    return base64.urlsafe_b64encode(compressed).rstrip(b'=').decode('ascii')
+
+
+def decode_payload(payload: str, max_bytes: int = MAX_DOCUMENT_BYTES) -> str:
+    """解码 encode_payload 的结果
+
+    同时接受zlib、gzip和原始deflate格式（浏览器 CompressionStream('deflate-raw')），
+    解压后超过 max_bytes 时抛出 PayloadError。
+    """
+    try:
+        data = base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4))
+    except (binascii.Error, ValueError) as e:
+        raise PayloadError(f"载荷不是合法的base64url: {e}") from e
+
+    # 32 + MAX_WBITS 自动识别zlib和gzip头，-MAX_WBITS 为原始deflate
+    for wbits in (32 + zlib.MAX_WBITS, -zlib.MAX_WBITS):
+        decompressor = zlib.decompressobj(wbits)
+        try:
+            raw = decompressor.decompress(data, max_bytes + 1)
+        except zlib.error:
+            continue
+        if len(raw) > max_bytes:
+            raise PayloadError(f"文档超过 {max_bytes} 字节")
+        if not decompressor.eof:
+            raise PayloadError("载荷不完整")
+        return raw.decode('utf-8', errors='replace')
+    raise PayloadError("载荷不是合法的deflate数据")
+
+
+class DocumentStore:
+    """按内容哈希保存文档的本地存储，文件内容为zlib压缩的UTF-8文本
+
+    文档ID与 FormatCache 的键相同，同一文档多次分享只保存一份。
+    单个文档解压后不超过 max_bytes，所有文档压缩后总共不超过 quota；
+    保存和读取时刷新文件的修改时间，超出配额时按修改时间删除最久未访问的文档。
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, max_bytes: int = MAX_DOCUMENT_BYTES,
+                 quota: int = MAX_STORE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.quota = quota
+        self._lock = threading.Lock()
+        # 已用空间，首次保存时扫描目录得到
+        self._used: Optional[int] = None
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.root, f"{doc_id}.z")
+
+    def put(self, text: str) -> str:
+        """保存文档，返回文档ID"""
+        data = text.encode('utf-8')
+        if len(data) > self.max_bytes:
+            raise PayloadError(f"文档超过 {self.max_bytes} 字节")
+        doc_id = FormatCache.key(text)
+        path = self._path(doc_id)
+        with self._lock:
+            try:
+                # 已保存过：只刷新访问时间
+                os.utime(path)
+                return doc_id
+            except FileNotFoundError:
+                pass
+            compressed = zlib.compress(data, 6)
+            if len(compressed) > self.quota:
+                raise PayloadError(f"文档压缩后超过存储配额 {self.quota} 字节")
+            os.makedirs(self.root, exist_ok=True)
+            # 先写临时文件再重命名，避免读到写了一半的文件
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+            if self._used is None:
+                self._used = sum(size for _, size, _ in self._scan())
+            else:
+                self._used += len(compressed)
+            if self._used > self.quota:
+                self._evict(keep=path)
+        return doc_id
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """存储目录中的文档：(修改时间, 压缩后大小, 路径)"""
+        documents = []
+        try:
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.z'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    documents.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return documents
+
+    def _evict(self, keep: str):
+        """从最久未访问的文档开始删除，直到总大小不超过配额；重新扫描目录，同时纠正其他进程造成的偏差"""
+        documents = sorted(self._scan())
+        self._used = sum(size for _, size, _ in documents)
+        for _, size, path in documents:
+            if self._used <= self.quota:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            self._used -= size
+
+    def get(self, doc_id: str) -> Optional[str]:
+        """按文档ID读取文档，ID非法或不存在时返回None"""
+        if not _DOC_ID_PATTERN.fullmatch(doc_id):
+            return None
+        try:
+            with open(self._path(doc_id), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(self._path(doc_id))
+        except OSError:
+            pass
+        decompressor = zlib.decompressobj()
+        raw = decompressor.decompress(data, self.max_bytes + 1)
+        if len(raw) > self.max_bytes:
+            return None
+        return raw.decode('utf-8', errors='replace')
+
+
+document_store = DocumentStore()
+
+
+def build_share_query(text: str, store: Optional[DocumentStore] = None,
+                      max_url_payload: int = MAX_URL_PAYLOAD) -> str:
+    """生成分享链接的查询字符串：压缩后足够短时内嵌到URL，否则保存到服务端"""
+    payload = encode_payload(text)
+    if len(payload) <= max_url_payload:
+        return f"z={payload}"
+    return f"id={(store or document_store).put(text)}"
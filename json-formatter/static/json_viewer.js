@@ -0,0 +1,10 @@
+// 普通视图：通过事件委托折叠/展开 .foldable 行之后的 .foldable-content
+(function () {
+    document.addEventListener('click', (event) => {
+        const button = event.target.closest('.json-viewer .fold-button');
+        if (!button) return;
+        button.classList.toggle('folded');
+        button.parentElement.classList.toggle('folded');
+        event.stopPropagation();
+    });
+})();
@@ -0,0 +1,61 @@
+// 懒加载树形视图：展开节点或点击"显示更多"时通过 Gradio API 向服务端请求子节点
+(function () {
+    function apiUrl(name) {
+        const base = window.location.pathname.replace(/\/$/, '');
+        return `${base}/gradio_api/call/${name}`;
+    }
+
+    async function fetchTreeNode(docId, path, offset) {
+        const url = apiUrl('expand_tree_node');
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ data: [docId, path, offset] })
+        });
+        const { event_id } = await response.json();
+        const result = await (await fetch(`${url}/${event_id}`)).text();
+
+        // 返回为SSE格式: event: complete\ndata: ["<html>"]
+        for (const block of result.split('\n\n')) {
+            const lines = block.split('\n');
+            if (lines[0] === 'event: complete') {
+                const data = lines.find(line => line.startsWith('data:'));
+                return JSON.parse(data.slice(5))[0];
+            }
+        }
+        throw new Error('加载节点失败');
+    }
+
+    async function loadInto(container, docId, path, offset) {
+        container.dataset.loaded = 'loading';
+        try {
+            const content = await fetchTreeNode(docId, path, offset);
+            container.insertAdjacentHTML('beforeend', content);
+            container.dataset.loaded = '1';
+        } catch (err) {
+            console.error(err);
+            container.dataset.loaded = '0';
+        }
+    }
+
+    document.addEventListener('click', async (event) => {
+        const toggle = event.target.closest('.lazy-toggle');
+        if (toggle) {
+            const content = toggle.parentElement.querySelector(':scope > .tree-content');
+            toggle.classList.toggle('collapsed');
+            content.classList.toggle('collapsed');
+            if (content.dataset.loaded === '0') {
+                await loadInto(content, content.dataset.doc, content.dataset.path, 0);
+            }
+            return;
+        }
+
+        const more = event.target.closest('.tree-more');
+        if (more && !more.dataset.loading) {
+            more.dataset.loading = '1';
+            const container = more.parentElement;
+            more.remove();
+            await loadInto(container, more.dataset.doc, more.dataset.path, Number(more.dataset.offset));
+        }
+    });
+})();
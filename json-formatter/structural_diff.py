@@ -0,0 +1,286 @@
+import hashlib
+import html
+import json
+from json.encoder import c_make_encoder, encode_basestring
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Union
+
+PathType = List[Union[str, int]]
+
+# 差异类型
+DIFF_ADDED = 'added'
+DIFF_REMOVED = 'removed'
+DIFF_CHANGED = 'changed'
+
+# 最多记录的差异条数，超出后停止比较
+MAX_DIFF_ENTRIES = 5000
+# 差异视图中值的最大显示长度
+MAX_VALUE_LENGTH = 200
+# 差异视图默认展开的层数
+DIFF_EXPAND_DEPTH = 3
+
+# 规范JSON编码器（键排序、紧凑分隔符）；直接复用C实现的编码函数，
+# JSONEncoder.encode 每次调用都会重新构造它，对大量小节点的开销比编码本身还大
+_CANONICAL_ENCODER = json.JSONEncoder(ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+if c_make_encoder is not None:
+    _encode_chunks = c_make_encoder(None, str, encode_basestring, None, ':', ',', True, False, True)
+
+    def _canonical(value: Any) -> str:
+        return ''.join(_encode_chunks(value, 0))
+else:
+    _canonical = _CANONICAL_ENCODER.encode
+
+
+def _scalar_token(value: Any) -> str:
+    """标量的规范编码：带类型前缀，字符串带长度前缀，拼接后不会产生歧义（1、1.0、true、"1" 互不相同）"""
+    value_type = type(value)
+    if value_type is str:
+        return f"s{len(value)}:{value}"
+    if value is None:
+        return "n"
+    if value_type is bool:
+        return "t" if value else "f"
+    if value_type is int:
+        return f"i{value}"
+    if value_type is float:
+        return f"d{value!r}"
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    return f"o{len(text)}:{text}"
+
+
+def _children(value: Union[dict, list]):
+    return value.values() if isinstance(value, dict) else value
+
+
+def _has_containers(items) -> bool:
+    return any(map(isinstance, items, repeat((dict, list))))
+
+
+def _key_text(key: Any) -> str:
+    """字典键的文本，与 json.dumps 一致：非字符串键转为其JSON文本"""
+    return key if isinstance(key, str) else json.dumps(key, ensure_ascii=False, default=str)
+
+
+class SubtreeHasher:
+    """计算并记录文档中容器节点的内容哈希
+
+    哈希自底向上计算：容器的摘要只由本层的标量和子容器的摘要编码得到（规范JSON，键排序、紧凑分隔符，
+    在C实现的json编码器中完成），每个节点只编码一次，整个文档的哈希为 O(节点数)；
+    只含标量的叶子容器直接随父节点编码，需要比较时才单独计算摘要；
+    相同内容的子树摘要相同，比较时O(1)跳过。
+    结果按节点的 id() 保存，只在被哈希的文档存活期间有效，
+    因此与文档一起缓存，同一文档再次对比时直接复用。
+    """
+
+    def __init__(self):
+        self.hashes: Dict[int, str] = {}
+
+    def token(self, value: Any) -> str:
+        """节点的比较标记：容器为子树哈希，标量为其规范编码"""
+        if isinstance(value, (dict, list)):
+            return self.digest(value)
+        return _scalar_token(value)
+
+    def digest(self, value: Union[dict, list]) -> str:
+        cached = self.hashes.get(id(value))
+        if cached is not None:
+            return cached
+        return self._digest(value, _has_containers(_children(value)))
+
+    def _digest(self, value: Union[dict, list], nested: bool) -> str:
+        # 本层用C实现的json编码器编码：标量原样保留，只含标量的子容器内联为 [子容器, 0]，
+        # 其余子容器替换为 [子树摘要]；三种形式的编码互不相同，[摘要] 不会与原始数据混淆
+        if not nested:
+            shallow = value
+        else:
+            hashes = self.hashes
+            # 用循环而不是推导式，每层嵌套只占一个栈帧
+            shallow = []
+            for child in _children(value):
+                if isinstance(child, (dict, list)):
+                    if _has_containers(_children(child)):
+                        child = [hashes.get(id(child)) or self._digest(child, True)]
+                    else:
+                        # 叶子容器随父节点一起编码，不单独计算摘要，比较时才按需计算
+                        child = (child, 0)
+                shallow.append(child)
+            if isinstance(value, dict):
+                shallow = dict(zip(value, shallow))
+        try:
+            canonical = _canonical(shallow)
+        except TypeError:
+            # 键的类型混杂时无法排序，先统一转为JSON文本
+            canonical = _canonical({_key_text(key): child for key, child in shallow.items()})
+        # 容器哈希以 h 开头并带定界符，与标量编码不会混淆
+        result = 'h' + hashlib.blake2b(canonical.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest() + ';'
+        self.hashes[id(value)] = result
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        """缓存占用的粗略估算：每个容器一个整数键和一个摘要字符串"""
+        return len(self.hashes) * 120
+
+
+@dataclass
+class DiffEntry:
+    path: PathType
+    kind: str
+    old: Any = None
+    new: Any = None
+
+
+@dataclass
+class DiffResult:
+    entries: List[DiffEntry] = field(default_factory=list)
+    # 比较过的节点数，及因哈希相同而整体跳过的子树数
+    compared: int = 0
+    skipped_subtrees: int = 0
+    truncated: bool = False
+
+    def counts(self) -> Dict[str, int]:
+        counts = {DIFF_ADDED: 0, DIFF_REMOVED: 0, DIFF_CHANGED: 0}
+        for entry in self.entries:
+            counts[entry.kind] += 1
+        return counts
+
+    def summary(self) -> str:
+        counts = self.counts()
+        text = (f"新增 {counts[DIFF_ADDED]}，删除 {counts[DIFF_REMOVED]}，修改 {counts[DIFF_CHANGED]}；"
+                f"比较 {self.compared} 个节点，跳过 {self.skipped_subtrees} 个相同子树")
+        return text + f"（只显示前 {len(self.entries)} 处差异）" if self.truncated else text
+
+
+class StructuralDiff:
+    """比较两个解析后的文档，只深入哈希不同的子树
+
+    节点是否相同只比较两侧的标记：容器为自底向上计算、按文档缓存的子树摘要，比较为O(1)。
+    字典按键比较；列表按元素哈希做序列对齐（SequenceMatcher），
+    插入或删除元素时不会把后续所有元素都报告为修改。
+    路径中字典的键为字符串（非字符串键转为其JSON文本），列表下标为整数，渲染时两者可以区分。
+    """
+
+    def __init__(self, left_hasher: Optional[SubtreeHasher] = None,
+                 right_hasher: Optional[SubtreeHasher] = None, max_entries: int = MAX_DIFF_ENTRIES):
+        self.left = left_hasher or SubtreeHasher()
+        self.right = right_hasher or SubtreeHasher()
+        self.max_entries = max_entries
+
+    def diff(self, old: Any, new: Any) -> DiffResult:
+        result = DiffResult()
+        self._diff(old, new, [], result)
+        return result
+
+    def _add(self, result: DiffResult, entry: DiffEntry):
+        if len(result.entries) >= self.max_entries:
+            result.truncated = True
+            return
+        result.entries.append(entry)
+
+    def _diff(self, old: Any, new: Any, path: PathType, result: DiffResult):
+        if result.truncated:
+            return
+        result.compared += 1
+        if old is new or self.left.token(old) == self.right.token(new):
+            if isinstance(old, (dict, list)):
+                result.skipped_subtrees += 1
+            return
+
+        if isinstance(old, dict) and isinstance(new, dict):
+            for key in old:
+                if key not in new:
+                    self._add(result, DiffEntry(path + [_key_text(key)], DIFF_REMOVED, old=old[key]))
+            for key in new:
+                if key not in old:
+                    self._add(result, DiffEntry(path + [_key_text(key)], DIFF_ADDED, new=new[key]))
+                else:
+                    self._diff(old[key], new[key], path + [_key_text(key)], result)
+        elif isinstance(old, list) and isinstance(new, list):
+            self._diff_lists(old, new, path, result)
+        else:
+            self._add(result, DiffEntry(path, DIFF_CHANGED, old=old, new=new))
+
+    def _diff_lists(self, old: list, new: list, path: PathType, result: DiffResult):
+        old_tokens = [self.left.token(item) for item in old]
+        new_tokens = [self.right.token(item) for item in new]
+        matcher = SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                result.compared += i2 - i1
+                result.skipped_subtrees += sum(isinstance(item, (dict, list)) for item in old[i1:i2])
+                continue
+            # 成对的位置逐个深入比较，多出的元素报告为新增或删除
+            paired = min(i2 - i1, j2 - j1)
+            for offset in range(paired):
+                self._diff(old[i1 + offset], new[j1 + offset], path + [j1 + offset], result)
+            for i in range(i1 + paired, i2):
+                self._add(result, DiffEntry(path + [i], DIFF_REMOVED, old=old[i]))
+            for j in range(j1 + paired, j2):
+                self._add(result, DiffEntry(path + [j], DIFF_ADDED, new=new[j]))
+
+
+def diff_documents(old: Any, new: Any, left_hasher: Optional[SubtreeHasher] = None,
+                   right_hasher: Optional[SubtreeHasher] = None) -> DiffResult:
+    """比较两个文档，返回差异列表；列表元素的路径使用新文档中的下标（删除的元素使用旧文档中的下标）"""
+    return StructuralDiff(left_hasher, right_hasher).diff(old, new)
+
+
+def _short_json(value: Any) -> str:
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    if len(text) > MAX_VALUE_LENGTH:
+        text = text[:MAX_VALUE_LENGTH] + '…'
+    return html.escape(text)
+
+
+def _entry_html(entry: DiffEntry) -> str:
+    if entry.kind == DIFF_ADDED:
+        return f'<span class="diff-new">+ {_short_json(entry.new)}</span>'
+    if entry.kind == DIFF_REMOVED:
+        return f'<span class="diff-old">- {_short_json(entry.old)}</span>'
+    return f'<span class="diff-old">{_short_json(entry.old)}</span> → <span class="diff-new">{_short_json(entry.new)}</span>'
+
+
+def render_diff_tree(result: DiffResult, expand_depth: int = DIFF_EXPAND_DEPTH) -> str:
+    """将差异渲染为只包含变化路径的树，超过 expand_depth 层的节点默认折叠"""
+    if not result.entries:
+        return '<div class="diff-empty">两个文档相同</div>'
+
+    # 按路径组织为嵌套字典；叶子的键为 (键, 差异类型)，
+    # 避免列表中删除的旧下标与新下标处的修改或子路径冲突
+    root: Dict = {}
+    for entry in result.entries:
+        if not entry.path:
+            root[None] = entry
+            continue
+        node = root
+        for key in entry.path[:-1]:
+            node = node.setdefault(key, {})
+        node[(entry.path[-1], entry.kind)] = entry
+
+    def render(node: Dict, depth: int) -> str:
+        items = []
+        for key, child in node.items():
+            if isinstance(child, DiffEntry):
+                key = key[0]
+            label = html.escape(f"[{key}]" if isinstance(key, int) else str(key))
+            if isinstance(child, DiffEntry):
+                items.append(f'<div class="tree-item leaf diff-{child.kind}"><div class="tree-line"></div>'
+                             f'<span class="tree-key">{label}</span>: {_entry_html(child)}</div>')
+                continue
+            state = '' if depth < expand_depth else ' collapsed'
+            items.append(f'<div class="tree-item"><div class="tree-line"></div>'
+                         f'<div class="tree-toggle lazy-toggle{state}">▼</div>'
+                         f'<span class="tree-key">{label}</span> <span class="tree-summary">{_count(child)} 处差异</span>'
+                         f'<div class="tree-content{state}" data-loaded="1">{render(child, depth + 1)}</div></div>')
+        return ''.join(items)
+
+    if None in root:
+        # 根节点本身被替换（类型不同）
+        return f'<div class="tree-item leaf diff-changed">{_entry_html(root.pop(None))}</div>'
+    return render(root, 1)
+
+
+def _count(node: Dict) -> int:
+    return sum(1 if isinstance(child, DiffEntry) else _count(child) for child in node.values())
@@ -1,5 +1,16 @@
+import json
 import unittest
-from json_formatter import parse_debug_output
+from json_formatter import apply_query, load_from_params, parse_debug_output
+from object_to_json_parser import ObjectParser
+from tiered_parser import ParseResult, parse_input, parse_with_tiers
+from input_detector import input_detector
+from lazy_tree import create_lazy_tree_view, expand_tree_node
+from html_highlighter import render_json_html
+from format_cache import FormatCache, format_cache
+from batch_convert import BatchReport, convert_chunk, iter_convert
+from json_query import PathIndex, QueryError, query_value
+from structural_diff import diff_documents, render_diff_tree
+from share_store import DocumentStore, PayloadError, build_share_query, decode_payload, encode_payload
 
 
 class TestJsonFormatter(unittest.TestCase):
@@ -48,5 +59,311 @@ class TestJsonFormatter(unittest.TestCase):
         self.assertEqual(result['key'], 'value')
 
 
+class TestObjectParser(unittest.TestCase):
+    def test_named_objects(self):
+        """测试命名对象、枚举、datetime和嵌套列表"""
+        test_input = ("Dialogue(id='d1', created_at=datetime.datetime(2024, 3, 15, 8, 30, tzinfo=datetime.timezone.utc), "
+                      "users=[User(name='张三', role=<UserRole.AGENT: 'agent'>)], meta=Meta(tags=['a', 'b'], score=4.5))")
+        result = ObjectParser().parse_object(test_input)
+        dialogue = result['Dialogue']
+        self.assertEqual(dialogue['id'], 'd1')
+        self.assertEqual(dialogue['created_at'], '2024-03-15T08:30:00+00:00')
+        self.assertEqual(dialogue['users'], [{'User': {'name': '张三', 'role': 'agent'}}])
+        self.assertEqual(dialogue['meta'], {'tags': ['a', 'b'], 'score': 4.5})
+
+    def test_dict_and_unquoted_values(self):
+        """测试字典字面量、引号内的分隔符和未加引号的文本"""
+        result = ObjectParser().parse_value("Msg(content={'url': 'a, b', 'size': 1}, note=hello world, empty=)")
+        self.assertEqual(result, {'content': {'url': 'a, b', 'size': 1}, 'note': 'hello world'})
+
+    def test_large_input(self):
+        """测试大输入的解析"""
+        test_input = "[" + ", ".join(f"Item(id={i}, text='{'x' * 100}')" for i in range(20000)) + "]"
+        result = ObjectParser().parse_object(test_input)
+        self.assertEqual(len(result), 20000)
+        self.assertEqual(result[-1]['Item']['id'], 19999)
+
+
+class TestTieredParser(unittest.TestCase):
+    def test_tiers(self):
+        """测试各层级的选择"""
+        self.assertEqual(parse_with_tiers('{"a": [1, 2]}').tier, 'json')
+
+        result = parse_with_tiers("{'a': (1, 2), 'b': None}")
+        self.assertEqual(result.tier, 'literal')
+        self.assertEqual(result.value, {'a': [1, 2], 'b': None})
+
+        result = parse_with_tiers("[User(name='张三', role=<UserRole.AGENT: 'agent'>, "
+                                  "created_at=datetime.datetime(2024, 3, 15, 8, 30, 15, tzinfo=datetime.timezone.utc))]")
+        self.assertEqual(result.tier, 'repr')
+        self.assertEqual(result.value, [{'User': {'name': '张三', 'role': 'agent',
+                                                  'created_at': '2024-03-15T08:30:15+00:00'}}])
+
+        result = parse_with_tiers("X(note=hello world)")
+        self.assertEqual(result.tier, 'heuristic')
+        self.assertEqual(result.value, {'X': {'note': 'hello world'}})
+        self.assertEqual([attempt.tier for attempt in result.attempts], ['json', 'literal', 'repr', 'heuristic'])
+
+    def test_mixed_key_types(self):
+        """非字符串键按 json.dumps 的方式转为字符串，混合类型的键也能渲染"""
+        result = parse_with_tiers("{1: 'a', 'b': 2, None: 3, False: 4}")
+        self.assertEqual(result.value, {'1': 'a', 'b': 2, 'null': 3, 'false': 4})
+        html = render_json_html(result.value)
+        self.assertIn('"1"', html)
+        self.assertIn('"null"', html)
+        # 渲染器直接接收混合类型的键时也不报错
+        self.assertIn('"b"', render_json_html({1: 'a', 'b': 2}))
+
+
+class TestInputDetector(unittest.TestCase):
+    def test_detect_and_route(self):
+        """测试输入格式识别及按格式选择解析层级"""
+        self.assertEqual(input_detector.detect('{"a": "datetime"}').kind, 'json')
+        self.assertEqual(input_detector.detect("User(name='a')").kind, 'repr')
+        self.assertEqual(input_detector.detect("{'t': datetime.date(2024, 1, 2)}").kind, 'repr')
+
+        detected = input_detector.detect("obj >>> {'a': 1}")
+        self.assertEqual((detected.kind, detected.text), ('repl', "{'a': 1}"))
+
+        detected = input_detector.detect("('row',\n   {'a':   1})")
+        self.assertEqual((detected.kind, detected.text), ('dataview', "('row', {'a': 1})"))
+        self.assertEqual(parse_input("('row',\n   {'a':   1})").value, {'a': 1})
+
+        result = parse_input('{"t": "datetime.now", "ok": true}')
+        self.assertEqual(result.value, {'t': 'datetime.now', 'ok': True})
+        result = parse_input("User(name='a')")
+        self.assertEqual([attempt.tier for attempt in result.attempts], ['json', 'repr'])
+        self.assertIn('detect', result.timings())
+
+
+class TestLazyTree(unittest.TestCase):
+    def test_lazy_render_and_expand(self):
+        """测试懒加载视图只渲染前几层，展开时从缓存的文档中取子节点"""
+        data = {'items': [{'id': i, 'meta': {'x': i}} for i in range(500)]}
+        doc_id, _, _ = format_cache.parse('test-doc', lambda text: ParseResult(data, 'json'))
+        tree_html = create_lazy_tree_view(data, doc_id)
+
+        self.assertIn('data-path="[&quot;items&quot;, 0]"', tree_html)
+        self.assertNotIn('data-path="[&quot;items&quot;, 0, &quot;meta&quot;]"', tree_html)
+        self.assertIn('data-offset="200"', tree_html)
+
+        child_html = expand_tree_node(doc_id, '["items", 3, "meta"]')
+        self.assertIn('<span class="tree-key">x</span>', child_html)
+        self.assertIn('>3</span>', child_html)
+        self.assertIn('[200]', expand_tree_node(doc_id, '["items"]', 200))
+        self.assertIn('tree-error', expand_tree_node('missing', '[]'))
+        self.assertIn('tree-error', expand_tree_node(doc_id, '["items"]', 'abc'))
+        self.assertIn('tree-error', expand_tree_node(doc_id, '["items"]', -1))
+
+
+class TestHtmlHighlighter(unittest.TestCase):
+    def test_render_matches_json_dumps(self):
+        """测试普通视图的HTML去掉标签后与 json.dumps 的各行一致"""
+        import html
+        import json
+        import re
+
+        data = {'b': [1, 2.5, None, True, {}], 'a': {'s': '<x> "q"', 'n': []}, 'c': {1: 'x'}}
+        rendered = render_json_html(data)
+        lines = re.findall(r'<div class="line[^"]*">(.*?)</div>', re.sub(r'<span class="fold-summary">.*?</span>', '', rendered))
+        text_lines = [html.unescape(re.sub(r'<[^>]+>', '', line)).replace('▼', '') for line in lines]
+        expected = [line.strip() for line in json.dumps(data, indent=2, ensure_ascii=False, sort_keys=True).splitlines()]
+        self.assertEqual(text_lines, expected)
+        self.assertIn('<span class="nt">"a"</span>', rendered)
+        self.assertIn('<span class="s2">"&lt;x&gt; \\"q\\""</span>', rendered)
+        self.assertEqual(rendered.count('class="fold-button"'), 4)
+        self.assertNotIn('style=', rendered)
+
+
+class TestFormatCache(unittest.TestCase):
+    def test_hits_and_eviction(self):
+        """测试命中统计和按大小淘汰"""
+        cache = FormatCache(max_bytes=2000, max_entries=10)
+        calls = []
+
+        def parse(text):
+            calls.append(text)
+            return text.upper()
+
+        key, value, hit = cache.parse('a' * 100, parse)
+        self.assertFalse(hit)
+        self.assertEqual(cache.parse('a' * 100, parse), (key, value, True))
+        self.assertEqual(len(calls), 1)
+
+        self.assertIsNone(cache.get_view(key, 'tree'))
+        cache.put_view(key, 'tree', '<div></div>')
+        self.assertEqual(cache.get_view(key, 'tree'), '<div></div>')
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['view_hits'], stats['view_misses']), (1, 1, 1, 1))
+
+        # 非文本视图按输入大小估算，而不是对象本身的浅层大小
+        before = cache.stats()['bytes']
+        cache.put_view(key, 'index', PathIndex({'a': 1}))
+        self.assertGreaterEqual(cache.stats()['bytes'] - before, 100)
+        # 替换同一视图不重复计算
+        cache.put_view(key, 'tree', '<div></div>')
+        self.assertEqual(cache.stats()['bytes'] - before, cache._entries[key].view_sizes['index'])
+
+        for i in range(5):
+            cache.parse(f"{i}" * 100, parse)
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 2000)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertIsNone(cache.get_document(key))
+
+    def test_query_result_size(self):
+        """测试查询结果按结果大小计入缓存占用，而不是缓存键的长度"""
+        document = [{'text': 'x' * 100} for _ in range(1000)]
+        key, result, hit = apply_query('doc', document, '$..text')
+        self.assertFalse(hit)
+        self.assertEqual(len(result.value), 1000)
+        self.assertEqual(format_cache._entries[key].text_size, len(json.dumps(result.value)))
+        self.assertEqual(apply_query('doc', document, ' $..text ')[:1], (key,))
+
+
+class TestStructuralDiff(unittest.TestCase):
+    def test_diff_skips_identical_subtrees(self):
+        """测试结构化对比只报告变化的路径，相同子树整体跳过"""
+        old = {'users': [{'id': i, 'tags': ['a', 'b']} for i in range(100)], 'total': 100, 'old': 1}
+        new = {'users': [{'id': i, 'tags': ['a', 'b']} for i in range(100)], 'total': 101, 'new': True}
+        new['users'].insert(5, {'id': 'x'})
+        new['users'][50]['tags'] = ['a', 'c']
+
+        result = diff_documents(old, new)
+        changes = {(tuple(entry.path), entry.kind) for entry in result.entries}
+        self.assertEqual(changes, {
+            (('old',), 'removed'), (('new',), 'added'), (('total',), 'changed'),
+            (('users', 5), 'added'), (('users', 50, 'tags', 1), 'changed'),
+        })
+        self.assertGreaterEqual(result.skipped_subtrees, 99)
+
+        tree_html = render_diff_tree(result)
+        self.assertIn('<span class="diff-old">&quot;b&quot;</span> → <span class="diff-new">&quot;c&quot;</span>', tree_html)
+        self.assertNotIn('[49]', tree_html)
+        self.assertEqual(diff_documents(old, old).entries, [])
+        self.assertEqual(diff_documents({'a': 1}, {'a': 1.0}).entries[0].kind, 'changed')
+
+    def test_diff_deep_and_non_string_keys(self):
+        """测试深层嵌套的子树哈希，以及整数字典键与列表下标的区分"""
+        old = leaf = {}
+        for _ in range(300):
+            leaf['k'] = {'v': [1, 2]}
+            leaf = leaf['k']
+        new = json.loads(json.dumps(old))
+        self.assertEqual(diff_documents(old, new).entries, [])
+        leaf = new
+        for _ in range(300):
+            leaf = leaf['k']
+        leaf['v'][1] = 3
+        self.assertEqual([entry.path[-2:] for entry in diff_documents(old, new).entries], [['v', 1]])
+
+        result = diff_documents({1: 'a', 'b': [0]}, {1: 'c', 'b': [1]})
+        self.assertEqual(sorted(map(tuple, (entry.path for entry in result.entries)), key=str), [('1',), ('b', 0)])
+        tree_html = render_diff_tree(result)
+        self.assertIn('<span class="tree-key">1</span>', tree_html)
+        self.assertIn('<span class="tree-key">[0]</span>', tree_html)
+        self.assertNotIn('[1]', tree_html)
+
+
+class TestJsonQuery(unittest.TestCase):
+    def test_query_expressions(self):
+        """测试JSONPath风格查询：键、下标、切片、通配、递归查找及过滤"""
+        data = {
+            'messages': [
+                {'role': 'user', 'content': 'hi', 'n': 1},
+                {'role': 'admin', 'content': 'yo', 'n': 5, 'sub': {'content': 'deep'}},
+            ],
+            'meta': {'a b': 1},
+        }
+        self.assertEqual(query_value(data, 'messages[*].content'), ['hi', 'yo'])
+        self.assertEqual(query_value(data, '$.messages[-1].role'), 'admin')
+        self.assertEqual(query_value(data, "$['meta']['a b']"), 1)
+        self.assertEqual(query_value(data, 'messages[0:1].n'), [1])
+        self.assertEqual(query_value(data, "messages[?(@.role == 'admin')].n"), [5])
+        self.assertEqual(query_value(data, 'messages[?(@.n > 2 && @.sub)].role'), ['admin'])
+        self.assertEqual(query_value(data, 'messages[?(@.content =~ /^h/)].n'), [1])
+
+        index = PathIndex(data)
+        self.assertEqual(query_value(data, '$..content'), ['hi', 'yo', 'deep'])
+        self.assertEqual(query_value(data, '$..content', lambda: index), ['hi', 'yo', 'deep'])
+
+        with self.assertRaises(QueryError):
+            query_value(data, 'messages[')
+        with self.assertRaises(QueryError):
+            query_value(data, 'missing.key')
+
+
+class TestShareStore(unittest.TestCase):
+    def test_payload_and_store(self):
+        """测试压缩载荷编解码、大小限制及服务端存储"""
+        import tempfile
+        import zlib
+        import base64
+        from types import SimpleNamespace
+
+        text = '{"name": "张三", "items": [' + ', '.join(str(i) for i in range(1000)) + ']}'
+        self.assertEqual(decode_payload(encode_payload(text)), text)
+
+        # 浏览器 CompressionStream('deflate-raw') 生成的原始deflate
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        raw = compressor.compress(text.encode('utf-8')) + compressor.flush()
+        self.assertEqual(decode_payload(base64.urlsafe_b64encode(raw).decode().rstrip('=')), text)
+
+        with self.assertRaises(PayloadError):
+            decode_payload(encode_payload('a' * 10000), max_bytes=1000)
+        with self.assertRaises(PayloadError):
+            decode_payload('not-a-payload')
+
+        with tempfile.TemporaryDirectory() as root:
+            store = DocumentStore(root)
+            self.assertTrue(build_share_query(text, store).startswith('z='))
+            query = build_share_query(text, store, max_url_payload=10)
+            self.assertTrue(query.startswith('id='))
+            self.assertEqual(store.get(query[3:]), text)
+            self.assertIsNone(store.get('../etc/passwd'))
+
+        request = SimpleNamespace(query_params={'z': encode_payload("User(name='a', age=1)")})
+        self.assertEqual(json.loads(load_from_params(request)), {'User': {'name': 'a', 'age': 1}})
+
+    def test_store_quota(self):
+        """测试存储超出配额时删除最久未访问的文档"""
+        import os
+        import tempfile
+        import zlib
+
+        texts = [json.dumps({'doc': i, 'data': os.urandom(3000).hex()}) for i in range(4)]
+        with tempfile.TemporaryDirectory() as root:
+            sizes = [len(zlib.compress(text.encode('utf-8'), 6)) for text in texts]
+            store = DocumentStore(root, quota=sum(sizes[:3]) + 100)
+            ids = [store.put(text) for text in texts[:3]]
+            for age, doc_id in zip((300, 200, 100), ids):
+                os.utime(store._path(doc_id), (0, 1e9 - age))
+            # 读取第一个文档后，第二个成为最久未访问的
+            self.assertEqual(store.get(ids[0]), texts[0])
+            ids.append(store.put(texts[3]))
+            self.assertIsNone(store.get(ids[1]))
+            self.assertEqual(store.get(ids[0]), texts[0])
+            self.assertEqual(store.get(ids[3]), texts[3])
+            with self.assertRaises(PayloadError):
+                DocumentStore(root, quota=100).put(texts[0] + ' ')
+
+
+class TestBatchConvert(unittest.TestCase):
+    def test_convert_chunk(self):
+        """测试逐行转换为规范JSON并记录失败的行"""
+        lines = ['{"b": 1, "a": [1, 2]}', "{'x': (1, 2)}", '', "Msg(id=1, kind=<Kind.A: 'a'>)", 'not an object']
+        outputs, failures, tiers, skipped = convert_chunk(10, lines)
+        self.assertEqual(outputs, ['{"a":[1,2],"b":1}', '{"x":[1,2]}', '{"Msg":{"id":1,"kind":"a"}}'])
+        self.assertEqual(skipped, 1)
+        self.assertEqual([failure.line for failure in failures], [14])
+        self.assertEqual(tiers, {'json': 1, 'literal': 1, 'repr': 1})
+
+        report = BatchReport()
+        lines = ['{"name": "张三"}\n', '[1, 2]\n']
+        outputs = [output for chunk, _ in iter_convert(lines, chunk_size=1, report=report) for output in chunk]
+        self.assertEqual(outputs, ['{"name":"张三"}', '[1,2]'])
+        self.assertEqual(report.bytes_read, sum(len(line.encode('utf-8')) for line in lines))
+
+
 if __name__ == '__main__':
     unittest.main()
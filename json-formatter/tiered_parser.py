@@ -0,0 +1,275 @@
+import ast
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from input_detector import FORMAT_DATAVIEW, FORMAT_JSON, FORMAT_REPR, DetectedInput, input_detector
+from object_to_json_parser import ObjectParser
+
+# 解析层级，按顺序尝试
+TIER_JSON = 'json'
+TIER_LITERAL = 'literal'
+TIER_REPR = 'repr'
+TIER_HEURISTIC = 'heuristic'
+TIERS = (TIER_JSON, TIER_LITERAL, TIER_REPR, TIER_HEURISTIC)
+# 各输入格式尝试的层级：含repr特征的输入不可能是Python字面量，跳过字面量层；
+# JSON层仍然保留，因为JSON字符串中也可能出现 datetime. 等文本，且非JSON输入会很快失败
+FORMAT_TIERS = {
+    FORMAT_REPR: (TIER_JSON, TIER_REPR, TIER_HEURISTIC),
+}
+
+# 枚举的repr不是合法的Python语法，如 <UserRole.AGENT: 'agent'>、<Color.RED: 1>
+ENUM_REPR_PATTERN = re.compile(r"""<(\w+(?:\.\w+)+):\s*('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|[-+\w.]+)>""")
+
+
+@dataclass
+class ParseAttempt:
+    tier: str
+    seconds: float
+    error: Optional[str] = None
+
+
+@dataclass
+class ParseResult:
+    """分层解析结果，记录输入格式、成功的层级及各阶段耗时"""
+    value: Any
+    tier: str
+    attempts: List[ParseAttempt] = field(default_factory=list)
+    input_format: str = FORMAT_JSON
+    # 解析之前各阶段（如格式识别）的耗时
+    stages: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        """所有阶段和尝试的总耗时"""
+        return sum(self.stages.values()) + sum(attempt.seconds for attempt in self.attempts)
+
+    def timings(self) -> Dict[str, float]:
+        """各阶段及各层级尝试的耗时（秒）"""
+        timings = dict(self.stages)
+        for attempt in self.attempts:
+            timings[attempt.tier] = timings.get(attempt.tier, 0.0) + attempt.seconds
+        return timings
+
+    def summary(self) -> str:
+        source = self.tier if self.input_format == FORMAT_JSON else f"{self.input_format} → {self.tier}"
+        return f"{source} ({self.seconds * 1000:.1f} ms)"
+
+
+class ReprTransformer:
+    """将Python repr的AST转换为JSON兼容的结构
+
+    支持字面量、datetime/date/time/timedelta、UUID/Decimal等单参数调用，
+    以及 Name(k=v) 形式的命名对象。与 ObjectParser 保持一致：最外层及列表中的命名对象
+    解析为 {对象名称: 属性字典}，作为属性值时只保留属性字典。
+    """
+
+    def __init__(self):
+        self._calls: dict = {
+            'datetime': self._call_datetime,
+            'date': self._call_date,
+            'time': self._call_time,
+            'timedelta': self._call_timedelta,
+        }
+
+    def transform(self, node: ast.AST, wrap_named: bool = True) -> Any:
+        if isinstance(node, ast.Expression):
+            return self.transform(node.body, wrap_named)
+        if isinstance(node, ast.Constant):
+            return to_jsonable(node.value)
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return [self.transform(item, wrap_named=True) for item in node.elts]
+        if isinstance(node, ast.Dict):
+            result = {}
+            for key, value in zip(node.keys, node.values):
+                if key is None:
+                    # {**other}
+                    raise ValueError("不支持字典解包")
+                result[_json_key(self.transform(key, wrap_named=False))] = self.transform(value, wrap_named=False)
+            return result
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self.transform(node.operand, wrap_named=False)
+            if not isinstance(operand, (int, float)) or isinstance(operand, bool):
+                raise ValueError("一元运算只支持数字")
+            return -operand if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            name = _dotted_name(node)
+            # datetime.timezone.utc 等常量
+            return 'UTC' if name.endswith('timezone.utc') else name
+        if isinstance(node, ast.Call):
+            return self._transform_call(node, wrap_named)
+        raise ValueError(f"不支持的语法: {type(node).__name__}")
+
+    def _transform_call(self, node: ast.Call, wrap_named: bool) -> Any:
+        name = _dotted_name(node.func)
+        args = [self.transform(arg, wrap_named=False) for arg in node.args]
+        kwargs = {kw.arg: self.transform(kw.value, wrap_named=False) for kw in node.keywords if kw.arg}
+
+        short_name = name.rsplit('.', 1)[-1]
+        if short_name in self._calls and (name == short_name or name.startswith('datetime.')):
+            return self._calls[short_name](args, kwargs)
+
+        if kwargs or not args:
+            value = {str(index): arg for index, arg in enumerate(args)}
+            value.update(kwargs)
+        else:
+            # UUID('...')、Decimal('1.5') 等单参数调用直接取参数值
+            value = args[0] if len(args) == 1 else args
+        return {name: value} if wrap_named else value
+
+    @staticmethod
+    def _tzinfo(kwargs: dict) -> Optional[timezone]:
+        tzinfo = kwargs.pop('tzinfo', None)
+        if tzinfo is None:
+            return None
+        if tzinfo == 'UTC':
+            return timezone.utc
+        raise ValueError(f"不支持的时区: {tzinfo}")
+
+    def _call_datetime(self, args: list, kwargs: dict) -> str:
+        tzinfo = self._tzinfo(kwargs)
+        return datetime(*args, **kwargs, tzinfo=tzinfo).isoformat()
+
+    def _call_date(self, args: list, kwargs: dict) -> str:
+        return date(*args, **kwargs).isoformat()
+
+    def _call_time(self, args: list, kwargs: dict) -> str:
+        tzinfo = self._tzinfo(kwargs)
+        return dt_time(*args, **kwargs, tzinfo=tzinfo).isoformat()
+
+    def _call_timedelta(self, args: list, kwargs: dict) -> float:
+        return timedelta(*args, **kwargs).total_seconds()
+
+
+def _dotted_name(node: ast.AST) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return f"{_dotted_name(node.value)}.{node.attr}"
+    raise ValueError(f"不支持的调用: {type(node).__name__}")
+
+
+def _json_key(key: Any) -> str:
+    """JSON只支持字符串键，按 json.dumps 的方式转换：1 -> "1"、True -> "true"、None -> "null"，其余转为JSON文本
+
+    统一转为字符串后，混合类型的键（如 {1: 'a', 'b': 2}）也能排序和渲染。
+    """
+    if isinstance(key, str):
+        return key
+    return json.dumps(key, ensure_ascii=False)
+
+
+def to_jsonable(value: Any) -> Any:
+    """将 ast.literal_eval 的结果转换为JSON兼容的结构：元组和集合转为列表，bytes/complex转为字符串"""
+    if isinstance(value, dict):
+        return {_json_key(to_jsonable(k)): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='backslashreplace')
+    if isinstance(value, complex):
+        return str(value)
+    return value
+
+
+def _replace_enums(text: str) -> str:
+    """将枚举repr替换为其值的字面量"""
+    return ENUM_REPR_PATTERN.sub(lambda m: m.group(2), text)
+
+
+class TieredParser:
+    """分层解析引擎：严格JSON -> Python字面量 -> repr感知的AST转换 -> 启发式 ObjectParser
+
+    前三层都运行在C实现的 json/ast 上，只有都失败时才交给启发式解析器。
+    字面量层和repr层共用同一次 ast.parse 的结果。
+    """
+
+    def __init__(self):
+        self.transformer = ReprTransformer()
+
+    def parse(self, text: str, tiers: Sequence[str] = TIERS) -> ParseResult:
+        """按顺序尝试 tiers 中的层级；启发式层总是最后兜底"""
+        attempts: List[ParseAttempt] = []
+        text = text.strip()
+        tree_cache: List[Optional[ast.Expression]] = []
+
+        parsers: List[Tuple[str, Callable[[], Any]]] = [
+            (TIER_JSON, lambda: json.loads(text)),
+            (TIER_LITERAL, lambda: to_jsonable(ast.literal_eval(self._parse_ast(text, tree_cache)))),
+            (TIER_REPR, lambda: self._parse_repr(text, tree_cache)),
+        ]
+        for tier, parse in parsers:
+            if tier not in tiers:
+                continue
+            start = time.perf_counter()
+            try:
+                value = parse()
+            except (ValueError, TypeError, SyntaxError, RecursionError, MemoryError, KeyError) as e:
+                attempts.append(ParseAttempt(tier, time.perf_counter() - start, f"{type(e).__name__}: {e}"))
+                continue
+            attempts.append(ParseAttempt(tier, time.perf_counter() - start))
+            return ParseResult(value, tier, attempts)
+
+        start = time.perf_counter()
+        value = ObjectParser().parse_object(text)
+        attempts.append(ParseAttempt(TIER_HEURISTIC, time.perf_counter() - start))
+        return ParseResult(value, TIER_HEURISTIC, attempts)
+
+    @staticmethod
+    def _parse_ast(text: str, tree_cache: list) -> ast.Expression:
+        """解析为AST并缓存，供字面量层和repr层共用；语法错误也会被缓存"""
+        if not tree_cache:
+            try:
+                tree_cache.append(ast.parse(text, mode='eval'))
+            except SyntaxError:
+                tree_cache.append(None)
+        if tree_cache[0] is None:
+            raise SyntaxError("不是合法的Python表达式")
+        return tree_cache[0]
+
+    def _parse_repr(self, text: str, tree_cache: list) -> Any:
+        try:
+            tree = self._parse_ast(text, tree_cache)
+        except SyntaxError:
+            # 可能含有枚举repr，替换后重新解析
+            replaced = _replace_enums(text)
+            if replaced == text:
+                raise
+            tree = ast.parse(replaced, mode='eval')
+        return self.transformer.transform(tree)
+
+
+# 解析器不保存每次调用的状态，各请求共用一个实例
+tiered_parser = TieredParser()
+
+
+def parse_with_tiers(text: str) -> ParseResult:
+    """按层级解析输入，返回结果及成功的层级和耗时"""
+    return tiered_parser.parse(text)
+
+
+def parse_input(debug_str: str, detected: Optional[DetectedInput] = None) -> ParseResult:
+    """识别输入格式后分层解析（JSON -> Python字面量 -> repr -> 启发式），返回结果及各阶段耗时
+
+    Args:
+        debug_str: 原始输入
+        detected: 已有的格式识别结果，为None时重新识别
+    """
+    if not debug_str.strip():
+        return ParseResult({}, TIER_JSON)
+
+    if detected is None:
+        detected = input_detector.detect(debug_str)
+
+    result = tiered_parser.parse(detected.text, FORMAT_TIERS.get(detected.kind, TIERS))
+    result.input_format = detected.kind
+    result.stages['detect'] = detected.seconds
+    if detected.kind == FORMAT_DATAVIEW and isinstance(result.value, list) and len(result.value) == 2:
+        # 返回元组的第二个元素(通常是字典部分)
+        result.value = result.value[1]
+    return result